@@ -0,0 +1,48 @@
+"""
+Time the vectorized arbitrage search against the dict-based Bellman-Ford on a random market graph.
+
+Run with ``python benchmarks/arbitrage.py``.
+"""
+import math
+import time
+import numpy as np
+
+from crizzle.patterns import graph as pure
+from crizzle.patterns.arbitrage import arbitrage_cycles
+
+
+def random_market(node_count=300, edge_count=3000, seed=0) -> pure.DiGraph:
+    """
+    Graph of exchange rates between random prices, less a 0.1% fee, with one profitable cycle between 0 and 1.
+    """
+    random = np.random.default_rng(seed)
+    prices = np.exp(random.normal(size=node_count))
+    edges = set()
+    while len(edges) < edge_count:
+        a, b = random.integers(node_count, size=2)
+        if a != b:
+            edges.add((int(a), int(b)))
+    rates = {(a, b): prices[a] / prices[b] * 0.999 for a, b in edges}
+    rates[(0, 1)] = prices[0] / prices[1] * 1.01
+    rates[(1, 0)] = prices[1] / prices[0]
+    return pure.DiGraph(edges=[[a, b, rate] for (a, b), rate in rates.items()])
+
+
+def main():
+    digraph = random_market()
+    adjacency = {node: {neighbour: -math.log(rate) for neighbour, rate in neighbours.items()}
+                 for node, neighbours in digraph.adjacency.items()}
+    edge_count = sum(len(neighbours) for neighbours in adjacency.values())
+
+    start = time.perf_counter()
+    pure.bellman_ford(adjacency, 0)
+    dict_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    found = arbitrage_cycles(digraph)
+    vectorized_seconds = time.perf_counter() - start
+    print("{} nodes, {} edges: dict Bellman-Ford {:.3f} s, vectorized {:.3f} s; cycles found: {}".format(
+        len(adjacency), edge_count, dict_seconds, vectorized_seconds, [cycle.nodes for cycle in found]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Time the decoding of a 1000-candlestick klines page and a 1000-trade aggTrades page.
+
+Run with ``python benchmarks/decoding.py``.
+"""
+import json
+import time
+
+from crizzle.services.binance import BinanceService
+from crizzle.services.binance.decoding import decode_candlesticks, decode_aggregated_trades
+
+
+def benchmark(function, repeat=200) -> float:
+    """
+    Returns:
+        float: Milliseconds per call
+    """
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    service = BinanceService(debug=True)
+    start_time = 1500000000000
+    klines = json.dumps([[start_time + i * 60000, "0.07700000", "0.07800000", "0.07600000", "0.07750000",
+                          "123.45600000", start_time + i * 60000 + 59999, "9.51234567", 123, "60.00000000",
+                          "4.61234567", "0"] for i in range(1000)]).encode('utf-8')
+    hook = benchmark(lambda: service.json_number_hook(json.loads(klines)))
+    vectorized = benchmark(lambda: decode_candlesticks(klines))
+    print("1000-candlestick page: json_number_hook {:.2f} ms, decode_candlesticks {:.2f} ms ({:.1f}x)".format(
+        hook, vectorized, hook / vectorized))
+
+    trades = json.dumps([{"a": 26129 + i, "p": "0.01633102", "q": "4.70443515", "f": 27781 + i, "l": 27781 + i,
+                          "T": start_time + i, "m": True, "M": True} for i in range(1000)],
+                        separators=(',', ':')).encode('utf-8')
+    parse = benchmark(lambda: json.loads(trades))
+    decode = benchmark(lambda: decode_aggregated_trades(trades))
+    print("1000-trade page: json.loads {:.2f} ms, decode_aggregated_trades {:.2f} ms".format(parse, decode))
+
+
+if __name__ == '__main__':
+    main()
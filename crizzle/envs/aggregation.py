@@ -0,0 +1,221 @@
+"""
+Building candlesticks of longer intervals from 1m candlesticks or from aggregated trades.
+
+Candlesticks follow Binance's conventions: a candlestick opens at the start of its interval in UTC (weeks start
+on Monday, months on the first of the month) and its close time is one millisecond before the next one opens.
+Merging the 1m candlesticks of an interval gives exactly the candlestick Binance serves for it, so only the 1m
+history needs downloading.
+
+All functions work on whole arrays: candlesticks are grouped by the start of their interval and every field is
+reduced with a single `reduceat` call.
+"""
+import logging
+import numpy as np
+
+from crizzle.services.binance import INTERVAL_MILLISECONDS, CANDLESTICK_DTYPE
+
+logger = logging.getLogger(__name__)
+
+BASE_INTERVAL = '1m'
+DAY = 86400000
+MONDAY = 4 * DAY  # 1970-01-05, the first Monday after the epoch
+
+# How each field of the candlesticks in an interval is combined.
+REDUCTIONS = {'high': np.maximum, 'low': np.minimum, 'volume': np.add, 'quoteAssetVolume': np.add,
+              'numberOfTrades': np.add, 'takerBuyBaseAssetVolume': np.add, 'takerBuyQuoteAssetVolume': np.add}
+
+
+def interval_start(timestamps, interval: str) -> np.ndarray:
+    """
+    Open time of the candlestick of an interval containing each millisecond timestamp.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if interval == '1M':
+        return timestamps.astype('datetime64[ms]').astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+    length = INTERVAL_MILLISECONDS[interval]
+    if interval == '1w':
+        return timestamps - (timestamps - MONDAY) % length
+    return timestamps - timestamps % length
+
+
+def interval_close(starts, interval: str) -> np.ndarray:
+    """
+    Close time of the candlesticks of an interval opening at each of the given times.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    if interval == '1M':
+        following = starts.astype('datetime64[ms]').astype('datetime64[M]') + 1
+        return following.astype('datetime64[ms]').astype(np.int64) - 1
+    return starts + INTERVAL_MILLISECONDS[interval] - 1
+
+
+def _groups(starts: np.ndarray) -> np.ndarray:
+    """
+    Index of the first element of each run of equal values in a sorted array.
+    """
+    return np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+
+
+def aggregate(candlesticks: np.ndarray, interval: str) -> tuple:
+    """
+    Merge candlesticks into candlesticks of a longer interval.
+
+    Args:
+        candlesticks: Structured array of `CANDLESTICK_DTYPE` records, ordered by open time
+        interval: Interval to build, a multiple of the candlesticks' interval
+
+    Returns:
+        tuple: (candlesticks, complete), where complete tells whether each built candlestick is finished. Only
+        the last one can be in progress, when the candlesticks do not reach the end of its interval
+    """
+    if len(candlesticks) == 0:
+        return np.empty(0, dtype=CANDLESTICK_DTYPE), np.empty(0, dtype=bool)
+    starts = interval_start(candlesticks['openTimestamp'], interval)
+    first = _groups(starts)
+    last = np.append(first[1:], len(candlesticks)) - 1
+    result = np.empty(len(first), dtype=CANDLESTICK_DTYPE)
+    result['openTimestamp'] = starts[first]
+    result['closeTimestamp'] = interval_close(result['openTimestamp'], interval)
+    result['open'] = candlesticks['open'][first]
+    result['close'] = candlesticks['close'][last]
+    for field, reduction in REDUCTIONS.items():
+        result[field] = reduction.reduceat(candlesticks[field], first)
+    complete = np.ones(len(first), dtype=bool)
+    complete[-1] = candlesticks['closeTimestamp'][-1] >= result['closeTimestamp'][-1]
+    return result, complete
+
+
+def aggregate_trades(trades: np.ndarray, interval: str = BASE_INTERVAL) -> np.ndarray:
+    """
+    Build candlesticks from aggregated trades. Intervals without any trade are left out, where Binance would
+    serve a candlestick with no volume at the previous close.
+
+    Args:
+        trades: Structured array of `AGGREGATED_TRADE_DTYPE` records, ordered by time
+        interval: Interval of the candlesticks
+
+    Returns:
+        np.ndarray: Structured array of `CANDLESTICK_DTYPE` records
+    """
+    if len(trades) == 0:
+        return np.empty(0, dtype=CANDLESTICK_DTYPE)
+    starts = interval_start(trades['timestamp'], interval)
+    first = _groups(starts)
+    last = np.append(first[1:], len(trades)) - 1
+    prices, quantities = trades['price'], trades['quantity']
+    quote = prices * quantities
+    taker_buy = ~trades['isBuyerMaker']  # The buyer took liquidity
+    result = np.empty(len(first), dtype=CANDLESTICK_DTYPE)
+    result['openTimestamp'] = starts[first]
+    result['closeTimestamp'] = interval_close(result['openTimestamp'], interval)
+    result['open'] = prices[first]
+    result['close'] = prices[last]
+    result['high'] = np.maximum.reduceat(prices, first)
+    result['low'] = np.minimum.reduceat(prices, first)
+    result['volume'] = np.add.reduceat(quantities, first)
+    result['quoteAssetVolume'] = np.add.reduceat(quote, first)
+    result['numberOfTrades'] = np.add.reduceat(trades['lastTradeId'] - trades['firstTradeId'] + 1, first)
+    result['takerBuyBaseAssetVolume'] = np.add.reduceat(np.where(taker_buy, quantities, 0.0), first)
+    result['takerBuyQuoteAssetVolume'] = np.add.reduceat(np.where(taker_buy, quote, 0.0), first)
+    return result
+
+
+class CandleAggregator:
+    """
+    Incrementally builds candlesticks of several intervals from a stream of 1m candlesticks or trades. The
+    candlestick in progress of each interval is kept, already merged, until its last 1m candlestick arrives.
+    """
+
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals: Intervals to build, for example ['5m', '1h', '1d', '1w', '1M']
+        """
+        self.intervals = [interval for interval in intervals if interval != BASE_INTERVAL]
+        self._pending = {interval: np.empty(0, dtype=CANDLESTICK_DTYPE) for interval in self.intervals}
+        self._trades = None
+
+    def add(self, candlesticks) -> dict:
+        """
+        Add 1m candlesticks, newer than those added before.
+
+        Args:
+            candlesticks: Structured array of complete 1m `CANDLESTICK_DTYPE` records, ordered by open time
+
+        Returns:
+            dict: Dictionary of the format {interval: candlesticks completed by this call}
+        """
+        completed = {}
+        for interval in self.intervals:
+            merged = np.concatenate((self._pending[interval], candlesticks))
+            built, complete = aggregate(merged, interval)
+            done = int(complete.sum())
+            completed[interval] = built[:done]
+            # Aggregation is associative, so the candlestick in progress stands in for the 1m ones it merges;
+            # its close time is kept as that of the last of them until it is complete
+            pending = built[done:].copy()
+            if len(pending):
+                pending['closeTimestamp'] = merged['closeTimestamp'][-1]
+            self._pending[interval] = pending
+        return completed
+
+    def add_trades(self, trades: np.ndarray) -> dict:
+        """
+        Add aggregated trades, newer than those added before.
+
+        Args:
+            trades: Structured array of `AGGREGATED_TRADE_DTYPE` records, ordered by time
+
+        Returns:
+            dict: Dictionary of the format {interval: candlesticks completed by this call}, including '1m'
+        """
+        if self._trades is not None:
+            trades = np.concatenate((self._trades, trades))
+        if len(trades) == 0:
+            return {interval: np.empty(0, dtype=CANDLESTICK_DTYPE) for interval in [BASE_INTERVAL] + self.intervals}
+        # The minute of the latest trade may receive more trades
+        current = np.searchsorted(trades['timestamp'], interval_start(trades['timestamp'][-1:], BASE_INTERVAL)[0])
+        self._trades = trades[current:]
+        minutes = aggregate_trades(trades[:current])
+        completed = self.add(minutes)
+        completed[BASE_INTERVAL] = minutes
+        return completed
+
+    def partial(self, interval: str):
+        """
+        Candlestick of an interval still in progress, built from the 1m candlesticks received so far.
+
+        Returns:
+            np.void: `CANDLESTICK_DTYPE` record, or None if no candlestick of the interval is in progress
+        """
+        pending = self._pending[interval]
+        if len(pending) == 0:
+            return None
+        candlestick = pending[0].copy()
+        candlestick['closeTimestamp'] = interval_close(pending['openTimestamp'], interval)[0]
+        return candlestick
+
+
+def derive(store, symbol: str, intervals) -> dict:
+    """
+    Append candlesticks of longer intervals to a CandlestickStore, built from the 1m candlesticks it holds.
+    Only complete candlesticks are stored; the one in progress is built again on the next call.
+
+    Args:
+        store: CandlestickStore holding the 1m candlesticks of the symbol
+        symbol: Trading symbol
+        intervals: Intervals to build
+
+    Returns:
+        dict: Number of candlesticks appended for each interval
+    """
+    written = {}
+    for interval in intervals:
+        if interval == BASE_INTERVAL:
+            continue
+        latest = store.latest(interval, symbol)
+        base = store.read(BASE_INTERVAL, symbol, start=None if latest is None else latest[1] + 1)
+        built, complete = aggregate(base, interval)
+        written[interval] = store.append(interval, symbol, built[complete])
+    logger.debug("Derived {} candlesticks of {} from {}".format(written, symbol, BASE_INTERVAL))
+    return written
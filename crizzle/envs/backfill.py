@@ -0,0 +1,223 @@
+"""
+Parallel, paginated download of historical candlesticks.
+
+The missing time range of every (interval, symbol) pair is split into pages of at most `limit` candlesticks,
+which are fetched by a bounded pool of worker threads. Requests go through the service, and therefore through
+its rate limiter. Pages of a pair are handed to the sink strictly in order, so whatever the sink has stored is
+always a gap-free prefix of the history and an interrupted backfill resumes by planning again from the stored
+state.
+"""
+import time
+import logging
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from crizzle.services.binance import INTERVAL_MILLISECONDS, CANDLESTICK_LIMIT
+
+logger = logging.getLogger(__name__)
+
+Page = namedtuple('Page', ['interval', 'symbol', 'index', 'start', 'end'])
+
+
+class BackfillProgress:
+    """
+    Counters describing a running or finished backfill.
+    """
+
+    def __init__(self):
+        self.pages_total = 0
+        self.pages_done = 0
+        self.candlesticks = 0
+        self.retries = 0
+        self.failed = set()
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (time.time() if self.finished is None else self.finished) - self.started
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def candlesticks_per_second(self) -> float:
+        return self.candlesticks / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float:
+        """
+        Estimated seconds until every page has been fetched, or None if no page has completed yet.
+        """
+        rate = self.pages_per_second
+        return (self.pages_total - self.pages_done) / rate if rate > 0 else None
+
+    def __str__(self):
+        eta = self.eta
+        return "{}/{} pages, {} candlesticks, {:.1f} pages/s, {:.0f} candlesticks/s, ETA {}".format(
+            self.pages_done, self.pages_total, self.candlesticks, self.pages_per_second,
+            self.candlesticks_per_second, '?' if eta is None else '{:.0f}s'.format(eta))
+
+
+class Backfill:
+    def __init__(self, service, sink, workers: int = 8, limit: int = CANDLESTICK_LIMIT, retries: int = 3,
+                 interval_milliseconds: dict = None, progress_interval: float = 10, on_progress=None):
+        """
+        Args:
+            service: Service providing the `candlesticks` endpoint and `decode_candlesticks`
+            sink: Called as sink(interval, symbol, candlesticks) with consecutive pages of each pair, in order,
+                each page being a structured array of `CANDLESTICK_DTYPE` records
+            workers: Number of pages fetched concurrently
+            limit: Maximum number of candlesticks per page
+            retries: Number of times a failed page is fetched again before its pair is abandoned
+            interval_milliseconds: Length of each interval in milliseconds
+            progress_interval: Seconds between progress reports
+            on_progress: Called with the BackfillProgress object at every progress report
+        """
+        self.service = service
+        self.sink = sink
+        self.workers = workers
+        self.limit = limit
+        self.retries = retries
+        self.interval_milliseconds = INTERVAL_MILLISECONDS if interval_milliseconds is None \
+            else interval_milliseconds
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+        self.progress = BackfillProgress()
+
+    def fetch(self, interval: str, symbol: str, start: int, end: int = None, limit: int = None) -> np.ndarray:
+        response = self.service.candlesticks(symbol, interval, start=start, end=end,
+                                             limit=self.limit if limit is None else limit)
+        response.raise_for_status()
+        return self.service.decode_candlesticks(response)
+
+    def first_open_time(self, interval: str, symbol: str):
+        """
+        Open time of the earliest candlestick available for a pair, or None if there is none.
+        """
+        candlesticks = self.fetch(interval, symbol, 0, limit=1)
+        return int(candlesticks['openTimestamp'][0]) if len(candlesticks) > 0 else None
+
+    def plan(self, latest: dict, now: int = None) -> list:
+        """
+        Split the missing history of every pair into pages.
+
+        Args:
+            latest: Dictionary of the format {interval: {symbol: (open_time, close_time)}} describing the
+                most recent stored candlestick of each pair, with (0, 0) for pairs that have no data
+            now: Millisecond timestamp up to which to plan. Defaults to the current time.
+
+        Returns:
+            list: Pages to fetch
+        """
+        now = int(time.time() * 1000) if now is None else now
+        starts = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            probes = {}
+            for interval, symbols in latest.items():
+                for symbol, (open_time, close_time) in symbols.items():
+                    if close_time:
+                        starts[interval, symbol] = close_time + 1
+                    else:
+                        probes[interval, symbol] = pool.submit(self.first_open_time, interval, symbol)
+            for (interval, symbol), future in probes.items():
+                start = future.result()
+                if start is not None:
+                    starts[interval, symbol] = start
+
+        pages = []
+        for (interval, symbol), start in starts.items():
+            span = self.limit * self.interval_milliseconds[interval]
+            index = 0
+            while start + self.interval_milliseconds[interval] <= now:
+                pages.append(Page(interval, symbol, index, start, min(start + span, now) - 1))
+                start += span
+                index += 1
+        return pages
+
+    def _fetch_page(self, page: Page, now: int) -> np.ndarray:
+        for attempt in range(self.retries + 1):
+            try:
+                candlesticks = self.fetch(page.interval, page.symbol, page.start, end=page.end)
+                # drop the candlestick still in progress
+                return candlesticks[candlesticks['closeTimestamp'] < now]
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                self.progress.retries += 1
+                logger.warning("Retrying page {} of {} {}".format(page.index, page.interval, page.symbol))
+                time.sleep(2 ** attempt)
+
+    def report(self) -> None:
+        logger.info("Backfill: {}".format(self.progress))
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+
+    def run(self, latest: dict, now: int = None) -> BackfillProgress:
+        """
+        Fetch every missing page and hand each pair's pages to the sink in order.
+
+        Args:
+            latest: Dictionary of the format {interval: {symbol: (open_time, close_time)}}, see `plan`
+            now: Millisecond timestamp up to which to backfill. Defaults to the current time.
+
+        Returns:
+            BackfillProgress: Final counters
+        """
+        now = int(time.time() * 1000) if now is None else now
+        self.progress = BackfillProgress()
+        pages = self.plan(latest, now=now)
+        self.progress.pages_total = len(pages)
+        logger.info("Backfill planned {} pages".format(len(pages)))
+
+        next_index = {}  # index of the next page of each pair to hand to the sink
+        buffered = {}  # completed pages waiting for an earlier page of the same pair
+        failed_at = {}  # index of the first page of each pair that could not be fetched
+        queue = iter(pages)
+        last_report = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+
+            def submit():
+                for page in queue:
+                    if page.index > failed_at.get((page.interval, page.symbol), page.index):
+                        continue
+                    running[pool.submit(self._fetch_page, page, now)] = page
+                    if len(running) >= 2 * self.workers:
+                        return
+
+            submit()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = running.pop(future)
+                    pair = (page.interval, page.symbol)
+                    try:
+                        candlesticks = future.result()
+                    except Exception:
+                        logger.exception("Giving up on {} {} at page {}".format(page.interval, page.symbol,
+                                                                               page.index))
+                        self.progress.failed.add(pair)
+                        failed_at[pair] = min(page.index, failed_at.get(pair, page.index))
+                        continue
+                    self.progress.pages_done += 1
+                    if page.index > failed_at.get(pair, page.index):
+                        continue  # pages after a gap cannot be stored
+                    buffered[pair + (page.index,)] = candlesticks
+                    index = next_index.get(pair, 0)
+                    while pair + (index,) in buffered:
+                        candlesticks = buffered.pop(pair + (index,))
+                        if len(candlesticks) > 0:
+                            self.sink(page.interval, page.symbol, candlesticks)
+                            self.progress.candlesticks += len(candlesticks)
+                        index += 1
+                    next_index[pair] = index
+                submit()
+                if time.time() - last_report >= self.progress_interval:
+                    self.report()
+                    last_report = time.time()
+        self.progress.finished = time.time()
+        self.report()
+        return self.progress
@@ -0,0 +1,3 @@
+from crizzle.envs.backtest.feed import Feed, Candle, Window
+from crizzle.envs.backtest.vectorized import BacktestResult, backtest, sweep, backtest_feed
+from crizzle.envs.backtest.exchange import SimulatedExchange, FillModel
@@ -0,0 +1,431 @@
+"""
+Simulated exchange matching orders against replayed candlesticks or trades.
+
+Orders take the same shapes `BinanceService.order` accepts and go through the same validation
+(`crizzle.services.binance.orders.order_params`, and `check_filters` when exchange info is given). Each symbol keeps
+its orders in a growable structured array rather than one Python object per order, and every candlestick or trade
+is matched against all of a symbol's open orders at once with array operations, so a run can hold millions of
+orders.
+
+Matching follows these rules, from the point of view of an order submitted after candlestick t closed:
+
+- MARKET orders fill at the open of candlestick t + 1, moved against the order by the fill model's slippage.
+- STOP_LOSS and TAKE_PROFIT orders trigger when the price reaches their stop price (at the open, if it gaps past
+  the stop) and then fill like a MARKET order at that price. Their _LIMIT variants become LIMIT orders instead.
+- A LIMIT order whose price is marketable when it arrives (or is triggered) fills as a taker at the arrival price.
+  Otherwise it rests and fills as a maker at its own price once the price trades at it, or through it if the fill
+  model requires. LIMIT_MAKER orders that would fill as takers are rejected.
+- IOC and FOK orders expire after the first candlestick in which they could fill, FOK ones unless they filled
+  entirely. Resting iceberg orders fill at most their visible quantity per candlestick, since each refreshed part
+  joins the back of the queue. Market orders that find too little volume expire with the rest unfilled.
+
+Fees are charged in the quote asset, at the maker or taker rate. Balances are tracked per symbol as the net change
+of the base and quote assets and are not checked, so a run can overdraw them.
+"""
+import itertools
+import logging
+import numpy as np
+
+from crizzle.patterns.observer import Observer
+from crizzle.services.binance import orders
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('NEW', 'PARTIALLY_FILLED', 'FILLED', 'CANCELED', 'EXPIRED', 'REJECTED')
+NEW, PARTIALLY_FILLED, FILLED, CANCELED, EXPIRED, REJECTED = range(len(STATUSES))
+LIMIT, MARKET, STOP_LOSS, STOP_LOSS_LIMIT, TAKE_PROFIT, TAKE_PROFIT_LIMIT, LIMIT_MAKER = \
+    (orders.ORDER_TYPES.index(order_type) for order_type in ('LIMIT', 'MARKET', 'STOP_LOSS', 'STOP_LOSS_LIMIT',
+                                                            'TAKE_PROFIT', 'TAKE_PROFIT_LIMIT', 'LIMIT_MAKER'))
+GTC, IOC, FOK = (orders.TIMES_IN_FORCE.index(time_in_force) for time_in_force in ('GTC', 'IOC', 'FOK'))
+
+ORDER_DTYPE = np.dtype([('orderId', np.int64), ('time', np.int64), ('updateTime', np.int64), ('bar', np.int64),
+                        ('side', np.int8), ('type', np.int8), ('timeInForce', np.int8), ('status', np.int8),
+                        ('triggered', np.bool_), ('price', np.float64), ('stopPrice', np.float64),
+                        ('origQty', np.float64), ('icebergQty', np.float64), ('executedQty', np.float64),
+                        ('cummulativeQuoteQty', np.float64), ('commission', np.float64)])
+FILL_DTYPE = np.dtype([('orderId', np.int64), ('time', np.int64), ('side', np.int8), ('isMaker', np.bool_),
+                       ('price', np.float64), ('qty', np.float64), ('commission', np.float64)])
+
+
+class FillModel:
+    def __init__(self, slippage: float = 0.0, participation: float = None, through: bool = False):
+        """
+        Args:
+            slippage: Fraction of the price by which taker fills are moved against the order; limit orders are
+                never filled beyond their price
+            participation: Largest fraction of a candlestick's volume a single order can fill, or None for no limit
+            through: Whether resting limit orders fill only when the price trades through them, rather than when
+                it touches them
+        """
+        self.slippage = slippage
+        self.participation = participation
+        self.through = through
+
+    def __repr__(self):
+        return 'FillModel(slippage={}, participation={}, through={})'.format(self.slippage, self.participation,
+                                                                            self.through)
+
+
+class RecordArray:
+    """
+    Structured array that grows by doubling its capacity, for appending records one or many at a time.
+    """
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._records = np.zeros(max(1, capacity), dtype=dtype)
+        self.size = 0
+
+    @property
+    def records(self) -> np.ndarray:
+        """
+        View of the records appended so far.
+        """
+        return self._records[:self.size]
+
+    def _reserve(self, count: int) -> None:
+        if self.size + count > len(self._records):
+            grown = np.zeros(max(2 * len(self._records), self.size + count), dtype=self._records.dtype)
+            grown[:self.size] = self._records[:self.size]
+            self._records = grown
+
+    def append(self, record: tuple) -> None:
+        self._reserve(1)
+        self._records[self.size] = record
+        self.size += 1
+
+    def extend(self, records: np.ndarray) -> None:
+        self._reserve(len(records))
+        self._records[self.size:self.size + len(records)] = records
+        self.size += len(records)
+
+    def keep(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Keep only the records selected by a mask, in order.
+
+        Returns:
+            np.ndarray: The records removed
+        """
+        removed = self.records[~mask].copy()
+        kept = self.records[mask]
+        self._records[:len(kept)] = kept
+        self.size = len(kept)
+        return removed
+
+    def __len__(self):
+        return self.size
+
+
+class OrderQueue(RecordArray):
+    """
+    Orders of one symbol, ordered by id. Closed orders are moved to `history` once they make up most of the queue,
+    so matching only scans a few of them.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        super(OrderQueue, self).__init__(ORDER_DTYPE, capacity)
+        self.history = []
+        self.bars = 0  # Number of candlesticks or trades matched
+        self.closed = 0  # Number of closed orders still in the queue
+        self.time = 0  # Time of the last candlestick or trade matched
+        self.base = 0.0  # Net change of the base asset
+        self.quote = 0.0  # Net change of the quote asset, fees included
+
+    def compact(self) -> None:
+        if self.closed > 0:
+            self.history.append(self.keep(self.records['status'] <= PARTIALLY_FILLED))
+            self.closed = 0
+
+    def all(self) -> np.ndarray:
+        """
+        Every order of the symbol, closed ones included, ordered by id.
+        """
+        merged = np.concatenate(self.history + [self.records])
+        return merged[np.argsort(merged['orderId'], kind='stable')]
+
+    def locate(self, order_id: int) -> int:
+        """
+        Returns:
+            int: Position of an order in the queue, or None if it is not there
+        """
+        ids = self.records['orderId']
+        position = int(np.searchsorted(ids, order_id))
+        return position if position < len(ids) and ids[position] == order_id else None
+
+
+class SimulatedExchange(Observer):
+    def __init__(self, fill_model: FillModel = None, maker_fee: float = 0.001, taker_fee: float = 0.001,
+                 exchange_info=None, capacity: int = 1024):
+        """
+        Args:
+            fill_model: How orders fill, by default at the touch without slippage or volume limits
+            maker_fee: Fee of fills that added liquidity, as a fraction of their value
+            taker_fee: Fee of fills that took liquidity, as a fraction of their value
+            exchange_info: ExchangeInfo whose symbol filters orders are checked against, or None not to check them
+            capacity: Initial number of orders each symbol's queue holds before growing
+        """
+        super(SimulatedExchange, self).__init__()
+        self.fill_model = FillModel() if fill_model is None else fill_model
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.exchange_info = exchange_info
+        self.capacity = capacity
+        self.queues = {}
+        self.fills = RecordArray(FILL_DTYPE, capacity)
+        self._ids = itertools.count(1)
+        self._client_ids = {}  # client order id -> (symbol, order id)
+
+    def queue(self, symbol: str) -> OrderQueue:
+        if symbol not in self.queues:
+            self.queues[symbol] = OrderQueue(self.capacity)
+        return self.queues[symbol]
+
+    # region Orders
+    def order(self, symbol, side, order_type, quantity, price: float = None, stop_price=None, time_in_force: str = None,
+              iceberg_qty: float = None, new_client_order_id=None, test=False) -> dict:
+        """
+        Validate an order like `BinanceService.order` and queue it, to be matched from the next candlestick or
+        trade of its symbol on.
+
+        Returns:
+            dict: Acknowledgement with the 'symbol', 'orderId', 'clientOrderId', 'transactTime' and 'status' keys
+
+        Raises:
+            ValueError: If the order is invalid
+        """
+        params = orders.order_params(symbol, side, order_type, quantity, price=price, stop_price=stop_price,
+                                     time_in_force=time_in_force, iceberg_qty=iceberg_qty,
+                                     new_client_order_id=new_client_order_id)
+        if self.exchange_info is not None:
+            orders.check_filters(params, self.exchange_info)
+        queue = self.queue(symbol)
+        if test:
+            return {}
+        order_id = next(self._ids)
+        order_type = orders.ORDER_TYPES.index(params['type'])
+        stop = params.get('stopPrice')
+        queue.append((order_id, queue.time, queue.time, queue.bars, 1 if params['side'] == 'BUY' else -1,
+                      order_type, orders.TIMES_IN_FORCE.index(params.get('timeInForce', 'GTC')), NEW, stop is None,
+                      float(params.get('price', 'nan')), np.nan if stop is None else float(stop),
+                      float(params['quantity']), float(params.get('icebergQty', 0.0)), 0.0, 0.0, 0.0))
+        if new_client_order_id is not None:
+            self._client_ids[new_client_order_id] = (symbol, order_id)
+        return {'symbol': symbol, 'orderId': order_id, 'clientOrderId': new_client_order_id,
+                'transactTime': queue.time, 'status': 'NEW'}
+
+    def cancel_order(self, symbol: str, order_id=None, original_client_order_id=None,
+                     new_client_order_id=None) -> dict:
+        """
+        Cancel an open order.
+
+        Returns:
+            dict: The canceled order, as returned by `query_order`
+
+        Raises:
+            ValueError: If the order is unknown or already closed
+        """
+        orders.cancel_params(symbol, order_id=order_id, original_client_order_id=original_client_order_id)
+        queue, position = self._locate(symbol, order_id, original_client_order_id)
+        record = queue.records[position]
+        if record['status'] > PARTIALLY_FILLED:
+            raise ValueError("Order {} is already {}.".format(record['orderId'], STATUSES[record['status']]))
+        record['status'] = CANCELED
+        record['updateTime'] = queue.time
+        queue.closed += 1
+        return self._describe(symbol, record)
+
+    def query_order(self, symbol: str, order_id=None, original_client_order_id=None) -> dict:
+        """
+        Returns:
+            dict: State of an order, with the field names of the REST order endpoints
+        """
+        if order_id is None and original_client_order_id is not None:
+            symbol, order_id = self._client_ids.get(original_client_order_id, (symbol, None))
+        queue = self.queue(symbol)
+        position = None if order_id is None else queue.locate(order_id)
+        if position is not None:
+            return self._describe(symbol, queue.records[position])
+        for closed in queue.history:
+            matches = closed[closed['orderId'] == order_id]
+            if len(matches):
+                return self._describe(symbol, matches[0])
+        raise ValueError("Unknown order.")
+
+    def open_orders(self, symbol: str) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Structured array of `ORDER_DTYPE` records of the symbol's open orders
+        """
+        records = self.queue(symbol).records
+        return records[records['status'] <= PARTIALLY_FILLED]
+
+    def all_orders(self, symbol: str) -> np.ndarray:
+        return self.queue(symbol).all()
+
+    def balance(self, symbol: str) -> tuple:
+        """
+        Returns:
+            tuple: (base, quote), the net change of the symbol's base and quote assets, fees included
+        """
+        queue = self.queue(symbol)
+        return queue.base, queue.quote
+
+    def _locate(self, symbol, order_id, client_order_id) -> tuple:
+        if order_id is None:
+            symbol, order_id = self._client_ids.get(client_order_id, (symbol, None))
+        queue = self.queue(symbol)
+        position = None if order_id is None else queue.locate(order_id)
+        if position is None:
+            raise ValueError("Unknown or closed order.")
+        return queue, position
+
+    def _describe(self, symbol: str, record) -> dict:
+        order = {name: record[name].item() for name in ORDER_DTYPE.names if name not in ('bar', 'triggered')}
+        order.update({'symbol': symbol, 'side': 'BUY' if record['side'] > 0 else 'SELL',
+                      'type': orders.ORDER_TYPES[record['type']], 'status': STATUSES[record['status']],
+                      'timeInForce': orders.TIMES_IN_FORCE[record['timeInForce']]})
+        return order
+
+    # endregion
+
+    # region Matching
+    def match(self, symbol: str, open_price: float, high: float, low: float, close: float, volume: float,
+              timestamp: int) -> int:
+        """
+        Match the open orders of a symbol against a candlestick.
+
+        Args:
+            symbol: Trading symbol
+            open_price: Open price of the candlestick
+            high: Highest price of the candlestick
+            low: Lowest price of the candlestick
+            close: Close price of the candlestick
+            volume: Volume of the candlestick, in the base asset
+            timestamp: Close time of the candlestick, given to the fills
+
+        Returns:
+            int: Number of orders filled, fully or partially
+        """
+        queue = self.queue(symbol)
+        records = queue.records
+        # Only new orders, triggered stops and limits the price reached can change; resting orders away from the
+        # price are skipped without copying them
+        buy, stop, kind = records['side'] > 0, records['stopPrice'], records['type']
+        rising = buy ^ ((kind == TAKE_PROFIT) | (kind == TAKE_PROFIT_LIMIT))
+        candidates = (records['bar'] == queue.bars) | np.where(buy, low <= records['price'], high >= records['price'])
+        candidates |= ~records['triggered'] & np.where(rising, high >= stop, low <= stop)
+        rows = np.flatnonzero(candidates & (records['status'] <= PARTIALLY_FILLED))
+        filled = self._match(queue, records, rows, open_price, high, low, volume, timestamp) if len(rows) else 0
+        queue.bars += 1
+        queue.time = timestamp
+        if queue.closed > queue.size // 2:
+            queue.compact()
+        return filled
+
+    def _match(self, queue, records, rows, open_price, high, low, volume, timestamp) -> int:
+        model = self.fill_model
+        active = records[rows]
+        side, kind, time_in_force = active['side'], active['type'], active['timeInForce']
+        buy = side > 0
+        limit, stop = active['price'], active['stopPrice']
+        fresh = active['bar'] == queue.bars
+
+        # Stop orders trigger when the price reaches the stop, rising for buy stop losses and sell take profits
+        waiting = ~active['triggered']
+        rising = buy ^ ((kind == TAKE_PROFIT) | (kind == TAKE_PROFIT_LIMIT))
+        hit = waiting & np.where(rising, high >= stop, low <= stop)
+        live = ~waiting | hit
+        first = (fresh & ~waiting) | hit
+        arrival = np.where(hit, np.where(rising, np.maximum(open_price, stop), np.minimum(open_price, stop)),
+                           open_price)
+
+        market = (kind == MARKET) | (kind == STOP_LOSS) | (kind == TAKE_PROFIT)
+        crosses = np.where(buy, arrival <= limit, arrival >= limit)
+        taker = live & (market | (first & crosses))
+        rejected = taker & (kind == LIMIT_MAKER)
+        taker &= ~rejected
+        if model.through:
+            reached = np.where(buy, low < limit, high > limit)
+        else:
+            reached = np.where(buy, low <= limit, high >= limit)
+        maker = live & ~taker & ~market & ~rejected & reached
+
+        price = arrival * (1 + side * model.slippage)
+        price = np.where(market, price, np.where(buy, np.minimum(price, limit), np.maximum(price, limit)))
+        price = np.where(taker, price, limit)
+
+        remaining = active['origQty'] - active['executedQty']
+        quantity = remaining.copy()
+        if model.participation is not None:
+            quantity = np.minimum(quantity, model.participation * volume)
+        iceberg = maker & (active['icebergQty'] > 0)
+        quantity[iceberg] = np.minimum(quantity[iceberg], active['icebergQty'][iceberg])
+        quantity = np.where((taker | maker) & ~((time_in_force == FOK) & (quantity < remaining)), quantity, 0.0)
+
+        done = (quantity > 0) & (quantity >= remaining)
+        expired = ~done & ((first & ((time_in_force == IOC) | (time_in_force == FOK))) | (taker & market))
+        fee = quantity * price * np.where(taker, self.taker_fee, self.maker_fee)
+        status = np.where(rejected, REJECTED, np.where(done, FILLED, np.where(expired, EXPIRED, np.where(
+            quantity > 0, PARTIALLY_FILLED, active['status']))))
+
+        traded = quantity > 0
+        changed = traded | (status != active['status']) | hit
+        records['triggered'][rows] = active['triggered'] | hit
+        records['executedQty'][rows] += quantity
+        records['cummulativeQuoteQty'][rows] += quantity * price
+        records['commission'][rows] += fee
+        records['status'][rows] = status
+        records['updateTime'][rows[changed]] = timestamp
+        queue.closed += int(np.count_nonzero(status > PARTIALLY_FILLED))
+
+        if not traded.any():
+            return 0
+        fills = np.empty(int(np.count_nonzero(traded)), dtype=FILL_DTYPE)
+        fills['orderId'] = active['orderId'][traded]
+        fills['time'] = timestamp
+        fills['side'] = side[traded]
+        fills['isMaker'] = maker[traded]
+        fills['price'] = price[traded]
+        fills['qty'] = quantity[traded]
+        fills['commission'] = fee[traded]
+        self.fills.extend(fills)
+        signed = fills['side'] * fills['qty']
+        queue.base += float(signed.sum())
+        queue.quote -= float(np.dot(signed, fills['price']) + fills['commission'].sum())
+        return len(fills)
+
+    def match_trades(self, symbol: str, trades: np.ndarray) -> int:
+        """
+        Match the open orders of a symbol against trades, one at a time.
+
+        Args:
+            symbol: Trading symbol
+            trades: Structured array of `AGGREGATED_TRADE_DTYPE` records, ordered by time
+
+        Returns:
+            int: Number of fills
+        """
+        filled = 0
+        for price, quantity, timestamp in zip(trades['price'].tolist(), trades['quantity'].tolist(),
+                                              trades['timestamp'].tolist()):
+            filled += self.match(symbol, price, price, price, price, quantity, timestamp)
+        return filled
+
+    def handle(self, caller, state):
+        """
+        Match a Candle, or a trade with 'symbol', 'price', 'quantity' and 'timestamp' fields. Subscribe the exchange
+        before the strategies placing orders, so their orders are matched from the next event on.
+        """
+        if hasattr(state, 'closeTimestamp'):
+            self.match(state.symbol, state.open, state.high, state.low, state.close, state.volume,
+                       state.closeTimestamp)
+        else:
+            self.match(state.symbol, state.price, state.price, state.price, state.price, state.quantity,
+                       state.timestamp)
+
+    def can_handle(self, caller, state) -> bool:
+        return hasattr(state, 'closeTimestamp') or hasattr(state, 'tradeId')
+
+    # endregion
+
+    def __repr__(self):
+        return '<SimulatedExchange [{} symbols, {} fills]>'.format(len(self.queues), len(self.fills))
@@ -0,0 +1,169 @@
+"""
+Replay of locally stored candlesticks through the Observable machinery.
+
+Candlesticks of every (interval, symbol) pair are read from the memory-mapped columns of the CandlestickStore in
+chunks, so nothing is loaded in full, and merged across pairs with a heap in order of their close time, which is
+when a live feed would have seen them. Each candlestick is published with the topic ('kline', symbol, interval).
+
+In batch mode, observers instead receive one Window per span of time, holding the candlesticks of every pair that
+closed in it as records gathered from the columns; per-event overhead is then paid once per window.
+"""
+import os
+import heapq
+import itertools
+import logging
+from collections import namedtuple
+import numpy as np
+
+from crizzle import envs
+from crizzle.envs.data_grabber import DataGrabber
+from crizzle.envs.candlestick_store import CandlestickStore, stack
+from crizzle.services.binance import CANDLESTICK_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CLOSE = CANDLESTICK_FIELDS.index('closeTimestamp')
+
+# One replayed candlestick.
+Candle = namedtuple('Candle', ('interval', 'symbol') + CANDLESTICK_FIELDS)
+
+# Candlesticks closing in [start, end), as a dictionary of the format {(interval, symbol): structured array}.
+Window = namedtuple('Window', ['start', 'end', 'candles'])
+
+
+class Feed(DataGrabber):
+    def __init__(self, symbols: list = None, intervals: list = None, start: int = None, end: int = None,
+                 window: int = None, exchange: str = 'binance', store: CandlestickStore = None,
+                 chunk_size: int = 65536, dispatcher=None):
+        """
+        Args:
+            symbols: Symbols to replay, or None for every stored symbol
+            intervals: Intervals to replay, or None for every stored interval
+            start: Only replay candlesticks opening at or after this millisecond timestamp
+            end: Only replay candlesticks opening before this millisecond timestamp
+            window: Length of a batch in milliseconds, or None to replay one candlestick at a time
+            exchange: Exchange whose stored history is replayed
+            store: Store to read from, by default the one the exchange's live feed writes to
+            chunk_size: Number of candlesticks per pair converted to Python objects at a time
+            dispatcher: See Observable
+        """
+        super(Feed, self).__init__(dispatcher=dispatcher)
+        self.name = 'backtest'
+        self.exchange = exchange
+        if store is None:
+            store = CandlestickStore(os.path.join(envs.get_data_dir(), 'candlestick', exchange))
+        self.store = store
+        self.start = start
+        self.end = end
+        self.window = window
+        self.chunk_size = chunk_size
+        self.pairs = [(interval, symbol) for interval, symbol in store.pairs()
+                      if (symbols is None or symbol in symbols) and (intervals is None or interval in intervals)]
+        self._events = None
+        logger.debug("Initialised backtest feed over {} pairs of {}.".format(len(self.pairs), exchange))
+
+    def load(self, interval: str, symbol: str) -> np.ndarray:
+        """
+        Candlesticks of a pair within the feed's time range, as records.
+        """
+        return self.store.read(interval, symbol, start=self.start, end=self.end)
+
+    def columns(self, interval: str, symbol: str) -> dict:
+        """
+        Memory-mapped columns of a pair within the feed's time range.
+        """
+        return self.store.columns(interval, symbol, start=self.start, end=self.end)
+
+    # region Replay
+    def _stream(self, index: int):
+        interval, symbol = self.pairs[index]
+        columns = self.columns(interval, symbol)
+        for first in range(0, len(columns['closeTimestamp']), self.chunk_size):
+            chunk = [columns[field][first:first + self.chunk_size].tolist() for field in CANDLESTICK_FIELDS]
+            for row in zip(*chunk):
+                yield row[CLOSE], index, row
+
+    def candles(self):
+        """
+        Yields:
+            Candle of every pair, in order of close time (ties in the order of `pairs`)
+        """
+        for _, index, row in heapq.merge(*(self._stream(index) for index in range(len(self.pairs)))):
+            yield Candle._make(self.pairs[index] + row)
+
+    def windows(self):
+        """
+        Yields:
+            Window of each span of `window` milliseconds, aligned to multiples of it, in which a candlestick
+            closed; spans without any are skipped
+        """
+        columns = [self.columns(interval, symbol) for interval, symbol in self.pairs]
+        closes = [pair_columns['closeTimestamp'] for pair_columns in columns]
+        positions = [0] * len(columns)
+        while True:
+            pending = [closes[i][positions[i]] for i in range(len(columns)) if positions[i] < len(closes[i])]
+            if len(pending) == 0:
+                return
+            start = int(min(pending)) // self.window * self.window
+            end = start + self.window
+            candles = {}
+            for i, pair in enumerate(self.pairs):
+                if positions[i] < len(closes[i]):
+                    stop = int(np.searchsorted(closes[i], end, side='left'))
+                    if stop > positions[i]:
+                        candles[pair] = stack({field: column[positions[i]:stop]
+                                               for field, column in columns[i].items()})
+                        positions[i] = stop
+            yield Window(start, end, candles)
+
+    def reset(self) -> None:
+        """
+        Start the replay over from the beginning.
+        """
+        self._events = None
+
+    def _iterator(self):
+        if self._events is None:
+            self._events = self.candles() if self.window is None else self.windows()
+        return self._events
+
+    def _publish(self, state) -> None:
+        if self.window is None:
+            self.publish(state, 'kline', state.symbol, state.interval)
+        else:
+            self.publish(state, 'window')
+
+    def next(self) -> bool:
+        """
+        Publish the next candlestick, or the next window in batch mode.
+
+        Returns:
+            bool: False once the replay is over
+        """
+        state = next(self._iterator(), None)
+        if state is None:
+            return False
+        self._publish(state)
+        return True
+
+    def run(self, limit: int = None) -> int:
+        """
+        Replay until the end of the history, or until `limit` events were published.
+
+        Returns:
+            int: Number of events published
+        """
+        count = 0
+        for state in itertools.islice(self._iterator(), limit):
+            self._publish(state)
+            count += 1
+        logger.debug("Replayed {} events".format(count))
+        return count
+
+    # endregion
+
+    def update_local_historical_data(self):
+        """
+        Stored history is replayed as is; use the exchange's live feed to update it.
+        """
+        pass
@@ -0,0 +1,98 @@
+import numpy as np
+from nose.tools import assert_raises
+
+from crizzle.envs.backtest.exchange import SimulatedExchange, FillModel
+from crizzle.envs.backtest.feed import Candle
+from crizzle.services.binance.decoding import AGGREGATED_TRADE_DTYPE
+
+
+def status(exchange, response):
+    return exchange.query_order('ETHBTC', order_id=response['orderId'])['status']
+
+
+def test_limit_and_market_orders():
+    exchange = SimulatedExchange(FillModel(slippage=0.01), maker_fee=0.001, taker_fee=0.002)
+    resting = exchange.order('ETHBTC', 'BUY', 'LIMIT', 2, price=9.0, time_in_force='GTC', new_client_order_id='a')
+    marketable = exchange.order('ETHBTC', 'BUY', 'LIMIT', 1, price=11.0, time_in_force='GTC')
+    market = exchange.order('ETHBTC', 'SELL', 'MARKET', 1)
+    maker = exchange.order('ETHBTC', 'SELL', 'LIMIT_MAKER', 1, price=9.5)
+
+    assert exchange.match('ETHBTC', 10.0, 10.5, 9.5, 10.0, 100.0, 1000) == 2
+    assert status(exchange, resting) == 'NEW'
+    assert status(exchange, maker) == 'REJECTED'
+    taker = exchange.query_order('ETHBTC', order_id=marketable['orderId'])
+    assert taker['status'] == 'FILLED' and taker['cummulativeQuoteQty'] == 10.1  # Open price plus slippage
+    sold = exchange.query_order('ETHBTC', order_id=market['orderId'])
+    assert sold['cummulativeQuoteQty'] == 9.9 and sold['updateTime'] == 1000
+
+    assert exchange.match('ETHBTC', 10.0, 10.0, 8.0, 9.0, 100.0, 2000) == 1
+    filled = exchange.query_order('ETHBTC', original_client_order_id='a')
+    assert filled['status'] == 'FILLED' and filled['cummulativeQuoteQty'] == 18.0  # Resting orders fill at their price
+    assert filled['commission'] == 18.0 * 0.001
+    assert exchange.fills.records['isMaker'].tolist() == [False, False, True]
+    base, quote = exchange.balance('ETHBTC')
+    assert base == 2.0
+    assert np.isclose(quote, -10.1 + 9.9 - 18.0 - exchange.fills.records['commission'].sum())
+
+
+def test_stops_and_time_in_force():
+    exchange = SimulatedExchange(maker_fee=0.0, taker_fee=0.0)
+    stop = exchange.order('ETHBTC', 'SELL', 'STOP_LOSS_LIMIT', 1, price=8.5, stop_price=9.0, time_in_force='GTC')
+    ioc = exchange.order('ETHBTC', 'BUY', 'LIMIT', 1, price=9.0, time_in_force='IOC')
+    fok = exchange.order('ETHBTC', 'BUY', 'LIMIT', 3, price=11.0, time_in_force='FOK')
+    exchange.match('ETHBTC', 10.0, 10.5, 9.5, 10.0, 1.0, 1000)
+    assert status(exchange, stop) == 'NEW'
+    assert status(exchange, ioc) == 'EXPIRED'
+    assert status(exchange, fok) == 'FILLED'
+
+    # Gapping below the stop triggers at the open, where the limit is still reached
+    exchange.match('ETHBTC', 8.8, 8.9, 8.6, 8.7, 1.0, 2000)
+    triggered = exchange.query_order('ETHBTC', order_id=stop['orderId'])
+    assert triggered['status'] == 'FILLED' and triggered['cummulativeQuoteQty'] == 8.8
+    assert_raises(ValueError, exchange.cancel_order, 'ETHBTC', stop['orderId'])
+
+
+def test_participation_and_iceberg():
+    exchange = SimulatedExchange(FillModel(participation=0.5, through=True))
+    iceberg = exchange.order('ETHBTC', 'SELL', 'LIMIT', 10, price=10.0, time_in_force='GTC', iceberg_qty=2)
+    market = exchange.order('ETHBTC', 'BUY', 'MARKET', 10)
+    exchange.match('ETHBTC', 9.0, 10.0, 8.0, 9.0, 8.0, 1000)  # Touches the limit without trading through it
+    assert exchange.query_order('ETHBTC', order_id=iceberg['orderId'])['executedQty'] == 0
+    bought = exchange.query_order('ETHBTC', order_id=market['orderId'])
+    assert bought['status'] == 'EXPIRED' and bought['executedQty'] == 4.0
+    exchange.match('ETHBTC', 9.0, 11.0, 9.0, 10.5, 100.0, 2000)
+    partial = exchange.query_order('ETHBTC', order_id=iceberg['orderId'])
+    assert partial['status'] == 'PARTIALLY_FILLED' and partial['executedQty'] == 2.0
+    canceled = exchange.cancel_order('ETHBTC', order_id=iceberg['orderId'])
+    assert canceled['status'] == 'CANCELED' and len(exchange.open_orders('ETHBTC')) == 0
+
+
+def test_validation_and_events():
+    exchange = SimulatedExchange()
+    assert_raises(ValueError, exchange.order, 'ETHBTC', 'BUY', 'LIMIT', 1, price=1.0)
+    assert_raises(ValueError, exchange.order, 'ETHBTC', 'BUY', 'LIMIT_MAKER', 1)
+    assert_raises(ValueError, exchange.cancel_order, 'ETHBTC', 99)
+    response = exchange.order('ETHBTC', 'BUY', 'LIMIT', 1, price=1.0, time_in_force='GTC')
+    exchange.handle(None, Candle('1m', 'ETHBTC', 0, 2.0, 2.0, 1.5, 1.5, 1.0, 59999, 1.0, 1, 0.5, 0.5))
+    assert status(exchange, response) == 'NEW'
+    trades = np.zeros(2, dtype=AGGREGATED_TRADE_DTYPE)
+    trades['price'] = [1.2, 0.9]
+    trades['quantity'] = [1.0, 1.0]
+    trades['timestamp'] = [60000, 60001]
+    assert exchange.match_trades('ETHBTC', trades) == 1
+    assert status(exchange, response) == 'FILLED'
+    assert exchange.fills.records['time'].tolist() == [60001]
+
+
+def test_many_orders():
+    exchange = SimulatedExchange(capacity=16)
+    count = 20000
+    prices = 10.0 - np.arange(count) % 100 * 0.01
+    for price in prices.tolist():
+        exchange.order('ETHBTC', 'BUY', 'LIMIT', 1, price=price, time_in_force='GTC')
+    for minute, low in enumerate([9.95, 9.0]):
+        exchange.match('ETHBTC', 10.0, 10.0, low, low, 1e9, minute)
+    assert len(exchange.fills) == count
+    assert len(exchange.open_orders('ETHBTC')) == 0
+    assert len(exchange.queue('ETHBTC')) < count  # Closed orders were moved out of the queue
+    assert len(exchange.all_orders('ETHBTC')) == count
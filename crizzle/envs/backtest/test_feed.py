@@ -0,0 +1,76 @@
+import tempfile
+import numpy as np
+
+from crizzle.patterns import Observer
+from crizzle.envs.candlestick_store import CandlestickStore
+from crizzle.envs.backtest import Feed, Window
+
+MINUTE = 60000
+
+
+def rows(first, last, step=1, price=1.0):
+    return [[m * MINUTE, price, price, price, price + m, 10.0, (m + step) * MINUTE - 1, 20.0, 7, 4.0, 8.0, '0']
+            for m in range(first, last, step)]
+
+
+class Recorder(Observer):
+    def __init__(self):
+        super(Recorder, self).__init__()
+        self.states = []
+
+    def handle(self, caller, state):
+        self.states.append(state)
+
+    def can_handle(self, caller, state):
+        return True
+
+
+def make_store(root):
+    store = CandlestickStore(root)
+    store.append('1m', 'ETHBTC', rows(0, 10))
+    store.append('1m', 'LTCBTC', rows(5, 12))
+    store.append('5m', 'ETHBTC', rows(0, 10, step=5))
+    return store
+
+
+def test_replay_in_close_order():
+    with tempfile.TemporaryDirectory() as root:
+        feed = Feed(store=make_store(root), chunk_size=3)
+        observer, eth = Recorder(), Recorder()
+        feed.register(observer)
+        feed.subscribe(eth, 'kline', 'ETHBTC', '1m')
+        assert feed.run() == 10 + 7 + 2
+        closes = [state.closeTimestamp for state in observer.states]
+        assert closes == sorted(closes)
+        assert [state.close for state in eth.states] == [1.0 + m for m in range(10)]
+        assert observer.states[4].interval == '1m' and observer.states[5].interval == '5m'
+        assert not feed.next()
+        feed.reset()
+        assert feed.run(limit=3) == 3
+
+
+def test_filters():
+    with tempfile.TemporaryDirectory() as root:
+        feed = Feed(symbols=['ETHBTC'], intervals=['1m'], start=2 * MINUTE, end=4 * MINUTE,
+                    store=make_store(root))
+        observer = Recorder()
+        feed.register(observer)
+        feed.run()
+        assert [state.openTimestamp // MINUTE for state in observer.states] == [2, 3]
+
+
+def test_windows():
+    with tempfile.TemporaryDirectory() as root:
+        feed = Feed(window=5 * MINUTE, store=make_store(root))
+        observer = Recorder()
+        feed.register(observer)
+        assert feed.run() == 3
+        windows = observer.states
+        assert all(isinstance(window, Window) for window in windows)
+        assert [window.start // MINUTE for window in windows] == [0, 5, 10]
+        assert list(windows[0].candles[('1m', 'ETHBTC')]['openTimestamp'] // MINUTE) == [0, 1, 2, 3, 4]
+        assert ('1m', 'LTCBTC') not in windows[0].candles
+        assert len(windows[1].candles[('5m', 'ETHBTC')]) == 1
+        total = sum(len(candles) for window in windows for candles in window.candles.values())
+        assert total == 19
+        assert isinstance(windows[2].candles[('1m', 'LTCBTC')], np.ndarray)
@@ -0,0 +1,78 @@
+import tempfile
+import numpy as np
+
+from crizzle.patterns import Observer
+from crizzle.envs.candlestick_store import CandlestickStore, to_records
+from crizzle.envs.backtest import Feed
+from crizzle.envs.backtest.vectorized import BacktestResult, backtest, backtest_feed, sweep
+
+MINUTE = 60000
+
+
+def rows(closes):
+    return [[m * MINUTE, close, close, close, close, 10.0, (m + 1) * MINUTE - 1, 20.0, 7, 4.0, 8.0, '0']
+            for m, close in enumerate(closes)]
+
+
+def momentum(candles, threshold=0.0):
+    closes = candles['close']
+    change = np.diff(closes, prepend=closes[0]) / closes
+    return (change > threshold).astype(np.float64)
+
+
+class Momentum(Observer):
+    """
+    Event-driven version of `momentum`, keeping its own books.
+    """
+    def __init__(self, fee):
+        super(Momentum, self).__init__()
+        self.fee = fee
+        self.equity = 1.0
+        self.position = 0.0
+        self.last = None
+
+    def handle(self, caller, state):
+        change = 0.0
+        if self.last is not None:
+            self.equity *= 1 + self.position * (state.close / self.last - 1)
+            change = (state.close - self.last) / state.close
+        position = 1.0 if change > 0 else 0.0
+        self.equity *= 1 - self.fee * abs(position - self.position)
+        self.position, self.last = position, state.close
+
+    def can_handle(self, caller, state):
+        return True
+
+
+def test_result():
+    result = BacktestResult([1, 2, 3, 4], [100.0, 110.0, 99.0, 99.0], [1.0, 1.0, 0.0, 0.0], fee=0.01,
+                            initial_equity=100.0)
+    assert list(result.fills) == [0, 2]
+    assert np.allclose(result.equity, [99.0, 108.9, 98.01 * 0.99, 98.01 * 0.99])
+    assert np.allclose(result.fees, [1.0, 0.0, 0.9801, 0.0])
+    assert abs(result.max_drawdown - (98.01 * 0.99 / 108.9 - 1)) < 1e-12
+    assert result.summary()['fills'] == 2
+
+
+def test_matches_event_driven_replay():
+    random = np.random.default_rng(1)
+    closes = 100 * np.exp(np.cumsum(random.normal(scale=0.01, size=500)))
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', rows(closes))
+        feed = Feed(store=store)
+        observer = Momentum(fee=0.001)
+        feed.subscribe(observer, 'kline', 'ETHBTC', '1m')
+        feed.run()
+        result = backtest_feed(feed, '1m', 'ETHBTC', momentum, fee=0.001)
+        assert abs(result.final_equity - observer.equity) < 1e-9
+        assert len(result.equity) == 500
+
+
+def test_sweep():
+    closes = [1.0, 1.1, 1.2, 1.3, 1.2]
+    candles = to_records(rows(closes))
+    results = sweep(candles, momentum, {'threshold': [0.0, 0.5]}, fee=0.0)
+    assert [parameters['threshold'] for parameters, _ in results] == [0.0, 0.5]
+    assert results[1][1].final_equity == 1.0
+    assert backtest(candles, momentum, fee=0.0).final_equity == results[0][1].final_equity
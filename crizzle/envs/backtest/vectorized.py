@@ -0,0 +1,130 @@
+"""
+Vectorized backtests of strategies expressed as array functions.
+
+A strategy is a function from the candlesticks of one pair (a structured array of `CANDLESTICK_DTYPE` records, read
+through the same `Feed.load` as the event-driven replay) to the position held after the close of each candlestick,
+as a fraction of equity: 1 is fully invested in the base asset, 0 fully in the quote asset, and negative values are
+short. Fills, fees, equity and drawdown then follow for the whole history in a handful of array operations.
+
+The position decided at the close of candlestick t is filled at that close price, and earns the return from close
+t to close t + 1. Holding a fraction of equity between closes means rebalancing as prices move; only changes of
+the position itself are traded and charged the fee.
+"""
+import itertools
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestResult:
+    def __init__(self, timestamps, prices, positions, fee: float, initial_equity: float):
+        """
+        Args:
+            timestamps: Close time of each candlestick
+            prices: Close price of each candlestick
+            positions: Position held after each close, as a fraction of equity
+            fee: Fee charged on the traded value, as a fraction of it
+            initial_equity: Equity before the first candlestick, in the quote asset
+        """
+        self.timestamps = np.asarray(timestamps)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.positions = np.asarray(positions, dtype=np.float64)
+        if self.positions.shape != self.prices.shape:
+            raise ValueError("Strategy returned {} positions for {} candlesticks.".format(
+                len(self.positions), len(self.prices)))
+        self.fee = fee
+        self.initial_equity = initial_equity
+
+        held = np.concatenate(([0.0], self.positions[:-1]))
+        returns = np.zeros(len(self.prices))
+        returns[1:] = self.prices[1:] / self.prices[:-1] - 1
+        self.trades = np.diff(self.positions, prepend=0.0)  # Change of position at each close
+        growth = (1 + held * returns) * (1 - fee * np.abs(self.trades))
+        self.equity = initial_equity * np.cumprod(growth)
+        equity_before_fees = np.concatenate(([initial_equity], self.equity[:-1])) * (1 + held * returns)
+        self.fees = equity_before_fees * fee * np.abs(self.trades)
+        self.drawdown = self.equity / np.maximum.accumulate(self.equity) - 1 if len(self.equity) else self.equity
+
+    @property
+    def fills(self) -> np.ndarray:
+        """
+        Indices of the candlesticks at whose close the position changed.
+        """
+        return np.flatnonzero(self.trades)
+
+    @property
+    def pnl(self) -> np.ndarray:
+        """
+        Profit or loss since the start, after each candlestick.
+        """
+        return self.equity - self.initial_equity
+
+    @property
+    def final_equity(self) -> float:
+        return float(self.equity[-1]) if len(self.equity) else self.initial_equity
+
+    @property
+    def max_drawdown(self) -> float:
+        """
+        Largest fall of equity from a previous peak, as a (negative) fraction of the peak.
+        """
+        return float(self.drawdown.min()) if len(self.drawdown) else 0.0
+
+    def summary(self) -> dict:
+        return {'return': self.final_equity / self.initial_equity - 1, 'pnl': self.final_equity - self.initial_equity,
+                'fees': float(self.fees.sum()), 'fills': len(self.fills), 'max_drawdown': self.max_drawdown}
+
+    def __repr__(self):
+        summary = self.summary()
+        return '<BacktestResult [return {:.2%}, {} fills, max drawdown {:.2%}]>'.format(
+            summary['return'], summary['fills'], summary['max_drawdown'])
+
+
+def backtest(candles: np.ndarray, strategy, fee: float = 0.001, initial_equity: float = 1.0,
+             **parameters) -> BacktestResult:
+    """
+    Run a strategy over the candlesticks of one pair.
+
+    Args:
+        candles: Structured array of `CANDLESTICK_DTYPE` records, ordered by open time
+        strategy: Function called as strategy(candles, **parameters), returning one position per candlestick
+        fee: Fee charged on the traded value, as a fraction of it
+        initial_equity: Equity before the first candlestick, in the quote asset
+        **parameters: Parameters of the strategy
+
+    Returns:
+        BacktestResult: Fills, fees, equity and drawdown of the strategy
+    """
+    positions = strategy(candles, **parameters)
+    return BacktestResult(candles['closeTimestamp'], candles['close'], positions, fee, initial_equity)
+
+
+def sweep(candles: np.ndarray, strategy, grid: dict, fee: float = 0.001, initial_equity: float = 1.0) -> list:
+    """
+    Backtest a strategy for every combination of parameters, reusing the same candlesticks.
+
+    Args:
+        candles: Structured array of `CANDLESTICK_DTYPE` records
+        strategy: See `backtest`
+        grid: Dictionary of the format {parameter: list of values}
+
+    Returns:
+        list: (parameters, BacktestResult) of each combination, the highest final equity first
+    """
+    names = list(grid)
+    results = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        parameters = dict(zip(names, values))
+        results.append((parameters, backtest(candles, strategy, fee=fee, initial_equity=initial_equity,
+                                             **parameters)))
+    logger.debug("Swept {} parameter combinations over {} candlesticks".format(len(results), len(candles)))
+    return sorted(results, key=lambda result: result[1].final_equity, reverse=True)
+
+
+def backtest_feed(feed, interval: str, symbol: str, strategy, fee: float = 0.001, initial_equity: float = 1.0,
+                  **parameters) -> BacktestResult:
+    """
+    Run a strategy over the candlesticks a backtest Feed would replay for one pair.
+    """
+    return backtest(feed.load(interval, symbol), strategy, fee=fee, initial_equity=initial_equity, **parameters)
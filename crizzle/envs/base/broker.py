@@ -1,2 +1,184 @@
-class Broker:
-    pass
\ No newline at end of file
+"""
+In-memory account state of a broker.
+
+A Broker keeps every order it has seen, indexed by client order id and by symbol, the fills of those orders and
+the balance of every asset. Exchange-specific subclasses keep that state current from their account event stream
+and reconcile it with the exchange's REST API only on startup or after missing events, so strategies read orders
+and balances with dictionary lookups instead of signed requests.
+
+Every change is also published: ('order', symbol) with the order, ('fill', symbol) with the fill and
+('balance', asset) with the balance.
+"""
+import logging
+import threading
+from abc import ABCMeta, abstractmethod
+
+from crizzle.patterns.observer import Observable
+
+logger = logging.getLogger(__name__)
+
+# Order statuses after which an order can no longer fill.
+CLOSED_STATUSES = ('FILLED', 'CANCELED', 'REJECTED', 'EXPIRED')
+
+
+class Broker(Observable, metaclass=ABCMeta):
+    def __init__(self, dispatcher=None):
+        super(Broker, self).__init__(dispatcher=dispatcher)
+        self._orders = {}  # client order id -> order
+        self._open = {}  # symbol -> {client order id: order} of open orders
+        self._order_ids = {}  # exchange order id -> client order id
+        self._fills = {}  # symbol -> list of fills
+        self._fill_ids = set()  # (symbol, trade id) of every fill recorded
+        self._balances = {}  # asset -> {'free': float, 'locked': float}
+        self._lock = threading.RLock()
+
+    # region Queries
+    def order(self, client_order_id: str = None, order_id=None) -> dict:
+        """
+        Latest known state of an order, looked up by client order id or exchange order id.
+
+        Returns:
+            dict: The order, or None if it is unknown
+        """
+        with self._lock:
+            if client_order_id is None:
+                client_order_id = self._order_ids.get(order_id)
+            return self._orders.get(client_order_id)
+
+    def open_orders(self, symbol: str = None) -> list:
+        with self._lock:
+            if symbol is not None:
+                return list(self._open.get(symbol, {}).values())
+            return [order for orders in self._open.values() for order in orders.values()]
+
+    def fills(self, symbol: str) -> list:
+        with self._lock:
+            return list(self._fills.get(symbol, []))
+
+    def last_trade_id(self, symbol: str):
+        """
+        Returns:
+            Trade id of the symbol's most recent recorded fill, or None if none were recorded
+        """
+        with self._lock:
+            fills = self._fills.get(symbol)
+            return max(fill['tradeId'] for fill in fills) if fills else None
+
+    @property
+    def symbols(self) -> list:
+        """
+        Symbols with a known order or fill.
+        """
+        with self._lock:
+            return sorted({order['symbol'] for order in self._orders.values()} | set(self._fills))
+
+    def balance(self, asset: str) -> dict:
+        """
+        Returns:
+            dict: Dictionary of the format {'free': float, 'locked': float}
+        """
+        with self._lock:
+            return dict(self._balances.get(asset, {'free': 0.0, 'locked': 0.0}))
+
+    def free(self, asset: str) -> float:
+        return self.balance(asset)['free']
+
+    def position(self, asset: str) -> float:
+        """
+        Total holding of an asset, free and locked in open orders.
+        """
+        balance = self.balance(asset)
+        return balance['free'] + balance['locked']
+
+    @property
+    def balances(self) -> dict:
+        with self._lock:
+            return {asset: dict(balance) for asset, balance in self._balances.items()}
+
+    # endregion
+
+    # region Updates
+    def apply_order(self, order: dict) -> dict:
+        """
+        Record the new state of an order. Updates older than the known state are ignored.
+
+        Args:
+            order: Order with at least the 'symbol', 'clientOrderId' and 'status' keys, and optionally
+                'orderId' and 'updateTime'
+
+        Returns:
+            dict: The recorded order
+        """
+        with self._lock:
+            client_order_id = order['clientOrderId']
+            known = self._orders.get(client_order_id)
+            if known is not None and order.get('updateTime', known.get('updateTime', 0)) < known.get('updateTime', 0):
+                return known
+            recorded = dict(known or {}, **order)
+            self._orders[client_order_id] = recorded
+            if recorded.get('orderId') is not None:
+                self._order_ids[recorded['orderId']] = client_order_id
+            open_orders = self._open.setdefault(recorded['symbol'], {})
+            if recorded['status'] in CLOSED_STATUSES:
+                open_orders.pop(client_order_id, None)
+            else:
+                open_orders[client_order_id] = recorded
+        self.publish(recorded, 'order', recorded['symbol'])
+        return recorded
+
+    def apply_fill(self, fill: dict) -> bool:
+        """
+        Record a fill, once.
+
+        Args:
+            fill: Fill with at least the 'symbol' and 'tradeId' keys
+
+        Returns:
+            bool: Whether the fill was new
+        """
+        with self._lock:
+            key = (fill['symbol'], fill['tradeId'])
+            if key in self._fill_ids:
+                return False
+            self._fill_ids.add(key)
+            self._fills.setdefault(fill['symbol'], []).append(fill)
+        self.publish(fill, 'fill', fill['symbol'])
+        return True
+
+    def apply_balance(self, asset: str, free: float, locked: float) -> None:
+        with self._lock:
+            self._balances[asset] = {'free': free, 'locked': locked}
+        self.publish(self.balance(asset), 'balance', asset)
+
+    def replace_open_orders(self, orders: list, symbol: str = None) -> list:
+        """
+        Replace the open orders, of one symbol or all of them, with those reported by the exchange. Open orders
+        missing from the report closed while events were missed; they are given the status 'UNKNOWN'.
+
+        Returns:
+            list: The orders that closed while events were missed
+        """
+        reported = {order['clientOrderId'] for order in orders}
+        with self._lock:
+            stale = [order for order in self.open_orders(symbol) if order['clientOrderId'] not in reported]
+            for order in stale:
+                self._open[order['symbol']].pop(order['clientOrderId'], None)
+                order['status'] = 'UNKNOWN'
+        for order in orders:
+            self.apply_order(order)
+        if stale:
+            logger.warning("{} open orders closed while out of sync".format(len(stale)))
+        return stale
+
+    # endregion
+
+    @abstractmethod
+    def reconcile(self):
+        """
+        Replace the in-memory state with the exchange's.
+        """
+        pass
+
+    def __repr__(self):
+        return '<{} [{} open orders, {} assets]>'.format(type(self).__name__, len(self.open_orders()),
+                                                        len(self._balances))
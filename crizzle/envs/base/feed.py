@@ -8,8 +8,8 @@ logger = logging.getLogger(__name__)
 
 
 class Feed(envs.DataGrabber):
-    def __init__(self, name: str):
-        super(Feed, self).__init__()
+    def __init__(self, name: str, dispatcher=None):
+        super(Feed, self).__init__(dispatcher=dispatcher)
         self.name = name
         self.data_directory = envs.get_data_dir()
         self.service = services.make(self.name)
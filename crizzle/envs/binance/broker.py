@@ -1 +1,189 @@
-from crizzle.envs.base import Broker
\ No newline at end of file
+import logging
+
+from crizzle import services
+from crizzle.envs.base import Broker as BaseBroker
+from crizzle.envs.binance.stream import UserDataStream, USER_STREAM_URL
+
+logger = logging.getLogger(__name__)
+
+TRADE_LIST_LIMIT = 1000  # Most trades the myTrades endpoint returns at once
+
+
+def order_from_event(event: dict) -> dict:
+    """
+    Order state carried by an 'executionReport' event, with the field names of the REST order endpoints.
+    """
+    # A cancellation reports the order's own client order id as the original one
+    client_order_id = event['C'] if event.get('C') else event['c']
+    return {'symbol': event['s'], 'orderId': event['i'], 'clientOrderId': client_order_id,
+            'price': float(event['p']), 'origQty': float(event['q']), 'executedQty': float(event['z']),
+            'cummulativeQuoteQty': float(event['Z']), 'status': event['X'], 'timeInForce': event['f'],
+            'type': event['o'], 'side': event['S'], 'stopPrice': float(event['P']),
+            'icebergQty': float(event['F']), 'time': event['O'], 'updateTime': event['T']}
+
+
+def fill_from_event(event: dict) -> dict:
+    """
+    Fill reported by a 'TRADE' execution, with the field names of the REST myTrades endpoint.
+    """
+    price, quantity = float(event['L']), float(event['l'])
+    return {'symbol': event['s'], 'id': event['t'], 'tradeId': event['t'], 'orderId': event['i'],
+            'clientOrderId': event['c'], 'price': price, 'qty': quantity,
+            'quoteQty': float(event.get('Y', price * quantity)),
+            'commission': float(event['n']), 'commissionAsset': event['N'], 'time': event['T'],
+            'isBuyer': event['S'] == 'BUY', 'isMaker': event['m']}
+
+
+def fill_from_trade(trade: dict, client_order_id: str = None) -> dict:
+    """
+    Fill reported by the REST myTrades endpoint, with the trade id under 'tradeId' as for stream fills.
+    """
+    fill = dict(trade, tradeId=trade['id'])
+    if client_order_id is not None:
+        fill['clientOrderId'] = client_order_id
+    return fill
+
+
+class Broker(BaseBroker):
+    def __init__(self, service=None, dispatcher=None):
+        """
+        Args:
+            service: Binance service with an API key, by default a new one
+            dispatcher: Dispatcher delivering order, fill and balance events to observers
+        """
+        super(Broker, self).__init__(dispatcher=dispatcher)
+        self.service = services.make('binance') if service is None else service
+        self.stream = None
+        self.reconciliations = 0
+
+    # region Account Events
+    def handle_event(self, event: dict) -> None:
+        """
+        Apply an event of the user data stream.
+
+        Args:
+            event: Decoded 'executionReport', 'outboundAccountPosition' or 'balanceUpdate' event; others are ignored
+        """
+        event_type = event.get('e')
+        if event_type == 'executionReport':
+            self.apply_order(order_from_event(event))
+            if event['x'] == 'TRADE':
+                self.apply_fill(fill_from_event(event))
+        elif event_type == 'outboundAccountPosition':
+            for balance in event['B']:
+                self.apply_balance(balance['a'], float(balance['f']), float(balance['l']))
+        elif event_type == 'balanceUpdate':
+            # Deposits, withdrawals and transfers; the following outboundAccountPosition carries the totals
+            balance = self.balance(event['a'])
+            self.apply_balance(event['a'], balance['free'] + float(event['d']), balance['locked'])
+
+    def start(self, url: str = USER_STREAM_URL, **kwargs) -> UserDataStream:
+        """
+        Follow the account's user data stream on a background thread. The broker reconciles with REST when the
+        stream connects and after every reconnection, then applies the stream's events.
+
+        Args:
+            url: Address of the raw stream endpoint
+            **kwargs: Further arguments of UserDataStream
+
+        Returns:
+            UserDataStream: The running stream
+        """
+        if self.stream is not None:
+            raise RuntimeError("The broker is already streaming.")
+        self.stream = UserDataStream(self.service, sink=lambda event_type, symbol, interval, event:
+                                     self.handle_event(event), on_connect=self.reconcile, url=url, **kwargs)
+        self.stream.start()
+        return self.stream
+
+    def stop(self, timeout: float = None) -> None:
+        if self.stream is not None:
+            self.stream.stop(timeout)
+            if self.stream.listen_key is not None:
+                self.service.close_user_data_stream(self.stream.listen_key)
+            self.stream = None
+
+    def reconcile(self, symbols=None) -> None:
+        """
+        Replace open orders and balances with those reported over REST, and record the fills made since the last
+        recorded one, for after events may have been missed.
+
+        Args:
+            symbols: Symbols whose open orders and fills to fetch, or None to fetch the open orders of all symbols
+                at once and the fills of every symbol with a known order or fill
+        """
+        if symbols is None:
+            closed = self.replace_open_orders(self.service.decode(self.service.open_orders()))
+        else:
+            closed = []
+            for symbol in symbols:
+                closed.extend(self.replace_open_orders(self.service.decode(self.service.open_orders(symbol)), symbol))
+        for order in closed:
+            # Learn whether orders that closed while events were missed filled or were canceled
+            self.apply_order(self.service.decode(self.service.query_order(order['symbol'], order_id=order['orderId'])))
+        for symbol in self.symbols if symbols is None else symbols:
+            self.reconcile_fills(symbol)
+        for balance in self.service.decode(self.service.account_info())['balances']:
+            self.apply_balance(balance['asset'], float(balance['free']), float(balance['locked']))
+        self.reconciliations += 1
+        logger.debug("Reconciled {} over REST".format(self))
+
+    def reconcile_fills(self, symbol: str) -> int:
+        """
+        Record the fills of a symbol made after its last recorded one, or its most recent fills if none were
+        recorded yet.
+
+        Returns:
+            int: Number of new fills
+        """
+        last_trade_id = self.last_trade_id(symbol)
+        count = 0
+        while True:
+            from_id = None if last_trade_id is None else last_trade_id + 1
+            trades = self.service.decode(self.service.trade_list(symbol, limit=TRADE_LIST_LIMIT, from_id=from_id))
+            for trade in trades:
+                known = self.order(order_id=trade['orderId'])
+                count += self.apply_fill(fill_from_trade(trade, None if known is None else known['clientOrderId']))
+            # Without a starting id the endpoint returns the most recent trades, which need no further pages
+            if from_id is None or len(trades) < TRADE_LIST_LIMIT:
+                break
+            last_trade_id = max(trade['id'] for trade in trades)
+        return count
+
+    # endregion
+
+    # region Orders
+    def submit(self, symbol, side, order_type, quantity, price: float = None, stop_price=None,
+               time_in_force: str = None, iceberg_qty: float = None, new_client_order_id=None) -> dict:
+        """
+        Place an order and record it as soon as the exchange acknowledges it.
+
+        Returns:
+            dict: The recorded order
+        """
+        response = self.service.decode(self.service.order(
+            symbol, side, order_type, quantity, price=price, stop_price=stop_price, time_in_force=time_in_force,
+            iceberg_qty=iceberg_qty, new_client_order_id=new_client_order_id))
+        return self._record(response)
+
+    def cancel(self, symbol: str, client_order_id: str = None, order_id=None) -> dict:
+        """
+        Cancel an order, by client order id or exchange order id.
+
+        Returns:
+            dict: The recorded order
+        """
+        response = self.service.decode(self.service.cancel_order(symbol, order_id=order_id,
+                                                                 original_client_order_id=client_order_id))
+        if response.get('origClientOrderId'):
+            response['clientOrderId'] = response['origClientOrderId']
+        return self._record(response)
+
+    def _record(self, response: dict) -> dict:
+        order = {key: value for key, value in response.items() if key not in ('fills', 'origClientOrderId')}
+        order.setdefault('status', 'NEW')  # ACK responses carry no status
+        if 'transactTime' in order:
+            order['updateTime'] = order.pop('transactTime')
+        return self.apply_order(order)
+
+    # endregion
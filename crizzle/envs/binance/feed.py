@@ -1,113 +1,181 @@
 import os
-import time
-import json
+import queue
 import logging
 
 from crizzle import patterns
 from crizzle.envs.base import Feed as BaseFeed
+from crizzle.envs import aggregation
+from crizzle.envs.backfill import Backfill
+from crizzle.envs.candlestick_store import CandlestickStore
+from crizzle.envs.order_book import OrderBook
+from crizzle.envs.binance.stream import MarketStream, CHANNELS, STREAM_URL, MAX_STREAMS, group_symbols
 from crizzle.services.binance import INTERVALS
 
 logger = logging.getLogger(__name__)
 
 
 class Feed(BaseFeed):
-    def __init__(self, symbols: list = None, intervals: list = None):
-        super(Feed, self).__init__('binance')
+    def __init__(self, symbols: list = None, intervals: list = None, dispatcher=None):
+        super(Feed, self).__init__('binance', dispatcher=dispatcher)
         self.symbols = self.service.trading_symbols() if symbols is None else symbols
         self.intervals = INTERVALS if intervals is None else intervals
-        self.historical_filepath = self.get_path('candlestick')
-        self.initialize_file(self.historical_filepath)
-
-    def initialize_file(self, filepath: str):
-        super(Feed, self).initialize_file(filepath)
-        with open(filepath, 'r+') as file:
-            try:
-                json.load(file)
-            except json.decoder.JSONDecodeError:
-                file.write('{}')
+        self._price_graph = None
+        self.streams = []
+        self._order_books = {}
+        self._stream_events = queue.Queue()
+        self.store = CandlestickStore(os.path.join(self.data_directory, 'candlestick', self.name))
+        legacy_filepath = self.get_path('candlestick')
+        if os.path.exists(legacy_filepath) and len(self.store) == 0:
+            self.store.import_json(legacy_filepath)
 
     def get_path(self, data_type: str) -> str:
         """
-        Get the name of the file to store the historical data in
+        Get the name of the legacy JSON file that historical data used to be stored in
 
         Returns:
             str: Name of file
         """
         return os.path.join(self.data_directory, data_type, self.name + '.json')
 
-    def most_recent(self) -> dict:
+    def most_recent(self, intervals: list = None) -> dict:
         """
-        Checks local data directory for file existence and most recent data point for each chart
+        Looks up the most recent data point for each chart in the local data store's index
+
+        Args:
+            intervals (list): Intervals to look up, by default those of the feed
 
         Returns:
-            dict: Dictionary of the format {interval: {symbol: latest_time}}, where latest_time is the
-            timestamp of the most recent entry available, or None if there are no records for that symbol.
+            dict: Dictionary of the format {interval: {symbol: (open_time, close_time)}}, where open_time and
+            close_time are the timestamps of the most recent entry available, or (0, 0) if there are no records
+            for that symbol.
         """
         output = {}
-        with open(self.historical_filepath) as file:
-            data = json.load(file)
-            for interval in self.intervals:
-                if interval not in output:
-                    output[interval] = {}
-                for symbol in self.symbols:  # TODO: fix this ugly nesting
-                    if interval in data:
-                        if symbol in data[interval]:
-                            if len(data[interval][symbol]) > 0:
-                                latest = \
-                                    sorted(data[interval][symbol], key=lambda x: x['closeTimestamp'], reverse=True)[0]
-                                output[interval].update({symbol: (latest['openTimestamp'], latest['closeTimestamp'])})
-                            else:
-                                output[interval][symbol] = (0, 0)
-                        else:
-                            output[interval][symbol] = (0, 0)
-                    else:
-                        output[interval][symbol] = (0, 0)
-
+        for interval in self.intervals if intervals is None else intervals:
+            output[interval] = {}
+            for symbol in self.symbols:
+                latest = self.store.latest(interval, symbol)
+                output[interval][symbol] = (0, 0) if latest is None else latest
         return output
 
+    def price_graph(self) -> patterns.PriceGraph:
+        """
+        Graph of the current prices of all trading pairs, built on first use and updated in place afterwards.
+        Only the triangles through pairs whose price changed since the last call are re-checked.
+
+        Returns:
+            PriceGraph: The feed's price graph, with up to date prices
+        """
+        if self._price_graph is None:
+            self._price_graph = patterns.PriceGraph(
+                (info['symbol'], info['baseAsset'], info['quoteAsset']) for info in self.service.info(key='symbols'))
+        self._price_graph.update_many(self.current_price())
+        return self._price_graph
+
     def current_price_graph(self):
-        prices = self.current_price()
-        edges = list(map(
-            lambda x: [x['baseAsset'], x['quoteAsset'], prices[x['baseAsset'] + x['quoteAsset']]],
-            self.service.info(key='symbols')
-        ))
-        return patterns.DiGraph(edges=edges)
+        return self.price_graph().to_digraph(inverse=False)
 
     def get_historical_candlesticks(self, interval, symbol, start=None, end=None):
         return self.service.candlesticks(symbol, interval, start=start, end=end).to_json(orient='records')
 
     def current_price(self, symbol=None):
-        data = self.service.ticker_price(symbol=symbol)
+        data = self.service.decode(self.service.ticker_price(symbol=symbol))
         if symbol is None:
             return dict(map(lambda item: (item['symbol'], float(item['price'])), data))
         else:
-            return data['price']
+            return float(data['price'])
 
-    def update_local_historical_data(self):
+    def update_local_historical_data(self, workers: int = 8, on_progress=None, derive: bool = True):
         """
         Brings locally stored historical data for all chosen symbols up to date.
+
+        Args:
+            workers (int): Number of pages downloaded concurrently
+            on_progress: Called periodically with a BackfillProgress object
+            derive (bool): Download only 1m candlesticks and build those of the other intervals from them,
+                instead of downloading every interval
+
+        Returns:
+            BackfillProgress: Counters describing the completed backfill
+        """
+        def store(interval, symbol, candlesticks):
+            self.store.append(interval, symbol, candlesticks)
+            logger.debug("Interval {}; Symbol {}; Close Time {}".format(interval, symbol,
+                                                                        candlesticks['closeTimestamp'][-1]))
+
+        backfill = Backfill(self.service, store, workers=workers, on_progress=on_progress)
+        try:
+            if not derive:
+                return backfill.run(self.most_recent())
+            progress = backfill.run(self.most_recent([aggregation.BASE_INTERVAL]))
+            for symbol in self.symbols:
+                aggregation.derive(self.store, symbol, self.intervals)
+            return progress
+        finally:
+            self.store.flush()
+
+    # region Streaming
+    def start_stream(self, channels=CHANNELS, url: str = STREAM_URL, streams_per_connection: int = MAX_STREAMS,
+                     **kwargs) -> list:
         """
-        latest_timestamps = self.most_recent()
-        path = self.historical_filepath
-        with open(path, 'r') as file:
-            data = json.load(file)
-            for interval in self.intervals:
-                if interval not in data:
-                    data[interval] = {}
-                for symbol in self.symbols:
-                    if symbol not in data[interval]:
-                        data[interval][symbol] = []
-                    candlesticks = data[interval][symbol]
-                    open_time, close_time = latest_timestamps[interval][symbol]
-                    while (time.time() * 1000) - close_time > close_time - open_time:
-                        # TODO: verify out of date using a better method
-                        new_candlesticks = self.service.candlesticks(symbol, interval, start=close_time)
-                        open_time = new_candlesticks[-1]['openTimestamp']
-                        close_time = new_candlesticks[-1]['closeTimestamp']
-                        candlesticks.extend(new_candlesticks)
-                        logger.debug("Interval {}; Symbol {}; Close Time {}".format(interval, symbol, close_time))
-        with open(path, 'w') as file:
-            json.dump(data, file, indent=2)
-
-    def next(self):
-        pass
+        Start streaming the feed's symbols and intervals over WebSocket on background threads, instead of polling
+        REST. Events are queued until `next` publishes them. Binance caps the streams of a connection, so the
+        symbols are split across as many connections as needed.
+
+        Args:
+            channels: Any of 'kline', 'trade', 'bookTicker' and 'depth'
+            url: Address of the combined stream endpoint
+            streams_per_connection: Maximum number of streams on each connection, at most MAX_STREAMS
+            **kwargs: Further arguments of MarketStream
+
+        Returns:
+            list: The running MarketStreams
+        """
+        if self.streams:
+            raise RuntimeError("The feed is already streaming.")
+        for symbols in group_symbols(self.symbols, self.intervals, channels, min(streams_per_connection, MAX_STREAMS)):
+            stream = MarketStream(symbols, self.intervals, channels=channels,
+                                  sink=lambda *event: self._stream_events.put(event), service=self.service,
+                                  url=url, **kwargs)
+            stream.start()
+            self.streams.append(stream)
+        logger.debug("Streaming {} symbols over {} connections".format(len(self.symbols), len(self.streams)))
+        return self.streams
+
+    def order_book(self, symbol: str) -> OrderBook:
+        """
+        Order book of a symbol, kept up to date by the 'depth' events this feed publishes.
+        Start the stream with the 'depth' channel for it to receive updates.
+
+        Returns:
+            OrderBook: The symbol's book, created and subscribed on first use
+        """
+        if symbol not in self._order_books:
+            self._order_books[symbol] = OrderBook(symbol, service=self.service)
+            self.subscribe(self._order_books[symbol], 'depth', symbol)
+        return self._order_books[symbol]
+
+    def stop_stream(self, timeout: float = None) -> None:
+        for stream in self.streams:
+            stream.stop(timeout)
+        self.streams = []
+
+    def next(self, timeout: float = None) -> bool:
+        """
+        Publish the next streamed event, with the topic (event type, symbol, interval), on the calling thread.
+
+        Args:
+            timeout: Maximum number of seconds to wait for an event, or None to wait indefinitely
+
+        Returns:
+            bool: False if the feed is not streaming or no event arrived in time
+        """
+        if not self.streams and self._stream_events.empty():
+            return False
+        try:
+            event_type, symbol, interval, state = self._stream_events.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        self.publish(state, event_type, symbol, interval)
+        return True
+
+    # endregion
@@ -0,0 +1,347 @@
+"""
+Streaming market data from Binance's combined WebSocket streams.
+
+A MarketStream subscribes to the kline, trade and bookTicker streams of a set of symbols over one connection,
+decodes every frame and passes it to a sink as (event type, symbol, interval, state), the topic and state an
+Observable publishes. Closed klines are emitted as 'kline' events carrying the same Candle records a backtest
+Feed replays, so strategies run unchanged on both; klines still in progress are emitted as 'kline_partial'.
+
+Dropped connections are re-established with exponential backoff. Klines closed while disconnected, or skipped by
+the stream, are fetched from the REST `candlesticks` endpoint and emitted in order before the next live one.
+
+A UserDataStream follows the account events of a listen key (order updates, balance changes) the same way, keeping
+the key alive and calling back after every connection so its consumer can reconcile what it missed.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+import aiohttp
+
+from crizzle.envs.backtest.feed import Candle
+from crizzle.services.binance import INTERVAL_MILLISECONDS, CANDLESTICK_LIMIT
+
+logger = logging.getLogger(__name__)
+
+STREAM_URL = 'wss://stream.binance.com:9443/stream'
+USER_STREAM_URL = 'wss://stream.binance.com:9443/ws'
+CHANNELS = ('kline', 'trade', 'bookTicker')
+MAX_STREAMS = 1024  # Streams Binance allows on a single connection
+
+Trade = namedtuple('Trade', ['symbol', 'tradeId', 'price', 'quantity', 'timestamp', 'isBuyerMaker'])
+BookTicker = namedtuple('BookTicker', ['symbol', 'updateId', 'bidPrice', 'bidQuantity', 'askPrice', 'askQuantity'])
+# Changed levels of an order book, as (price, quantity) pairs; a quantity of 0 removes the level.
+DepthUpdate = namedtuple('DepthUpdate', ['symbol', 'firstUpdateId', 'finalUpdateId', 'bids', 'asks'])
+
+
+def stream_names(symbols, intervals, channels=CHANNELS) -> list:
+    """
+    Names of the streams to subscribe to, for example 'ethbtc@kline_1m'.
+    """
+    names = []
+    for symbol in symbols:
+        symbol = symbol.lower()
+        for channel in channels:
+            if channel == 'kline':
+                names.extend('{}@kline_{}'.format(symbol, interval) for interval in intervals)
+            elif channel == 'depth':
+                names.append('{}@depth@100ms'.format(symbol))
+            else:
+                names.append('{}@{}'.format(symbol, channel))
+    return names
+
+
+def group_symbols(symbols, intervals, channels=CHANNELS, limit: int = MAX_STREAMS) -> list:
+    """
+    Split symbols into groups whose streams fit on one connection each, keeping every symbol's streams together.
+
+    Args:
+        symbols: Symbols to stream
+        intervals: Kline intervals to stream
+        channels: Channels to stream
+        limit: Maximum number of streams per connection
+
+    Returns:
+        list: Lists of symbols, one per connection
+    """
+    symbols = list(symbols)
+    per_symbol = len(stream_names(['symbol'], intervals, channels))
+    if per_symbol > limit:
+        raise ValueError("Each symbol needs {} streams, more than the {} allowed on a connection.".format(
+            per_symbol, limit))
+    size = max(limit // per_symbol if per_symbol else len(symbols), 1)
+    return [symbols[start:start + size] for start in range(0, len(symbols), size)]
+
+
+def decode_message(data: dict):
+    """
+    Decode the payload of a stream frame.
+
+    Args:
+        data: Payload, the 'data' member of a combined stream frame
+
+    Returns:
+        tuple: (event type, symbol, interval, state), or None for payloads of unknown streams
+    """
+    event = data.get('e')
+    if event == 'kline':
+        kline = data['k']
+        candle = Candle(kline['i'], kline['s'], kline['t'], float(kline['o']), float(kline['h']), float(kline['l']),
+                        float(kline['c']), float(kline['v']), kline['T'], float(kline['q']), kline['n'],
+                        float(kline['V']), float(kline['Q']))
+        return 'kline' if kline['x'] else 'kline_partial', candle.symbol, candle.interval, candle
+    if event == 'trade':
+        return 'trade', data['s'], None, Trade(data['s'], data['t'], float(data['p']), float(data['q']), data['T'],
+                                               data['m'])
+    if event == 'depthUpdate':
+        return 'depth', data['s'], None, DepthUpdate(data['s'], data['U'], data['u'],
+                                                     [(float(price), float(quantity)) for price, quantity in data['b']],
+                                                     [(float(price), float(quantity)) for price, quantity in data['a']])
+    if event is None and 'u' in data and 'b' in data:
+        return 'bookTicker', data['s'], None, BookTicker(data['s'], data['u'], float(data['b']), float(data['B']),
+                                                         float(data['a']), float(data['A']))
+    return None
+
+
+class MarketStream:
+    def __init__(self, symbols, intervals=('1m',), channels=CHANNELS, sink=None, service=None, url: str = STREAM_URL,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0):
+        """
+        Args:
+            symbols: Symbols to stream
+            intervals: Kline intervals to stream
+            channels: Any of 'kline', 'trade', 'bookTicker' and 'depth' (diff-depth updates for an OrderBook,
+                see crizzle.envs.order_book). Binance allows at most 1024 streams per
+                connection, one per symbol for each channel and, for klines, each interval
+            sink: Called as sink(event type, symbol, interval, state) with every event, on the stream's event loop
+            service: Binance service used to backfill klines missed while disconnected, or None not to backfill
+            url: Address of the combined stream endpoint
+            reconnect_delay: Seconds to wait before the first reconnection attempt
+            max_reconnect_delay: Maximum seconds between attempts; the delay doubles after every failure
+        """
+        self.streams = stream_names(symbols, intervals, channels)
+        if len(self.streams) > MAX_STREAMS:
+            raise ValueError("{} streams requested; Binance allows at most {} per connection. "
+                             "Split the symbols across several streams.".format(len(self.streams), MAX_STREAMS))
+        self.sink = sink
+        self.service = service
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connections = 0
+        self.backfilled = 0
+        self.last_open = {}  # (symbol, interval) -> open time of the last closed kline emitted
+        self._stopping = False
+        self._websocket = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        return '{}?streams={}'.format(self.url, '/'.join(self.streams))
+
+    # region Connection
+    async def run(self, session: aiohttp.ClientSession = None) -> None:
+        """
+        Stream until `close` or `stop` is called, reconnecting whenever the connection drops.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        own_session = session is None
+        session = aiohttp.ClientSession() if own_session else session
+        delay = self.reconnect_delay
+        try:
+            while not self._stopping:
+                try:
+                    address = await self.endpoint()
+                    async with session.ws_connect(address, heartbeat=30) as websocket:
+                        self._websocket = websocket
+                        self.connections += 1
+                        delay = self.reconnect_delay
+                        logger.debug("Connected to {} streams at {}".format(len(self.streams), self.url))
+                        await self.on_connect()
+                        await self.consume(websocket)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as error:
+                    logger.warning("Stream connection failed: {}".format(error))
+                finally:
+                    self._websocket = None
+                if not self._stopping:
+                    logger.info("Stream disconnected; reconnecting in {:.1f}s".format(delay))
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            if own_session:
+                await session.close()
+
+    async def endpoint(self) -> str:
+        """
+        Address to connect to, looked up before every connection attempt.
+        """
+        return self.address
+
+    async def on_connect(self) -> None:
+        """
+        Called after every connection; catches up on the klines missed while disconnected.
+        """
+        if self.connections > 1:
+            await self.backfill_all()
+
+    async def consume(self, websocket) -> None:
+        async for message in websocket:
+            if message.type == aiohttp.WSMsgType.TEXT:
+                await self.handle_message(message.data)
+            elif message.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSE):
+                break
+
+    async def close(self) -> None:
+        """
+        Stop streaming, from within the stream's event loop.
+        """
+        self._stopping = True
+        if self._websocket is not None:
+            await self._websocket.close()
+
+    def start(self) -> threading.Thread:
+        """
+        Stream on a background thread with its own event loop.
+        """
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name='crizzle-stream', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stop a stream started with `start` and wait for its thread to finish.
+        """
+        self._stopping = True
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # endregion
+
+    # region Events
+    async def handle_message(self, text: str) -> None:
+        payload = json.loads(text)
+        decoded = decode_message(payload.get('data', payload))
+        if decoded is None:
+            logger.debug("Ignored stream message {}".format(text[:200]))
+            return
+        event_type, symbol, interval, state = decoded
+        if event_type == 'kline':
+            previous = self.last_open.get((symbol, interval))
+            if previous is not None and state.openTimestamp > previous + INTERVAL_MILLISECONDS[interval]:
+                await self.backfill(symbol, interval, end=state.openTimestamp)
+            if state.openTimestamp <= self.last_open.get((symbol, interval), -1):
+                return  # Already emitted by a backfill
+            self.last_open[(symbol, interval)] = state.openTimestamp
+        self.emit(event_type, symbol, interval, state)
+
+    def emit(self, event_type: str, symbol: str, interval, state) -> None:
+        if self.sink is not None:
+            self.sink(event_type, symbol, interval, state)
+
+    async def backfill_all(self) -> None:
+        """
+        Fetch the klines of every pair closed since the last one emitted.
+        """
+        for symbol, interval in list(self.last_open):
+            await self.backfill(symbol, interval)
+
+    async def backfill(self, symbol: str, interval: str, end: int = None) -> int:
+        """
+        Fetch and emit the closed klines of a pair opening after the last one emitted and before `end`.
+
+        Returns:
+            int: Number of klines emitted
+        """
+        if self.service is None:
+            return 0
+        emitted = 0
+        while True:
+            start = self.last_open[(symbol, interval)] + 1
+            records = await self._loop.run_in_executor(None, self._fetch, symbol, interval, start, end)
+            now = time.time() * 1000
+            for row in records.tolist():
+                candle = Candle._make((interval, symbol) + row)
+                if candle.closeTimestamp >= now or (end is not None and candle.openTimestamp >= end):
+                    break
+                self.last_open[(symbol, interval)] = candle.openTimestamp
+                self.emit('kline', symbol, interval, candle)
+                emitted += 1
+            else:
+                if len(records) == CANDLESTICK_LIMIT:
+                    continue  # More pages to fetch
+            break
+        self.backfilled += emitted
+        if emitted:
+            logger.info("Backfilled {} {} {} klines over REST".format(emitted, symbol, interval))
+        return emitted
+
+    def _fetch(self, symbol: str, interval: str, start: int, end: int = None):
+        end = None if end is None else end - 1
+        response = self.service.candlesticks(symbol, interval, limit=CANDLESTICK_LIMIT, start=start, end=end)
+        return self.service.decode_candlesticks(response)
+
+    # endregion
+
+
+class UserDataStream(MarketStream):
+    def __init__(self, service, sink=None, on_connect=None, url: str = USER_STREAM_URL, keepalive: float = 1800.0,
+                 **kwargs):
+        """
+        Args:
+            service: Binance service with an API key, used to open and keep alive the listen key
+            sink: Called as sink(event type, None, None, payload) with every account event, on the stream's event
+                loop, where payload is the decoded event, for example an 'executionReport'
+            on_connect: Called without arguments on an executor thread after every connection, before any event
+                of that connection is handled
+            url: Address of the raw stream endpoint, to which the listen key is appended
+            keepalive: Seconds between keepalive requests; Binance expires listen keys after 60 minutes
+            **kwargs: Further arguments of MarketStream
+        """
+        super(UserDataStream, self).__init__((), (), channels=(), sink=sink, service=service, url=url, **kwargs)
+        self.callback = on_connect
+        self.keepalive = keepalive
+        self.listen_key = None
+
+    @property
+    def address(self) -> str:
+        return '{}/{}'.format(self.url, self.listen_key)
+
+    async def endpoint(self) -> str:
+        # Returns the current key while it is valid, or a new one once it expired
+        response = await self._loop.run_in_executor(None, self.service.start_user_data_stream)
+        self.listen_key = self.service.decode(response)['listenKey']
+        return self.address
+
+    async def on_connect(self) -> None:
+        if self.callback is not None:
+            await self._loop.run_in_executor(None, self.callback)
+
+    async def consume(self, websocket) -> None:
+        keepalive = asyncio.ensure_future(self._keep_alive())
+        try:
+            await super(UserDataStream, self).consume(websocket)
+        finally:
+            keepalive.cancel()
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive)
+            try:
+                await self._loop.run_in_executor(None, self.service.keepalive_user_data_stream, self.listen_key)
+            except OSError as error:
+                logger.warning("Listen key keepalive failed: {}".format(error))
+
+    async def handle_message(self, text: str) -> None:
+        payload = json.loads(text)
+        event_type = payload.get('e')
+        if event_type == 'listenKeyExpired':
+            logger.info("Listen key expired; reconnecting with a new one")
+            await self._websocket.close()
+            return
+        self.emit(event_type, None, None, payload)
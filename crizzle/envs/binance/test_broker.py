@@ -0,0 +1,192 @@
+import json
+import asyncio
+from aiohttp import web
+from nose.tools import assert_raises
+
+from crizzle.patterns.observer import Observer
+from crizzle.envs.base import Broker as BaseBroker
+from crizzle.envs.binance.broker import Broker
+from crizzle.envs.binance.stream import UserDataStream
+
+
+def execution(client_order_id, status, execution_type, update_time, filled='0', last='0', trade_id=-1):
+    return {'e': 'executionReport', 'E': update_time, 's': 'ETHBTC', 'c': client_order_id, 'S': 'BUY',
+            'o': 'LIMIT', 'f': 'GTC', 'q': '2.0', 'p': '0.07', 'P': '0', 'F': '0', 'C': '', 'x': execution_type,
+            'X': status, 'i': 1, 'l': last, 'z': filled, 'L': '0.07', 'n': '0.001', 'N': 'ETH',
+            'T': update_time, 't': trade_id, 'm': True, 'O': 100, 'Z': '0', 'Y': '0.07'}
+
+
+class Recorder(Observer):
+    def __init__(self):
+        super(Recorder, self).__init__()
+        self.states = []
+
+    def handle(self, caller, state):
+        self.states.append(state)
+
+    def can_handle(self, caller, state):
+        return True
+
+
+class FakeService:
+    def __init__(self, open_orders=(), balances=(), trades=()):
+        self._open_orders = list(open_orders)
+        self._balances = list(balances)
+        self._trades = list(trades)
+        self.requests = []
+
+    def decode(self, response):
+        return response
+
+    def open_orders(self, symbol=None):
+        self.requests.append(('open_orders', symbol))
+        return [dict(order) for order in self._open_orders]
+
+    def account_info(self):
+        self.requests.append(('account_info',))
+        return {'balances': self._balances}
+
+    def query_order(self, symbol, order_id=None, original_client_order_id=None):
+        self.requests.append(('query_order', symbol, order_id))
+        return {'symbol': symbol, 'orderId': order_id, 'clientOrderId': 'a', 'status': 'FILLED', 'updateTime': 500}
+
+    def trade_list(self, symbol, limit=None, from_id=None):
+        self.requests.append(('trade_list', symbol, from_id))
+        trades = [trade for trade in self._trades if trade['symbol'] == symbol]
+        if from_id is None:
+            return trades[-limit:]
+        return [trade for trade in trades if trade['id'] >= from_id][:limit]
+
+    def order(self, symbol, side, order_type, quantity, **kwargs):
+        return {'symbol': symbol, 'orderId': 2, 'clientOrderId': kwargs['new_client_order_id'],
+                'transactTime': 300, 'status': 'NEW', 'fills': []}
+
+    def cancel_order(self, symbol, order_id=None, original_client_order_id=None):
+        return {'symbol': symbol, 'orderId': 2, 'origClientOrderId': original_client_order_id,
+                'clientOrderId': 'cancel', 'status': 'CANCELED'}
+
+    def start_user_data_stream(self):
+        self.requests.append(('start_user_data_stream',))
+        return {'listenKey': 'key'}
+
+
+def test_execution_reports():
+    broker = Broker(service=FakeService())
+    recorder = Recorder()
+    broker.subscribe(recorder, 'order', 'ETHBTC')
+    broker.handle_event(execution('a', 'NEW', 'NEW', 100))
+    broker.handle_event(execution('a', 'PARTIALLY_FILLED', 'TRADE', 200, filled='1.0', last='1.0', trade_id=7))
+    broker.handle_event(execution('a', 'PARTIALLY_FILLED', 'TRADE', 200, filled='1.0', last='1.0', trade_id=7))
+    broker.handle_event(execution('a', 'NEW', 'NEW', 100))  # Stale
+    assert broker.order('a')['status'] == 'PARTIALLY_FILLED'
+    assert broker.order(order_id=1)['executedQty'] == 1.0
+    assert [order['clientOrderId'] for order in broker.open_orders('ETHBTC')] == ['a']
+    assert len(broker.fills('ETHBTC')) == 1 and broker.fills('ETHBTC')[0]['commissionAsset'] == 'ETH'
+    broker.handle_event(execution('a', 'FILLED', 'TRADE', 300, filled='2.0', last='1.0', trade_id=8))
+    assert broker.open_orders() == []
+    assert len(broker.fills('ETHBTC')) == 2
+    assert [order['status'] for order in recorder.states] == \
+        ['NEW', 'PARTIALLY_FILLED', 'PARTIALLY_FILLED', 'FILLED']
+
+    broker.handle_event({'e': 'outboundAccountPosition', 'B': [{'a': 'ETH', 'f': '2.0', 'l': '0.5'}]})
+    broker.handle_event({'e': 'balanceUpdate', 'a': 'ETH', 'd': '1.0'})
+    assert broker.balance('ETH') == {'free': 3.0, 'locked': 0.5}
+    assert broker.position('ETH') == 3.5 and broker.free('BTC') == 0.0
+
+
+def test_reconcile_and_orders():
+    service = FakeService(open_orders=[{'symbol': 'ETHBTC', 'orderId': 3, 'clientOrderId': 'b', 'status': 'NEW',
+                                        'updateTime': 400}],
+                          balances=[{'asset': 'BTC', 'free': '1.0', 'locked': '0.0'}])
+    broker = Broker(service=service)
+    broker.handle_event(execution('a', 'NEW', 'NEW', 100))
+    broker.reconcile()
+    # 'a' closed while events were missed; its final state is queried
+    assert broker.order('a')['status'] == 'FILLED'
+    assert [order['clientOrderId'] for order in broker.open_orders()] == ['b']
+    assert broker.free('BTC') == 1.0
+    assert ('query_order', 'ETHBTC', 1) in service.requests
+
+    order = broker.submit('ETHBTC', 'BUY', 'LIMIT', 1, price=0.07, time_in_force='GTC', new_client_order_id='c')
+    assert order['updateTime'] == 300 and broker.order('c')['orderId'] == 2
+    assert len(broker.open_orders('ETHBTC')) == 2
+    assert broker.cancel('ETHBTC', client_order_id='c')['status'] == 'CANCELED'
+    assert 'c' not in [order['clientOrderId'] for order in broker.open_orders()]
+
+
+def trade(trade_id, order_id=1):
+    return {'symbol': 'ETHBTC', 'id': trade_id, 'orderId': order_id, 'price': 0.07, 'qty': 0.001,
+            'quoteQty': 0.00007, 'commission': 0.0, 'commissionAsset': 'ETH', 'time': trade_id, 'isBuyer': True,
+            'isMaker': True, 'isBestMatch': True}
+
+
+def trade_lists(service):
+    return [request for request in service.requests if request[0] == 'trade_list']
+
+
+def test_reconcile_fills():
+    # Fills 8 to 1507 were missed; they take two pages from the last recorded trade id
+    service = FakeService(trades=[trade(trade_id) for trade_id in range(5, 1508)])
+    broker = Broker(service=service)
+    broker.handle_event(execution('a', 'PARTIALLY_FILLED', 'TRADE', 100, filled='1.0', last='1.0', trade_id=7))
+    recorder = Recorder()
+    broker.subscribe(recorder, 'fill', 'ETHBTC')
+    broker.reconcile()
+    assert trade_lists(service) == [('trade_list', 'ETHBTC', 8), ('trade_list', 'ETHBTC', 1008)]
+    fills = broker.fills('ETHBTC')
+    assert [fill['tradeId'] for fill in fills] == list(range(7, 1508))
+    assert fills[-1]['clientOrderId'] == 'a' and len(recorder.states) == 1500
+    assert broker.last_trade_id('ETHBTC') == 1507 and broker.symbols == ['ETHBTC']
+    assert_raises(TypeError, BaseBroker)  # reconcile is abstract
+
+    # A symbol without recorded fills gets its most recent ones
+    broker.reconcile(['ETHBTC', 'LTCBTC'])
+    assert trade_lists(service)[-2:] == [('trade_list', 'ETHBTC', 1508), ('trade_list', 'LTCBTC', None)]
+    assert len(broker.fills('ETHBTC')) == 1501 and broker.fills('LTCBTC') == []
+
+
+def test_user_data_stream_reconciles_on_connect():
+    connections = []
+    frames = [[execution('a', 'NEW', 'NEW', 100), {'e': 'listenKeyExpired', 'E': 0}],
+              [execution('a', 'FILLED', 'TRADE', 200, filled='2.0', last='2.0', trade_id=1)]]
+
+    async def handler(request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        connections.append(request.match_info['key'])
+        for frame in frames[len(connections) - 1]:
+            await websocket.send_str(json.dumps(frame))
+        if len(connections) == 1:
+            await websocket.receive()  # Wait for the client to hang up on the expired key
+        await websocket.close()
+        return websocket
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/ws/{key}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        service = FakeService()
+        broker = Broker(service=service)
+
+        def sink(event_type, symbol, interval, event):
+            broker.handle_event(event)
+            if event['X'] == 'FILLED':
+                asyncio.ensure_future(stream.close())
+
+        stream = UserDataStream(service, sink=sink, on_connect=broker.reconcile,
+                                url='http://127.0.0.1:{}/ws'.format(port), reconnect_delay=0.01)
+        try:
+            await asyncio.wait_for(stream.run(), timeout=10)
+        finally:
+            await runner.cleanup()
+        return broker, service
+
+    broker, service = asyncio.run(main())
+    assert connections == ['key', 'key']
+    assert broker.reconciliations == 2
+    assert service.requests.count(('start_user_data_stream',)) == 2
+    assert broker.order('a')['status'] == 'FILLED' and len(broker.fills('ETHBTC')) == 1
@@ -0,0 +1,112 @@
+import json
+import asyncio
+from aiohttp import web
+from nose.tools import assert_raises
+
+from crizzle.envs.candlestick_store import to_records
+from crizzle.envs.binance.stream import MarketStream, Trade, BookTicker, decode_message, stream_names, group_symbols, \
+    MAX_STREAMS
+
+MINUTE = 60000
+
+
+def kline(minute, closed=True):
+    return {'stream': 'ethbtc@kline_1m', 'data': {
+        'e': 'kline', 'E': 0, 's': 'ETHBTC', 'k': {
+            't': minute * MINUTE, 'T': (minute + 1) * MINUTE - 1, 's': 'ETHBTC', 'i': '1m', 'o': '1.0', 'c': '2.0',
+            'h': '2.5', 'l': '0.5', 'v': '10.0', 'n': 7, 'x': closed, 'q': '20.0', 'V': '4.0', 'Q': '8.0'}}}
+
+
+TRADE = {'stream': 'ethbtc@trade', 'data': {'e': 'trade', 'E': 0, 's': 'ETHBTC', 't': 12345, 'p': '0.07',
+                                             'q': '1.5', 'T': 100, 'm': True, 'M': True}}
+BOOK_TICKER = {'stream': 'ethbtc@bookTicker', 'data': {'u': 400900217, 's': 'ETHBTC', 'b': '0.069', 'B': '31.2',
+                                                       'a': '0.071', 'A': '40.7'}}
+
+# Frames sent on each connection; the server hangs up after each list
+CONNECTIONS = [[kline(0), TRADE, kline(1, closed=False), BOOK_TICKER, kline(1), {'result': None, 'id': 1}],
+               [kline(4)]]
+
+
+class FakeService:
+    def __init__(self):
+        self.requests = []
+
+    def candlesticks(self, symbol, interval, limit=None, start=None, end=None):
+        self.requests.append((symbol, interval, start, end))
+        return [[m * MINUTE, 1.0, 2.5, 0.5, 2.0, 10.0, (m + 1) * MINUTE - 1, 20.0, 7, 4.0, 8.0, '0']
+                for m in range(start // MINUTE + 1, 4)]
+
+    def decode_candlesticks(self, response):
+        return to_records(response)
+
+
+def test_decode_message():
+    assert stream_names(['ETHBTC'], ['1m', '1h'], ['kline', 'trade']) == \
+        ['ethbtc@kline_1m', 'ethbtc@kline_1h', 'ethbtc@trade']
+    event_type, symbol, interval, candle = decode_message(kline(3)['data'])
+    assert (event_type, symbol, interval) == ('kline', 'ETHBTC', '1m')
+    assert candle.openTimestamp == 3 * MINUTE and candle.close == 2.0 and candle.numberOfTrades == 7
+    assert decode_message(kline(3, closed=False)['data'])[0] == 'kline_partial'
+    assert decode_message(TRADE['data']) == ('trade', 'ETHBTC', None, Trade('ETHBTC', 12345, 0.07, 1.5, 100, True))
+    assert decode_message(BOOK_TICKER['data'])[3] == BookTicker('ETHBTC', 400900217, 0.069, 31.2, 0.071, 40.7)
+    assert decode_message({'result': None, 'id': 1}) is None
+
+
+def test_stream_limit():
+    symbols = ['SYM{}'.format(index) for index in range(500)]
+    intervals = ['1m', '5m', '1h']
+    groups = group_symbols(symbols, intervals)  # 5 streams per symbol
+    assert [len(group) for group in groups] == [204, 204, 92]
+    assert sum(groups, []) == symbols
+    assert all(len(stream_names(group, intervals)) <= MAX_STREAMS for group in groups)
+    assert [len(group) for group in group_symbols(symbols[:10], intervals, limit=20)] == [4, 4, 2]
+    assert_raises(ValueError, group_symbols, symbols, intervals, limit=4)
+    assert_raises(ValueError, MarketStream, symbols, intervals)
+    assert len(MarketStream(groups[0], intervals).streams) == 1020
+
+
+def test_reconnect_and_backfill():
+    connections = []
+
+    async def handler(request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        connections.append(request.query['streams'])
+        for frame in CONNECTIONS[min(len(connections), len(CONNECTIONS)) - 1]:
+            await websocket.send_str(json.dumps(frame))
+        await websocket.close()
+        return websocket
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/stream', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        events = []
+        service = FakeService()
+
+        def sink(event_type, symbol, interval, state):
+            events.append((event_type, state))
+            if event_type == 'kline' and state.openTimestamp == 4 * MINUTE:
+                asyncio.ensure_future(stream.close())
+
+        stream = MarketStream(['ETHBTC'], ['1m'], sink=sink, service=service,
+                              url='http://127.0.0.1:{}/stream'.format(port), reconnect_delay=0.01)
+        try:
+            await asyncio.wait_for(stream.run(), timeout=10)
+        finally:
+            await runner.cleanup()
+        return stream, service, events
+
+    stream, service, events = asyncio.run(main())
+    assert connections[0] == 'ethbtc@kline_1m/ethbtc@trade/ethbtc@bookTicker'
+    assert stream.connections == 2
+    assert [event_type for event_type, _ in events] == \
+        ['kline', 'trade', 'kline_partial', 'bookTicker', 'kline', 'kline', 'kline', 'kline']
+    klines = [state.openTimestamp // MINUTE for event_type, state in events if event_type == 'kline']
+    assert klines == [0, 1, 2, 3, 4]
+    assert stream.backfilled == 2
+    assert service.requests[0] == ('ETHBTC', '1m', MINUTE + 1, None)
@@ -0,0 +1,342 @@
+"""
+Column-oriented, append-only on-disk storage for candlesticks.
+
+Each (interval, symbol) pair is stored in its own directory, ``<root>/<interval>/<symbol>/``, holding one ``.npy``
+file per field of `CANDLESTICK_DTYPE`, for example ``close.npy``. Appending writes only the new values at the end of
+each column and then updates the row count in the file headers, which NumPy pads so they can be rewritten in
+place. Reading memory-maps the columns without copying them, so reading one field costs only that field. Files are
+plain NumPy arrays and can be opened with ``np.load(path, mmap_mode='r')`` outside of crizzle.
+
+A sidecar ``<root>/index.json`` records the row count and latest open/close time of every pair, so the state of
+the store can be queried without opening any candlestick file.
+"""
+import os
+import json
+import time
+import logging
+import numpy as np
+from numpy.lib import format as npy
+
+from crizzle.services.binance import CANDLESTICK_FIELDS, CANDLESTICK_DTYPE
+
+logger = logging.getLogger(__name__)
+
+
+def to_records(rows) -> np.ndarray:
+    """
+    Convert candlesticks to an array of `CANDLESTICK_DTYPE` records.
+
+    Args:
+        rows: Structured array, list of kline rows as returned by the API, or list of dicts keyed by field name
+
+    Returns:
+        np.ndarray: Structured array
+    """
+    if isinstance(rows, np.ndarray):
+        return rows.astype(CANDLESTICK_DTYPE, copy=False)
+    records = np.empty(len(rows), dtype=CANDLESTICK_DTYPE)
+    if len(rows) == 0:
+        return records
+    if isinstance(rows[0], dict):
+        columns = [[row[field] for row in rows] for field in CANDLESTICK_FIELDS]
+    else:
+        columns = list(zip(*rows))
+    for field, column in zip(CANDLESTICK_FIELDS, columns):
+        records[field] = column
+    return records
+
+
+def stack(columns: dict) -> np.ndarray:
+    """
+    Gather columns of every field into a new array of `CANDLESTICK_DTYPE` records.
+
+    Args:
+        columns: Array of each field of `CANDLESTICK_FIELDS`, all of the same length
+
+    Returns:
+        np.ndarray: Structured array
+    """
+    records = np.empty(len(columns[CANDLESTICK_FIELDS[0]]), dtype=CANDLESTICK_DTYPE)
+    for field in CANDLESTICK_FIELDS:
+        records[field] = columns[field]
+    return records
+
+
+def _read_header(file) -> tuple:
+    """
+    Returns:
+        tuple: (number of rows, offset of the data) of an open ``.npy`` column
+    """
+    file.seek(0)
+    npy.read_magic(file)
+    shape, fortran_order, dtype = npy.read_array_header_1_0(file)
+    return shape[0], file.tell()
+
+
+def _write_header(file, dtype: np.dtype, count: int) -> int:
+    """
+    Write the header of a ``.npy`` column of `count` rows at the start of an open file.
+
+    Returns:
+        int: Offset of the data
+    """
+    file.seek(0)
+    npy.write_array_header_1_0(file, {'descr': npy.dtype_to_descr(dtype), 'fortran_order': False,
+                                      'shape': (count,)})
+    return file.tell()
+
+
+class CandlestickStore:
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, root: str, index_flush_interval: float = 5):
+        """
+        Args:
+            root: Directory holding one subdirectory per interval
+            index_flush_interval: Maximum number of seconds the index file may lag behind appends
+        """
+        self.root = root
+        self.index_flush_interval = index_flush_interval
+        os.makedirs(self.root, exist_ok=True)
+        self._index = self.load_index()
+        self._index_flushed = time.time()
+        self._index_dirty = False
+
+    # region Index
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, self.INDEX_FILE)
+
+    def index_entry(self, interval: str, symbol: str) -> dict:
+        """
+        Describe the stored candlesticks of a pair from their file.
+
+        Returns:
+            dict: Dictionary of the format {'count': int, 'open': int, 'close': int}
+        """
+        last = self.last(interval, symbol)
+        if last is None:
+            return {'count': 0, 'open': 0, 'close': 0}
+        return {'count': self.count(interval, symbol),
+                'open': int(last['openTimestamp']), 'close': int(last['closeTimestamp'])}
+
+    def load_index(self) -> dict:
+        """
+        Load the index file, rebuilding entries of pairs whose row count does not match
+        (for example after a crash between an append and the next index flush).
+
+        Returns:
+            dict: Dictionary of the format {interval: {symbol: {'count': int, 'open': int, 'close': int}}}
+        """
+        index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as file:
+                    index = json.load(file)
+            except json.JSONDecodeError:
+                logger.warning("Rebuilding corrupt candlestick index at {}".format(self.index_path))
+        for interval in list(index):
+            for symbol in list(index[interval]):
+                if not os.path.exists(self.path(interval, symbol)):
+                    del index[interval][symbol]
+        for interval, symbol in self.pairs():
+            entry = index.get(interval, {}).get(symbol)
+            if entry is None or entry['count'] != self.count(interval, symbol):
+                index.setdefault(interval, {})[symbol] = self.index_entry(interval, symbol)
+        return index
+
+    def flush(self) -> None:
+        """
+        Write the index file, replacing the previous one atomically.
+        """
+        temporary_path = self.index_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(self._index, file)
+        os.replace(temporary_path, self.index_path)
+        self._index_flushed = time.time()
+        self._index_dirty = False
+
+    def latest(self, interval: str, symbol: str):
+        """
+        Open and close time of the most recent candlestick of a pair, from the index.
+
+        Returns:
+            tuple: (open_time, close_time), or None if nothing is stored
+        """
+        entry = self._index.get(interval, {}).get(symbol)
+        return None if entry is None else (entry['open'], entry['close'])
+
+    # endregion
+
+    def close(self) -> None:
+        if self._index_dirty:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def path(self, interval: str, symbol: str) -> str:
+        """
+        Directory holding the columns of a pair.
+        """
+        return os.path.join(self.root, interval, symbol)
+
+    def column_path(self, interval: str, symbol: str, field: str) -> str:
+        return os.path.join(self.path(interval, symbol), field + '.npy')
+
+    def pairs(self):
+        """
+        Yields:
+            (interval, symbol) of every pair with columns in the store
+        """
+        for interval in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, interval)
+            if os.path.isdir(directory):
+                for symbol in sorted(os.listdir(directory)):
+                    if os.path.exists(self.column_path(interval, symbol, CANDLESTICK_FIELDS[0])):
+                        yield interval, symbol
+
+    def __len__(self):
+        return sum(1 for _ in self.pairs())
+
+    def count(self, interval: str, symbol: str) -> int:
+        """
+        Number of complete candlesticks stored for a pair: the fewest rows of any column, since an interrupted
+        append may have updated only some of them.
+        """
+        counts = []
+        for field in CANDLESTICK_FIELDS:
+            path = self.column_path(interval, symbol, field)
+            if not os.path.exists(path):
+                return 0
+            with open(path, 'rb') as file:
+                counts.append(_read_header(file)[0])
+        return min(counts)
+
+    def columns(self, interval: str, symbol: str, fields=None, start: int = None, end: int = None) -> dict:
+        """
+        Memory-map columns of a pair, without copying them.
+
+        Args:
+            interval: Candlestick interval
+            symbol: Trading symbol
+            fields: Fields to map, by default all of `CANDLESTICK_FIELDS`
+            start: Only include candlesticks opening at or after this millisecond timestamp
+            end: Only include candlesticks opening before this millisecond timestamp
+
+        Returns:
+            dict: Read-only array of each field, ordered by open time
+        """
+        fields = CANDLESTICK_FIELDS if fields is None else fields
+        count = self.count(interval, symbol)
+        if count == 0:
+            return {field: np.empty(0, dtype=CANDLESTICK_DTYPE[field]) for field in fields}
+        first, last = 0, count
+        if start is not None or end is not None:
+            open_times = self._map(interval, symbol, 'openTimestamp', count)
+            first = 0 if start is None else int(np.searchsorted(open_times, start, side='left'))
+            last = count if end is None else int(np.searchsorted(open_times, end, side='left'))
+        return {field: self._map(interval, symbol, field, count)[first:last] for field in fields}
+
+    def _map(self, interval: str, symbol: str, field: str, count: int) -> np.memmap:
+        path = self.column_path(interval, symbol, field)
+        with open(path, 'rb') as file:
+            offset = _read_header(file)[1]
+        return np.memmap(path, dtype=CANDLESTICK_DTYPE[field], mode='r', offset=offset, shape=(count,))
+
+    def read(self, interval: str, symbol: str, start: int = None, end: int = None) -> np.ndarray:
+        """
+        Candlesticks of a pair as records, gathered from the columns into a new array. Use `columns` to read
+        fields without copying them.
+
+        Args:
+            interval: Candlestick interval
+            symbol: Trading symbol
+            start: Only include candlesticks opening at or after this millisecond timestamp
+            end: Only include candlesticks opening before this millisecond timestamp
+
+        Returns:
+            np.ndarray: Structured array of `CANDLESTICK_DTYPE` records, ordered by open time
+        """
+        return stack(self.columns(interval, symbol, start=start, end=end))
+
+    def last(self, interval: str, symbol: str):
+        """
+        Most recent candlestick of a pair, or None if nothing is stored.
+        """
+        count = self.count(interval, symbol)
+        if count == 0:
+            return None
+        record = np.empty(1, dtype=CANDLESTICK_DTYPE)
+        for field in CANDLESTICK_FIELDS:
+            record[field] = self._map(interval, symbol, field, count)[-1]
+        return record[0]
+
+    def append(self, interval: str, symbol: str, rows) -> int:
+        """
+        Append candlesticks to a pair. Candlesticks that are not newer than the last stored one are skipped.
+
+        Args:
+            interval: Candlestick interval
+            symbol: Trading symbol
+            rows: Candlesticks in any format accepted by `to_records`, ordered by open time
+
+        Returns:
+            int: Number of candlesticks written
+        """
+        records = to_records(rows)
+        latest = self.latest(interval, symbol)
+        if latest is not None:
+            records = records[records['openTimestamp'] > latest[0]]
+        if len(records) == 0:
+            return 0
+        os.makedirs(self.path(interval, symbol), exist_ok=True)
+        count = self.count(interval, symbol)
+        files = {}
+        try:
+            # Write the values first and the row counts last, so an interrupted append leaves the old counts
+            for field in CANDLESTICK_FIELDS:
+                path = self.column_path(interval, symbol, field)
+                file = files[field] = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+                dtype = CANDLESTICK_DTYPE[field]
+                offset = _read_header(file)[1] if os.path.getsize(path) else _write_header(file, dtype, 0)
+                file.truncate(offset + count * dtype.itemsize)  # drop values left behind by an interrupted append
+                file.seek(0, os.SEEK_END)
+                file.write(np.ascontiguousarray(records[field]).tobytes())
+            for field, file in files.items():
+                file.flush()
+                _write_header(file, CANDLESTICK_DTYPE[field], count + len(records))
+        finally:
+            for file in files.values():
+                file.close()
+        entry = self._index.setdefault(interval, {}).setdefault(symbol, {'count': 0})
+        entry.update({'count': count + len(records),
+                      'open': int(records['openTimestamp'][-1]), 'close': int(records['closeTimestamp'][-1])})
+        self._index_dirty = True
+        if time.time() - self._index_flushed >= self.index_flush_interval:
+            self.flush()
+        return len(records)
+
+    def import_json(self, path: str) -> int:
+        """
+        Copy candlesticks from a legacy JSON file of the format {interval: {symbol: [candlestick dicts]}}.
+
+        Args:
+            path: Path to the JSON file
+
+        Returns:
+            int: Number of candlesticks written
+        """
+        with open(path) as file:
+            data = json.load(file)
+        written = 0
+        for interval, symbols in data.items():
+            for symbol, candlesticks in symbols.items():
+                candlesticks = sorted(candlesticks, key=lambda candlestick: candlestick['openTimestamp'])
+                written += self.append(interval, symbol, candlesticks)
+        self.flush()
+        logger.info("Imported {} candlesticks from {}".format(written, path))
+        return written
@@ -0,0 +1,277 @@
+"""
+Local order book kept up to date from diff-depth updates.
+
+The book starts from a REST depth snapshot and applies the updates of the `<symbol>@depth` stream on top of it,
+following Binance's sequencing rules: updates whose last update id is not newer than the book's are stale, the
+first update applied must straddle the snapshot's id, and every following update must start right after the
+previous one ended. A break in the sequence means updates were lost, so the book marks itself out of sync,
+buffers updates and resyncs from a new snapshot.
+
+Each side keeps its price levels in a sorted list next to a dictionary of quantities, so the best price is the
+first element of the list and the top N levels are a slice of it.
+"""
+import bisect
+import logging
+import numpy as np
+
+from crizzle.patterns.observer import Observer
+
+logger = logging.getLogger(__name__)
+
+BIDS = 'bids'
+ASKS = 'asks'
+
+
+class BookSide:
+    """
+    Price levels of one side of a book, best first.
+    """
+
+    def __init__(self, descending: bool):
+        """
+        Args:
+            descending: Whether better prices are higher, as for bids
+        """
+        self.descending = descending
+        self._keys = []  # Prices in order from best to worst, negated if descending
+        self._quantities = {}
+
+    def set(self, price: float, quantity: float) -> None:
+        """
+        Set the quantity at a price level, removing the level if the quantity is 0.
+        """
+        key = -price if self.descending else price
+        if quantity == 0:
+            if self._quantities.pop(price, None) is not None:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+            return
+        if price not in self._quantities:
+            bisect.insort(self._keys, key)
+        self._quantities[price] = quantity
+
+    def clear(self) -> None:
+        self._keys = []
+        self._quantities = {}
+
+    def best(self):
+        """
+        Returns:
+            tuple: (price, quantity) of the best level, or None if the side is empty
+        """
+        if len(self._keys) == 0:
+            return None
+        price = -self._keys[0] if self.descending else self._keys[0]
+        return price, self._quantities[price]
+
+    def prices(self, levels: int = None) -> np.ndarray:
+        keys = np.array(self._keys[:levels], dtype=np.float64)
+        return -keys if self.descending else keys
+
+    def top(self, levels: int = None) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Array of shape (levels, 2) holding the price and quantity of the best levels
+        """
+        prices = self.prices(levels)
+        quantities = np.array([self._quantities[price] for price in prices.tolist()], dtype=np.float64)
+        return np.column_stack((prices, quantities))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, price):
+        return price in self._quantities
+
+
+class OrderBook(Observer):
+    def __init__(self, symbol: str, service=None, snapshot_limit: int = 1000):
+        """
+        Args:
+            symbol: Trading symbol of the book
+            service: Binance service whose `depth` endpoint provides snapshots, or None to load them with
+                `load_snapshot`
+            snapshot_limit: Number of levels per side requested in snapshots
+        """
+        super(OrderBook, self).__init__()
+        self.symbol = symbol
+        self.service = service
+        self.snapshot_limit = snapshot_limit
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = None
+        self.resyncs = 0
+        self._synced = False
+        self._first = True  # Whether no update was applied since the last snapshot
+        self._buffer = []
+
+    @property
+    def synced(self) -> bool:
+        return self._synced
+
+    # region Updates
+    def load_snapshot(self, snapshot: dict) -> None:
+        """
+        Replace the book's levels with a depth snapshot, then apply any buffered updates newer than it.
+
+        Args:
+            snapshot: Dictionary with 'lastUpdateId', 'bids' and 'asks', as returned by the depth endpoint
+        """
+        self.bids.clear()
+        self.asks.clear()
+        for price, quantity in snapshot['bids']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in snapshot['asks']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = snapshot['lastUpdateId']
+        self._synced = True
+        self._first = True
+        buffered, self._buffer = self._buffer, []
+        for update in buffered:
+            self.apply(update)
+        logger.debug("Loaded {} snapshot {} ({} bids, {} asks)".format(
+            self.symbol, self.last_update_id, len(self.bids), len(self.asks)))
+
+    def resync(self) -> None:
+        """
+        Load a new snapshot from the service.
+        """
+        self.resyncs += 1
+        self.load_snapshot(self.service.decode(self.service.depth(self.symbol, limit=self.snapshot_limit)))
+
+    def apply(self, update) -> bool:
+        """
+        Apply a diff-depth update in sequence.
+
+        Args:
+            update: DepthUpdate, or dictionary with the 'U', 'u', 'b' and 'a' keys of a depthUpdate event
+
+        Returns:
+            bool: Whether the update was applied; stale updates are skipped, and a gap in the sequence puts the
+            book out of sync, buffering the update until the next snapshot
+        """
+        first_id, final_id, bids, asks = _fields(update)
+        if not self._synced:
+            self._buffer.append(update)
+            return False
+        if final_id <= self.last_update_id:
+            return False
+        expected = self.last_update_id + 1
+        if first_id > expected or (not self._first and first_id != expected):
+            logger.warning("{} order book missed updates {} to {}; resyncing".format(
+                self.symbol, expected, first_id - 1))
+            self._synced = False
+            self._buffer = [update]
+            return False
+        for price, quantity in bids:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in asks:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = final_id
+        self._first = False
+        return True
+
+    def update(self, update) -> bool:
+        """
+        Apply an update, fetching a snapshot first if the book is out of sync and has a service.
+
+        Returns:
+            bool: Whether the book is in sync afterwards
+        """
+        self.apply(update)
+        if not self._synced and self.service is not None:
+            self.resync()
+        return self._synced
+
+    def handle(self, caller, state):
+        self.update(state)
+
+    def can_handle(self, caller, state) -> bool:
+        return getattr(state, 'symbol', None) == self.symbol and hasattr(state, 'finalUpdateId')
+
+    # endregion
+
+    # region Queries
+    def best_bid(self):
+        """
+        Returns:
+            tuple: (price, quantity) of the highest bid, or None
+        """
+        return self.bids.best()
+
+    def best_ask(self):
+        """
+        Returns:
+            tuple: (price, quantity) of the lowest ask, or None
+        """
+        return self.asks.best()
+
+    def spread(self) -> float:
+        bid, ask = self.bids.best(), self.asks.best()
+        return None if bid is None or ask is None else ask[0] - bid[0]
+
+    def mid_price(self) -> float:
+        bid, ask = self.bids.best(), self.asks.best()
+        return None if bid is None or ask is None else (ask[0] + bid[0]) / 2
+
+    def top(self, side: str, levels: int = None) -> np.ndarray:
+        """
+        Best levels of a side.
+
+        Args:
+            side: BIDS or ASKS
+            levels: Number of levels, or None for all of them
+
+        Returns:
+            np.ndarray: Array of shape (levels, 2) holding the price and quantity of each level, best first
+        """
+        return self._side(side).top(levels)
+
+    def cumulative_depth(self, side: str, levels: int = None) -> np.ndarray:
+        """
+        Quantity available at each of the best levels of a side or better.
+
+        Returns:
+            np.ndarray: Array of shape (levels, 2) holding the price of each level and the cumulative quantity
+        """
+        top = self._side(side).top(levels)
+        top[:, 1] = np.cumsum(top[:, 1])
+        return top
+
+    def fill_price(self, side: str, quantity: float) -> float:
+        """
+        Average price of taking a quantity from a side, walking through its levels.
+
+        Args:
+            side: ASKS to price a market buy, BIDS to price a market sell
+            quantity: Quantity of the base asset
+
+        Returns:
+            float: Average price, or None if the side does not hold that much
+        """
+        top = self._side(side).top()
+        cumulative = np.cumsum(top[:, 1])
+        levels = int(np.searchsorted(cumulative, quantity, side='left'))
+        if levels >= len(top):
+            return None
+        taken = top[:levels + 1, 1].copy()
+        taken[-1] -= cumulative[levels] - quantity
+        return float(np.dot(taken, top[:levels + 1, 0]) / quantity)
+
+    def _side(self, side: str) -> BookSide:
+        if side == BIDS:
+            return self.bids
+        if side == ASKS:
+            return self.asks
+        raise ValueError("Unknown book side '{}'.".format(side))
+
+    # endregion
+
+    def __repr__(self):
+        return '<OrderBook {} [{} bids, {} asks, update {}{}]>'.format(
+            self.symbol, len(self.bids), len(self.asks), self.last_update_id, '' if self._synced else ', out of sync')
+
+
+def _fields(update) -> tuple:
+    if isinstance(update, dict):
+        return update['U'], update['u'], update['b'], update['a']
+    return update.firstUpdateId, update.finalUpdateId, update.bids, update.asks
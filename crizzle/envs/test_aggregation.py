@@ -0,0 +1,104 @@
+import tempfile
+import numpy as np
+
+from crizzle.envs import aggregation
+from crizzle.envs.candlestick_store import CandlestickStore, to_records
+from crizzle.services.binance import AGGREGATED_TRADE_DTYPE
+
+MINUTE = 60000
+DAY = 86400000
+
+
+def minutes(first, last):
+    random = np.random.default_rng(first)
+    closes = 1 + random.random(last - first)
+    return to_records([[m * MINUTE, close - 0.1, close + 0.2, close - 0.3, close, 1.0, (m + 1) * MINUTE - 1,
+                        close, 2, 0.5, close / 2, '0'] for m, close in zip(range(first, last), closes)])
+
+
+def ms(text):
+    return int(np.datetime64(text, 'ms').astype(np.int64))
+
+
+def test_interval_boundaries():
+    assert aggregation.interval_start([ms('2024-01-03T12:34')], '1w')[0] == ms('2024-01-01')
+    assert aggregation.interval_start([ms('2024-01-01T00:00')], '1w')[0] == ms('2024-01-01')
+    assert aggregation.interval_start([ms('2024-02-15T08:00')], '1M')[0] == ms('2024-02-01')
+    assert aggregation.interval_close([ms('2024-02-01')], '1M')[0] == ms('2024-03-01') - 1
+    assert aggregation.interval_start([ms('2024-02-15T08:47')], '15m')[0] == ms('2024-02-15T08:45')
+    assert aggregation.interval_close([ms('2024-02-15T08:45')], '15m')[0] == ms('2024-02-15T09:00') - 1
+
+
+def test_aggregate():
+    candles = minutes(0, 12)
+    built, complete = aggregation.aggregate(candles, '5m')
+    assert list(built['openTimestamp'] // MINUTE) == [0, 5, 10]
+    assert list(built['closeTimestamp']) == [5 * MINUTE - 1, 10 * MINUTE - 1, 15 * MINUTE - 1]
+    assert list(complete) == [True, True, False]
+    assert built['open'][1] == candles['open'][5] and built['close'][1] == candles['close'][9]
+    assert built['high'][0] == candles['high'][:5].max() and built['low'][0] == candles['low'][:5].min()
+    assert built['numberOfTrades'][0] == 10 and np.isclose(built['volume'][2], 2.0)
+
+
+def test_incremental_matches_batch():
+    candles = minutes(0, 3 * 24 * 60 + 17)
+    aggregator = aggregation.CandleAggregator(['1m', '5m', '1h', '1d'])
+    completed = {interval: [] for interval in aggregator.intervals}
+    for first in range(0, len(candles), 97):
+        for interval, built in aggregator.add(candles[first:first + 97]).items():
+            completed[interval].append(built)
+    for interval in aggregator.intervals:
+        built, complete = aggregation.aggregate(candles, interval)
+        incremental = np.concatenate(completed[interval])
+        assert len(incremental) == complete.sum()
+        for field in built.dtype.names:  # Sums may be rounded differently
+            assert np.allclose(incremental[field], built[complete][field], rtol=1e-12)
+    partial = aggregator.partial('1d')
+    assert partial['openTimestamp'] == 3 * DAY and partial['closeTimestamp'] == 4 * DAY - 1
+    assert partial['high'] == candles['high'][3 * 24 * 60:].max()
+    assert aggregator.partial('5m') is not None
+
+
+def test_trades():
+    trades = np.zeros(5, dtype=AGGREGATED_TRADE_DTYPE)
+    trades['timestamp'] = [10, 20, MINUTE + 5, MINUTE + 6, 2 * MINUTE + 1]
+    trades['price'] = [1.0, 3.0, 2.0, 2.5, 4.0]
+    trades['quantity'] = [1.0, 1.0, 2.0, 2.0, 1.0]
+    trades['firstTradeId'] = [0, 1, 3, 4, 5]
+    trades['lastTradeId'] = [0, 2, 3, 4, 5]
+    trades['isBuyerMaker'] = [True, False, False, True, False]
+    aggregator = aggregation.CandleAggregator(['3m'])
+    completed = aggregator.add_trades(trades[:3])
+    assert len(completed['1m']) == 1
+    completed = aggregator.add_trades(trades[3:])
+    first, second = aggregation.aggregate_trades(trades[:2])[0], completed['1m'][0]
+    assert (first['open'], first['high'], first['close'], first['numberOfTrades']) == (1.0, 3.0, 3.0, 3)
+    assert first['takerBuyBaseAssetVolume'] == 1.0 and first['quoteAssetVolume'] == 4.0
+    assert second['openTimestamp'] == MINUTE and second['volume'] == 4.0 and second['low'] == 2.0
+
+
+def test_derive():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', minutes(0, 100))
+        assert aggregation.derive(store, 'ETHBTC', ['1m', '15m', '1h']) == {'15m': 6, '1h': 1}
+        store.append('1m', 'ETHBTC', minutes(100, 125))
+        assert aggregation.derive(store, 'ETHBTC', ['15m', '1h']) == {'15m': 2, '1h': 1}
+        built, _ = aggregation.aggregate(store.read('1m', 'ETHBTC'), '15m')
+        assert np.array_equal(np.asarray(store.read('15m', 'ETHBTC')), built[:8])
+
+
+def test_derive_without_new_data():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', minutes(0, 120))
+        assert aggregation.derive(store, 'ETHBTC', ['15m', '1h']) == {'15m': 8, '1h': 2}
+        assert aggregation.derive(store, 'ETHBTC', ['15m', '1h']) == {'15m': 0, '1h': 0}
+        assert aggregation.derive(store, 'LTCBTC', ['15m', '1h']) == {'15m': 0, '1h': 0}
+        assert len(store.read('15m', 'LTCBTC')) == 0
+    empty = minutes(0, 0)
+    built, complete = aggregation.aggregate(empty, '1h')
+    assert len(built) == 0 and len(complete) == 0
+    assert len(aggregation.aggregate_trades(np.zeros(0, dtype=AGGREGATED_TRADE_DTYPE))) == 0
+    aggregator = aggregation.CandleAggregator(['5m'])
+    assert len(aggregator.add(empty)['5m']) == 0 and aggregator.partial('5m') is None
@@ -0,0 +1,88 @@
+import requests
+
+from crizzle.envs.backfill import Backfill
+from crizzle.services.binance.decoding import decode_candlesticks
+
+MINUTE = 60000
+NOW = 100 * MINUTE + 30000  # halfway through the 101st minute
+
+
+class FakeResponse:
+    def __init__(self, rows, status_code=200):
+        self.rows = rows
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+
+class FakeService:
+    """
+    Serves one-minute candlesticks starting at `listed` until `NOW`, including the one still in progress.
+    """
+
+    def __init__(self, listed=10 * MINUTE, fail=()):
+        self.listed = listed
+        self.fail = set(fail)
+        self.calls = []
+
+    def candlesticks(self, symbol, interval, limit=None, start=None, end=None):
+        self.calls.append((symbol, start, end, limit))
+        if (symbol, start) in self.fail:
+            return FakeResponse([], status_code=500)
+        first = max(start, self.listed) // MINUTE
+        last = NOW // MINUTE if end is None else min(end, NOW) // MINUTE
+        rows = [[m * MINUTE, 1, 1, 1, 1, 1, (m + 1) * MINUTE - 1, 1, 1, 1, 1, 0]
+                for m in range(first, last + 1)]
+        return FakeResponse(rows[:limit])
+
+    def decode_candlesticks(self, response):
+        return decode_candlesticks(response.rows)
+
+
+def collect(backfill, latest):
+    stored = {}
+
+    def sink(interval, symbol, candlesticks):
+        stored.setdefault((interval, symbol), []).extend(candlesticks['openTimestamp'] // MINUTE)
+    backfill.sink = sink
+    progress = backfill.run(latest, now=NOW)
+    return stored, progress
+
+
+def test_plan_pages():
+    backfill = Backfill(FakeService(), None, limit=25)
+    pages = backfill.plan({'1m': {'ETHBTC': (0, 0), 'LTCBTC': (49 * MINUTE, 50 * MINUTE - 1)}}, now=NOW)
+    eth = [p for p in pages if p.symbol == 'ETHBTC']
+    ltc = [p for p in pages if p.symbol == 'LTCBTC']
+    assert [p.start // MINUTE for p in eth] == [10, 35, 60, 85]
+    assert [p.start // MINUTE for p in ltc] == [50, 75]
+    assert ltc[-1].end == 100 * MINUTE - 1
+
+
+def test_run_in_order():
+    service = FakeService()
+    stored, progress = collect(Backfill(service, None, workers=4, limit=7),
+                               {'1m': {'ETHBTC': (0, 0), 'LTCBTC': (0, 0)}})
+    for symbol in ('ETHBTC', 'LTCBTC'):
+        opens = stored['1m', symbol]
+        assert opens == list(range(10, 100))  # the candlestick still in progress at NOW is left out
+    assert progress.candlesticks == 180
+    assert progress.pages_done == progress.pages_total
+    assert not progress.failed
+
+
+def test_resume():
+    stored, progress = collect(Backfill(FakeService(), None, limit=7),
+                               {'1m': {'ETHBTC': (89 * MINUTE, 90 * MINUTE - 1)}})
+    assert stored['1m', 'ETHBTC'] == list(range(90, 100))
+
+
+def test_failed_pair_stops_at_gap():
+    service = FakeService(fail=[('ETHBTC', 24 * MINUTE)])
+    backfill = Backfill(service, None, limit=7, retries=0)
+    stored, progress = collect(backfill, {'1m': {'ETHBTC': (0, 0), 'LTCBTC': (0, 0)}})
+    assert stored['1m', 'ETHBTC'] == list(range(10, 24))
+    assert len(stored['1m', 'LTCBTC']) == 90
+    assert progress.failed == {('1m', 'ETHBTC')}
@@ -0,0 +1,110 @@
+import os
+import json
+import tempfile
+import numpy as np
+
+from crizzle.envs.candlestick_store import CandlestickStore, CANDLESTICK_DTYPE, CANDLESTICK_FIELDS
+
+MINUTE = 60000
+
+
+def rows(first, last):
+    return [[m * MINUTE, 1.5, 2.5, 0.5, 2.0, 10.0, (m + 1) * MINUTE - 1, 20.0, 7, 4.0, 8.0, '0']
+            for m in range(first, last)]
+
+
+def test_append_and_read():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        assert store.append('1m', 'ETHBTC', rows(0, 10)) == 10
+        assert store.append('1m', 'ETHBTC', rows(5, 15)) == 5  # overlap is skipped
+        records = store.read('1m', 'ETHBTC')
+        assert records.dtype == CANDLESTICK_DTYPE
+        assert list(records['openTimestamp'] // MINUTE) == list(range(15))
+        assert records['numberOfTrades'][0] == 7
+        assert records['close'][-1] == 2.0
+        assert store.count('1m', 'ETHBTC') == 15
+        assert list(store.pairs()) == [('1m', 'ETHBTC')]
+
+
+def test_columns():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', rows(0, 10))
+        store.append('1m', 'ETHBTC', rows(10, 20))
+        assert sorted(os.listdir(store.path('1m', 'ETHBTC'))) == sorted(field + '.npy' for field in CANDLESTICK_FIELDS)
+        closes = store.columns('1m', 'ETHBTC', ['close'], start=5 * MINUTE, end=15 * MINUTE)['close']
+        assert isinstance(closes, np.memmap) and not closes.flags.writeable
+        assert closes.dtype == np.float64 and closes.flags.c_contiguous and len(closes) == 10
+        # Columns are plain .npy files
+        open_times = np.load(store.column_path('1m', 'ETHBTC', 'openTimestamp'), mmap_mode='r')
+        assert list(open_times // MINUTE) == list(range(20))
+
+
+def test_read_range():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', rows(0, 100))
+        records = store.read('1m', 'ETHBTC', start=10 * MINUTE, end=20 * MINUTE)
+        assert list(records['openTimestamp'] // MINUTE) == list(range(10, 20))
+
+
+def test_empty_pair():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        assert store.last('1h', 'ETHBTC') is None
+        assert len(store.read('1h', 'ETHBTC')) == 0
+
+
+def test_interrupted_append():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root)
+        store.append('1m', 'ETHBTC', rows(0, 3))
+        # Values of an append whose row counts were never written, and one column whose count was
+        for field in CANDLESTICK_FIELDS:
+            with open(store.column_path('1m', 'ETHBTC', field), 'ab') as file:
+                file.write(b'\x00' * 5)
+        path = store.column_path('1m', 'ETHBTC', 'close')
+        column = np.load(path)
+        np.save(path, np.append(column, 9.0))
+        assert store.count('1m', 'ETHBTC') == 3
+        assert store.last('1m', 'ETHBTC')['openTimestamp'] == 2 * MINUTE
+        store.append('1m', 'ETHBTC', rows(3, 4))
+        assert list(store.read('1m', 'ETHBTC')['openTimestamp'] // MINUTE) == [0, 1, 2, 3]
+        assert list(store.columns('1m', 'ETHBTC', ['close'])['close']) == [2.0] * 4
+        assert len(np.load(path)) == 4
+
+
+def test_import_json():
+    with tempfile.TemporaryDirectory() as root:
+        fields = CANDLESTICK_DTYPE.names
+        legacy = {'1m': {'ETHBTC': [dict(zip(fields, row)) for row in reversed(rows(0, 5))]}}
+        path = os.path.join(root, 'binance.json')
+        with open(path, 'w') as file:
+            json.dump(legacy, file)
+        store = CandlestickStore(os.path.join(root, 'binance'))
+        assert store.import_json(path) == 5
+        assert list(store.read('1m', 'ETHBTC')['openTimestamp'] // MINUTE) == list(range(5))
+
+
+def test_index():
+    with tempfile.TemporaryDirectory() as root:
+        with CandlestickStore(root) as store:
+            assert store.latest('1m', 'ETHBTC') is None
+            store.append('1m', 'ETHBTC', rows(0, 10))
+            assert store.latest('1m', 'ETHBTC') == (9 * MINUTE, 10 * MINUTE - 1)
+        with open(os.path.join(root, CandlestickStore.INDEX_FILE)) as file:
+            assert json.load(file) == {'1m': {'ETHBTC': {'count': 10, 'open': 9 * MINUTE, 'close': 10 * MINUTE - 1}}}
+        assert CandlestickStore(root).latest('1m', 'ETHBTC') == (9 * MINUTE, 10 * MINUTE - 1)
+
+
+def test_stale_index_rebuilt():
+    with tempfile.TemporaryDirectory() as root:
+        store = CandlestickStore(root, index_flush_interval=3600)
+        store.append('1m', 'ETHBTC', rows(0, 10))
+        store.flush()
+        store.append('1m', 'ETHBTC', rows(10, 12))  # not flushed, as if the process had crashed
+        store.append('1m', 'LTCBTC', rows(0, 1))
+        reopened = CandlestickStore(root)
+        assert reopened.latest('1m', 'ETHBTC') == (11 * MINUTE, 12 * MINUTE - 1)
+        assert reopened.latest('1m', 'LTCBTC') == (0, MINUTE - 1)
@@ -0,0 +1,71 @@
+import numpy as np
+from nose.tools import assert_raises
+
+from crizzle.envs.order_book import OrderBook, BIDS, ASKS
+from crizzle.envs.binance.stream import DepthUpdate, decode_message
+
+SNAPSHOT = {'lastUpdateId': 100, 'bids': [('0.0024', '10'), ('0.0022', '5'), ('0.0023', '1')],
+            'asks': [('0.0026', '100'), ('0.0025', '2')]}
+
+
+class FakeService:
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+
+    def depth(self, symbol, limit=None):
+        return self.snapshots.pop(0)
+
+    def decode(self, response):
+        return response
+
+
+def update(first, final, bids=(), asks=()):
+    return DepthUpdate('BNBBTC', first, final, list(bids), list(asks))
+
+
+def test_snapshot_queries():
+    book = OrderBook('BNBBTC')
+    book.load_snapshot(SNAPSHOT)
+    assert book.best_bid() == (0.0024, 10.0)
+    assert book.best_ask() == (0.0025, 2.0)
+    assert abs(book.spread() - 0.0001) < 1e-12
+    assert np.allclose(book.top(BIDS, 2), [[0.0024, 10], [0.0023, 1]])
+    assert np.allclose(book.cumulative_depth(ASKS), [[0.0025, 2], [0.0026, 102]])
+    assert abs(book.fill_price(ASKS, 4) - (2 * 0.0025 + 2 * 0.0026) / 4) < 1e-12
+    assert book.fill_price(ASKS, 1000) is None
+    with assert_raises(ValueError):
+        book.top('middle')
+
+
+def test_sequenced_updates():
+    book = OrderBook('BNBBTC')
+    assert not book.apply(update(99, 101))  # Buffered until the snapshot
+    book.load_snapshot(SNAPSHOT)
+    assert book.last_update_id == 101  # The buffered update straddles the snapshot
+    assert not book.apply(update(95, 100))  # Stale
+    assert book.apply(update(102, 103, bids=[(0.0024, 0), (0.00245, 3)], asks=[(0.0025, 0)]))
+    assert book.best_bid() == (0.00245, 3.0)
+    assert book.best_ask() == (0.0026, 100.0)
+    assert 0.0024 not in book.bids
+    assert not book.apply(update(105, 106))
+    assert not book.synced
+
+
+def test_resync_on_gap():
+    second = {'lastUpdateId': 110, 'bids': [('0.0020', '1')], 'asks': [('0.0030', '1')]}
+    book = OrderBook('BNBBTC', service=FakeService([SNAPSHOT, second]))
+    assert book.update(update(101, 102, bids=[(0.0021, 4)]))
+    assert book.best_bid() == (0.0024, 10.0)
+    assert book.update(update(108, 112, asks=[(0.0029, 7)]))  # Gap: resynced from the second snapshot
+    assert book.resyncs == 2
+    assert book.best_bid() == (0.002, 1.0)
+    assert book.best_ask() == (0.0029, 7.0)
+    assert book.last_update_id == 112
+
+
+def test_decode_depth_update():
+    event_type, symbol, _, state = decode_message({'e': 'depthUpdate', 'E': 1, 's': 'BNBBTC', 'U': 157, 'u': 160,
+                                                   'b': [['0.0024', '10']], 'a': [['0.0026', '100']]})
+    assert (event_type, symbol) == ('depth', 'BNBBTC')
+    assert state == DepthUpdate('BNBBTC', 157, 160, [(0.0024, 10.0)], [(0.0026, 100.0)])
+    assert OrderBook('BNBBTC').can_handle(None, state)
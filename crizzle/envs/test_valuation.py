@@ -0,0 +1,131 @@
+import json
+import math
+import threading
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from crizzle import services
+from crizzle.envs.valuation import Valuation
+
+
+class FakeService:
+    def __init__(self, name, tickers):
+        self.name = name
+        self.tickers = tickers
+
+    def book_tickers(self):
+        return self.tickers
+
+
+binance = FakeService('Binance', [('ETHBTC', 'ETH', 'BTC', 0.07, 0.0701), ('BTCUSDT', 'BTC', 'USDT', 9000, 9001),
+                                  ('LTCBTC', 'LTC', 'BTC', 0.014, 0.0141)])
+poloniex = FakeService('Poloniex', [('USDT_ETH', 'ETH', 'USDT', 630.9, 631.5), ('BTC_XMR', 'XMR', 'BTC', 0.026, 0.0261)])
+
+
+def make_valuation(**kwargs):
+    valuation = Valuation(**kwargs)
+    valuation.add_service(binance, fee=0)
+    valuation.add_service(poloniex, fee=0)
+    return valuation
+
+
+def test_rates():
+    valuation = make_valuation()
+    rates = valuation.rates('USDT')
+    assert rates['USDT'] == 1
+    assert math.isclose(rates['BTC'], 9000)
+    assert math.isclose(rates['ETH'], 630.9)  # 0.07 * 9000 = 630 on binance
+    assert math.isclose(rates['XMR'], 0.026 * 9000)
+    assert math.isclose(valuation.rates('ETH')['BTC'], 1 / 0.0701)
+
+
+def test_values():
+    valuation = make_valuation()
+    portfolio = {'BTC': 0.5, 'ETH': 2, 'LTC': 10, 'DOGE': 100}
+    values = valuation.values(portfolio, 'USDT')
+    assert math.isclose(values['BTC'], 4500)
+    assert math.isclose(values['ETH'], 1261.8)
+    assert math.isclose(values['LTC'], 10 * 0.014 * 9000)
+    assert math.isnan(values['DOGE'])
+    assert math.isclose(valuation.value(portfolio, 'USDT'), 4500 + 1261.8 + 1260)
+
+
+def test_fees_and_updates():
+    valuation = Valuation()
+    valuation.add_service(binance)
+    assert math.isclose(valuation.rates('USDT')['ETH'], 0.07 * 0.999 * 9000 * 0.999)
+    valuation.add_pair('binance', 'ETHBTC', 'ETH', 'BTC', 0.08, 0.0801)
+    assert math.isclose(valuation.rates('USDT')['ETH'], 0.08 * 0.999 * 9000 * 0.999)
+
+
+def test_route():
+    valuation = make_valuation()
+    route = valuation.route('LTC', 'ETH')
+    assert [(leg.exchange, leg.symbol, leg.side) for leg in route] == [('binance', 'LTCBTC', 'SELL'),
+                                                                       ('binance', 'ETHBTC', 'BUY')]
+    assert math.isclose(route[1].rate, 1 / 0.0701)
+    assert valuation.route('ETH', 'ETH') == []
+    assert valuation.route('DOGE', 'ETH') is None
+
+
+def test_max_hops():
+    valuation = make_valuation(max_hops=1)
+    assert 'XMR' not in valuation.rates('USDT')
+    assert math.isclose(valuation.rates('USDT')['ETH'], 630.9)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Responses of both exchanges, by path
+    BODIES = {
+        '/binance/v1/exchangeInfo': {'symbols': [
+            {'symbol': 'ETHBTC', 'baseAsset': 'ETH', 'quoteAsset': 'BTC', 'status': 'TRADING', 'filters': []},
+            {'symbol': 'BTCUSDT', 'baseAsset': 'BTC', 'quoteAsset': 'USDT', 'status': 'TRADING', 'filters': []}]},
+        '/binance/v3/ticker/bookTicker': [
+            {'symbol': 'ETHBTC', 'bidPrice': '0.07', 'bidQty': '1', 'askPrice': '0.0701', 'askQty': '1'},
+            {'symbol': 'BTCUSDT', 'bidPrice': '9000', 'bidQty': '1', 'askPrice': '9001', 'askQty': '1'}],
+        '/poloniex/public': {
+            'USDT_ETH': {'highestBid': '630.9', 'lowestAsk': '631.5', 'isFrozen': '0'},
+            'BTC_XMR': {'highestBid': '0.026', 'lowestAsk': '0.0261', 'isFrozen': '0'},
+            'BTC_DOGE': {'highestBid': '0.0000001', 'lowestAsk': '0.0000002', 'isFrozen': '1'}},
+    }
+
+    def do_GET(self):
+        body = self.BODIES.get(urlsplit(self.path).path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_services_across_exchanges():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    root = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    poloniex_service = services.make('poloniex')
+    binance_service = services.make('binance', name='binancevaluationtest')
+    binance_service.load_key({'key': 'api-key', 'secret': 'secret-key'})
+    poloniex_root, binance_root = poloniex_service.root, binance_service.root
+    poloniex_service.root, binance_service.root = root + '/poloniex', root + '/binance'
+    try:
+        valuation = Valuation()
+        valuation.add_service(binance_service, exchange='binance', fee=0)
+        valuation.add_service(poloniex_service, fee=0)
+        rates = valuation.rates('USDT')
+    finally:
+        poloniex_service.root, binance_service.root = poloniex_root, binance_root
+        server.shutdown()
+        server.server_close()
+    assert math.isclose(rates['ETH'], 630.9)  # Sold on poloniex, rather than through BTC on binance
+    assert math.isclose(rates['XMR'], 0.026 * 9000)  # Sold for BTC on poloniex, then on binance
+    assert 'DOGE' not in rates
+    assert math.isclose(valuation.value({'ETH': 1, 'XMR': 10}, 'USDT'), 630.9 + 2340)
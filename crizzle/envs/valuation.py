@@ -0,0 +1,186 @@
+"""
+Portfolio valuation over the order books of several exchanges.
+
+Every trading pair of every exchange contributes two edges between asset nodes: selling the base asset at the
+bid, and buying it at the ask, both net of the exchange's taker fee. The same asset on different exchanges is the
+same node, so the best route may trade on any of them.
+
+Valuing a portfolio in a quote asset needs the best rate from every held asset to the quote asset. Those all come
+out of a single Bellman-Ford pass over the reversed edges starting from the quote asset, instead of one shortest
+path search per holding.
+"""
+import math
+import logging
+from collections import namedtuple
+import numpy as np
+
+from crizzle import services
+from crizzle.patterns import CompactGraph
+from crizzle.patterns import arbitrage
+
+logger = logging.getLogger(__name__)
+
+# Taker fee of each exchange, as a fraction of the traded amount.
+TAKER_FEES = {
+    'binance': 0.001,
+    'poloniex': 0.0025,
+}
+
+# One trade of a conversion route: selling (side 'SELL') or buying ('BUY') the base asset of a pair.
+Leg = namedtuple('Leg', ['exchange', 'symbol', 'side', 'origin', 'destination', 'rate'])
+
+
+class Valuation:
+    def __init__(self, max_hops: int = 4):
+        """
+        Args:
+            max_hops: Maximum number of trades on a conversion route
+        """
+        self.max_hops = max_hops
+        self.graph = CompactGraph()
+        self._legs = []  # (exchange, symbol, side) of each edge of the graph
+        self._pairs = {}  # (exchange, symbol) -> (index of the sell edge, fee); the buy edge follows it
+        self._trees = {}  # quote asset -> (rates, next edges), cached until prices change
+
+    @classmethod
+    def from_services(cls, *names, max_hops: int = 4):
+        """
+        Build a valuation from the order books of the named services, for example 'binance' and 'poloniex'.
+        """
+        valuation = cls(max_hops=max_hops)
+        for name in names:
+            valuation.add_service(services.make(name), exchange=name)
+        return valuation
+
+    # region Pairs
+    def add_service(self, service, exchange: str = None, fee: float = None) -> None:
+        """
+        Add or update every pair of an exchange from its service's book tickers.
+
+        Args:
+            service: Service with a `book_tickers` method
+            exchange: Name of the exchange, by default the service's name
+            fee: Taker fee, by default the exchange's entry in TAKER_FEES
+        """
+        exchange = service.name.lower() if exchange is None else exchange
+        fee = TAKER_FEES.get(exchange, 0.0) if fee is None else fee
+        tickers = service.book_tickers()
+        for symbol, base, quote, bid, ask in tickers:
+            self.add_pair(exchange, symbol, base, quote, bid, ask, fee=fee)
+        logger.debug("Added {} pairs of {} to the valuation graph".format(len(tickers), exchange))
+
+    def add_pair(self, exchange: str, symbol: str, base: str, quote: str, bid: float, ask: float,
+                 fee: float = 0.0) -> None:
+        """
+        Add a trading pair, or update its prices if it is already known.
+
+        Args:
+            exchange: Name of the exchange
+            symbol: Trading symbol on that exchange
+            base: Base asset
+            quote: Quote asset
+            bid: Best price the base asset can be sold at
+            ask: Best price the base asset can be bought at
+            fee: Taker fee, as a fraction of the traded amount
+        """
+        if (exchange, symbol) in self._pairs:
+            self.update_pair(exchange, symbol, bid, ask)
+            return
+        self._pairs[(exchange, symbol)] = (self.graph.edge_count, fee)
+        sell, buy = self._rates(bid, ask, fee)
+        self.graph.add_edges([(base, quote, sell), (quote, base, buy)])
+        self._legs.extend([(exchange, symbol, 'SELL'), (exchange, symbol, 'BUY')])
+        self._trees = {}
+
+    def update_pair(self, exchange: str, symbol: str, bid: float, ask: float) -> None:
+        edge, fee = self._pairs[(exchange, symbol)]
+        self.graph.set_weights([edge, edge + 1], self._rates(bid, ask, fee))
+        self._trees = {}
+
+    @staticmethod
+    def _rates(bid: float, ask: float, fee: float) -> tuple:
+        sell = bid * (1 - fee) if bid > 0 else 0.0
+        buy = (1 - fee) / ask if ask > 0 else 0.0
+        return sell, buy
+
+    # endregion
+
+    # region Queries
+    def _tree(self, quote: str) -> tuple:
+        """
+        Best rate from every asset to a quote asset, and the first edge of each best route.
+        """
+        if quote not in self._trees:
+            with np.errstate(divide='ignore'):
+                weights = -np.log(self.graph.weights)
+            target = self.graph.id(quote)
+            distances, predecessors, _ = arbitrage.bellman_ford(
+                self.graph.destinations, self.graph.sources, weights, self.graph.node_count,
+                source=target, iterations=self.max_hops)
+            distances[target], predecessors[target] = 0, -1  # Ignore arbitrage cycles through the quote asset
+            self._trees[quote] = (np.exp(-distances), predecessors)
+        return self._trees[quote]
+
+    def rates(self, quote: str) -> dict:
+        """
+        Best rate from every asset to a quote asset.
+
+        Returns:
+            dict: Dictionary of the format {asset: amount of quote received for one asset}; assets that cannot be
+            converted within `max_hops` trades are left out
+        """
+        rates, _ = self._tree(quote)
+        return {self.graph.name(i): rate for i, rate in enumerate(rates.tolist()) if rate > 0}
+
+    def values(self, portfolio: dict, quote: str) -> dict:
+        """
+        Value each holding of a portfolio in a quote asset.
+
+        Args:
+            portfolio: Dictionary of the format {asset: amount}
+            quote: Asset to value the holdings in
+
+        Returns:
+            dict: Dictionary of the format {asset: value}; holdings that cannot be converted are valued at NaN
+        """
+        rates, _ = self._tree(quote)
+        assets = list(portfolio)
+        ids = np.array([self.graph.id(asset) if asset in self.graph else -1 for asset in assets],
+                       dtype=np.int64)
+        amounts = np.array([portfolio[asset] for asset in assets], dtype=np.float64)
+        asset_rates = np.where(ids >= 0, rates[ids], 0.0)
+        values = np.where(asset_rates > 0, amounts * asset_rates, np.nan)
+        return dict(zip(assets, values.tolist()))
+
+    def value(self, portfolio: dict, quote: str) -> float:
+        """
+        Total value of a portfolio in a quote asset, ignoring holdings that cannot be converted.
+        """
+        return float(np.nansum(list(self.values(portfolio, quote).values())))
+
+    def route(self, asset: str, quote: str) -> list:
+        """
+        Trades converting an asset to a quote asset at the best rate.
+
+        Returns:
+            list: Leg of each trade in order, or None if the asset cannot be converted
+        """
+        rates, predecessors = self._tree(quote)
+        if asset not in self.graph or rates[self.graph.id(asset)] == 0:
+            return None
+        legs = []
+        node = self.graph.id(asset)
+        target = self.graph.id(quote)
+        weights, destinations = self.graph.weights, self.graph.destinations
+        while node != target and len(legs) < self.graph.node_count:
+            edge = predecessors[node]
+            exchange, symbol, side = self._legs[edge]
+            legs.append(Leg(exchange, symbol, side, self.graph.name(node),
+                            self.graph.name(destinations[edge]), float(weights[edge])))
+            node = destinations[edge]
+        return legs
+
+    # endregion
+
+    def __repr__(self):
+        return '<Valuation [{} pairs, {} assets]>'.format(len(self._pairs), self.graph.node_count)
@@ -1,7 +1,12 @@
 from crizzle.patterns.memoize import memoize
-from crizzle.patterns.observer import Observable, Observer
+from crizzle.patterns.observer import Observable, Observer, Topic, ANY
+from crizzle.patterns import dispatch
+from crizzle.patterns.instrumentation import Instrumentation
 from crizzle.patterns.singleton import Singleton
 from crizzle.patterns.deprecated import deprecated
 from crizzle.patterns.value_checking import assert_none, assert_not_none, assert_in, assert_type, assert_equal
 from crizzle.patterns.graph import DiGraph
+from crizzle.patterns import arbitrage
+from crizzle.patterns.price_graph import PriceGraph
+from crizzle.patterns.compact_graph import CompactGraph
 from crizzle.patterns import conversion
@@ -0,0 +1,191 @@
+"""
+Vectorized Bellman-Ford for finding arbitrage cycles.
+
+Exchange rates become edge weights of -log(rate), so that a cycle of trades multiplying to more than 1 is a cycle
+of negative total weight. Edges are kept as three parallel arrays (source, destination, weight) sorted by
+destination, which is a CSR adjacency of incoming edges. Every iteration relaxes all edges at once with array
+operations instead of calling a Python function per edge.
+"""
+import math
+import logging
+from collections import namedtuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A negative cycle: its nodes in trading order (the first node is not repeated at the end), total weight, and the
+# rate earned by trading once around it (exp(-weight); above 1 for an arbitrage opportunity).
+Cycle = namedtuple('Cycle', ['nodes', 'weight', 'rate'])
+
+DEFAULT_TOLERANCE = 1e-12
+
+
+def dense_to_edges(matrix) -> tuple:
+    """
+    Edges of a dense adjacency matrix of weights, where infinite or NaN entries mean that there is no edge.
+
+    Returns:
+        tuple: (sources, destinations, weights) arrays
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    sources, destinations = np.nonzero(np.isfinite(matrix))
+    return sources, destinations, matrix[sources, destinations]
+
+
+def csr_to_edges(indptr, indices, data) -> tuple:
+    """
+    Edges of a CSR adjacency matrix of weights, given as its three arrays (row i's edges go to indices[indptr[i]:
+    indptr[i + 1]] with weights data[indptr[i]:indptr[i + 1]]).
+
+    Returns:
+        tuple: (sources, destinations, weights) arrays
+    """
+    indptr = np.asarray(indptr)
+    sources = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return sources, np.asarray(indices), np.asarray(data, dtype=np.float64)
+
+
+def graph_to_edges(graph) -> tuple:
+    """
+    Edges of a DiGraph whose weights are exchange rates, weighted by -log(rate).
+
+    Returns:
+        tuple: (nodes, sources, destinations, weights), where sources and destinations index into nodes
+    """
+    nodes = graph.nodes
+    ids = {node: i for i, node in enumerate(nodes)}
+    edges = graph.edges
+    sources = np.fromiter((ids[edge[0]] for edge in edges), dtype=np.int64, count=len(edges))
+    destinations = np.fromiter((ids[edge[1]] for edge in edges), dtype=np.int64, count=len(edges))
+    rates = np.fromiter((edge[2] for edge in edges), dtype=np.float64, count=len(edges))
+    return nodes, sources, destinations, -np.log(rates)
+
+
+def bellman_ford(sources, destinations, weights, node_count: int, source: int = None,
+                 tolerance: float = DEFAULT_TOLERANCE, iterations: int = None) -> tuple:
+    """
+    Shortest distances from a source node, relaxing every edge in each iteration.
+
+    Args:
+        sources: Source node of each edge
+        destinations: Destination node of each edge
+        weights: Weight of each edge
+        node_count: Number of nodes
+        source: Node to measure distances from. If None, distances are measured from a virtual node with a
+            zero-weight edge to every node, so that negative cycles are found anywhere in the graph
+        tolerance: Minimum decrease of a distance that counts as an improvement, so that rounding errors
+            on cycles of zero weight are not mistaken for negative cycles
+        iterations: Maximum number of iterations. Distances are then those of the shortest paths of at most this
+            many edges (or this many plus the virtual one), which stay meaningful in graphs with negative cycles
+
+    Returns:
+        tuple: (distances, predecessors, improving), where predecessors holds the index of the edge each node
+        was last reached through (-1 if none), and improving holds the nodes whose distances still decreased in
+        the last iteration; it is empty unless a negative cycle is reachable from the source or the iterations
+        ran out before the distances converged
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    destinations = np.asarray(destinations, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(destinations, kind='stable')
+    targets, starts, counts = np.unique(destinations[order], return_index=True, return_counts=True)
+    sorted_sources, sorted_weights = sources[order], weights[order]
+    groups = np.repeat(np.arange(len(targets)), counts)
+
+    distances = np.zeros(node_count) if source is None else np.full(node_count, np.inf)
+    if source is not None:
+        distances[source] = 0
+    predecessors = np.full(node_count, -1, dtype=np.int64)
+    improving = np.empty(0, dtype=np.int64)
+    if len(targets) == 0:
+        return distances, predecessors, improving
+    for _ in range(node_count + 1 if iterations is None else iterations):
+        candidates = distances[sorted_sources] + sorted_weights
+        best = np.minimum.reduceat(candidates, starts)
+        improved = best < distances[targets] - tolerance
+        if not improved.any():
+            return distances, predecessors, np.empty(0, dtype=np.int64)
+        # First edge of each improved target achieving its new distance
+        achieving = np.flatnonzero((candidates == best[groups]) & improved[groups])
+        achieving_groups, first = np.unique(groups[achieving], return_index=True)
+        improving = targets[achieving_groups]
+        predecessors[improving] = order[achieving[first]]
+        distances[improving] = best[achieving_groups]
+    return distances, predecessors, improving
+
+
+def trace_cycle(node: int, predecessors, sources) -> list:
+    """
+    Follow predecessor edges back from a node until they loop.
+
+    Returns:
+        list: Indices of the edges of the cycle in forward order, or None if the predecessors do not loop
+    """
+    seen = {}
+    path = []
+    while node not in seen:
+        edge = predecessors[node]
+        if edge < 0:
+            return None
+        seen[node] = len(path)
+        path.append(int(edge))
+        node = sources[edge]
+    return path[seen[node]:][::-1]
+
+
+def negative_cycles(sources, destinations, weights, node_count: int, source: int = None,
+                    tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    Find negative cycles, each reported once.
+
+    Args:
+        sources: Source node of each edge
+        destinations: Destination node of each edge
+        weights: Weight of each edge
+        node_count: Number of nodes
+        source: Only look for cycles reachable from this node, or None to look everywhere
+        tolerance: See `bellman_ford`
+
+    Returns:
+        list: (node indices, total weight) of each cycle, with the node indices in trading order
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    distances, predecessors, improving = bellman_ford(sources, destinations, weights, node_count,
+                                                      source=source, tolerance=tolerance)
+    cycles = {}
+    for node in improving:
+        edges = trace_cycle(node, predecessors, sources)
+        if edges is None:
+            continue
+        nodes = [int(sources[edge]) for edge in edges]
+        weight = float(weights[edges].sum())
+        if weight >= -tolerance:
+            continue
+        start = nodes.index(min(nodes))
+        key = tuple(nodes[start:] + nodes[:start])
+        cycles.setdefault(key, weight)
+    return [(list(nodes), weight) for nodes, weight in cycles.items()]
+
+
+def arbitrage_cycles(graph, source=None, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    Find arbitrage opportunities in a DiGraph of exchange rates.
+
+    Args:
+        graph: DiGraph where an edge from A to B weighted r means that one A buys r B
+        source: Only look for cycles reachable from this node (for example the asset held), or None
+        tolerance: See `bellman_ford`
+
+    Returns:
+        list: Cycle of each opportunity, the most profitable first
+    """
+    nodes, sources, destinations, weights = graph_to_edges(graph)
+    source = None if source is None else nodes.index(source)
+    cycles = [Cycle([nodes[i] for i in cycle], weight, math.exp(-weight))
+              for cycle, weight in negative_cycles(sources, destinations, weights, len(nodes), source=source,
+                                                   tolerance=tolerance)]
+    for cycle in cycles:
+        logger.debug("Arbitrage cycle {} returns {:.6f}".format(' -> '.join(map(str, cycle.nodes)), cycle.rate))
+    return sorted(cycles, key=lambda cycle: cycle.weight)
+
@@ -0,0 +1,264 @@
+"""
+Directed graph with nodes interned to integer ids and edges stored in parallel arrays.
+
+Compared to DiGraph's nested dictionaries, an edge costs 16 bytes (two int32 endpoints and a float64 weight)
+instead of a dictionary entry per endpoint, and graph algorithms can work on the arrays directly. Properties return
+read-only views of the arrays, so reading them copies nothing.
+"""
+import math
+import logging
+import numpy as np
+
+from crizzle.patterns import arbitrage
+from crizzle.patterns.graph import DiGraph
+
+logger = logging.getLogger(__name__)
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class CompactGraph:
+    def __init__(self, nodes=None, capacity: int = 64):
+        """
+        Args:
+            nodes: Names of nodes to intern up front
+            capacity: Number of edges to allocate room for; the arrays grow by doubling beyond it
+        """
+        self._ids = {}
+        self._names = []
+        self._size = 0
+        capacity = max(1, capacity)
+        self._sources = np.empty(capacity, dtype=np.int32)
+        self._destinations = np.empty(capacity, dtype=np.int32)
+        self._weights = np.empty(capacity, dtype=np.float64)
+        self._csr = None
+        if nodes is not None:
+            for node in nodes:
+                self.intern(node)
+
+    # region Conversion
+    @classmethod
+    def from_adjacency(cls, adjacency: dict):
+        """
+        Build a graph from an adjacency dictionary of the format {node: {neighbour: weight}}.
+        """
+        graph = cls(nodes=adjacency, capacity=max(1, sum(len(neighbours) for neighbours in adjacency.values())))
+        for origin, neighbours in adjacency.items():
+            for destination, weight in neighbours.items():
+                graph.add_edge(origin, destination, weight)
+        return graph
+
+    @classmethod
+    def from_digraph(cls, graph: DiGraph):
+        return cls.from_adjacency(graph.adjacency)
+
+    def to_adjacency(self) -> dict:
+        """
+        Adjacency dictionary of the format {node: {neighbour: weight}}. Of parallel edges, the first one is kept.
+        """
+        adjacency = {name: {} for name in self._names}
+        for origin, destination, weight in self.iter_edges():
+            adjacency[origin].setdefault(destination, weight)
+        return adjacency
+
+    def to_digraph(self) -> DiGraph:
+        return DiGraph(adjacency=self.to_adjacency())
+
+    # endregion
+
+    # region Nodes
+    def intern(self, name) -> int:
+        """
+        Id of a node, adding the node if it is new.
+        """
+        node_id = self._ids.get(name)
+        if node_id is None:
+            node_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+            self._csr = None
+        return node_id
+
+    def id(self, name) -> int:
+        return self._ids[name]
+
+    def name(self, node_id: int):
+        return self._names[node_id]
+
+    @property
+    def nodes(self) -> list:
+        return list(self._names)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._names)
+
+    # endregion
+
+    # region Edges
+    @property
+    def edge_count(self) -> int:
+        return self._size
+
+    @property
+    def sources(self) -> np.ndarray:
+        return _read_only(self._sources[:self._size])
+
+    @property
+    def destinations(self) -> np.ndarray:
+        return _read_only(self._destinations[:self._size])
+
+    @property
+    def weights(self) -> np.ndarray:
+        return _read_only(self._weights[:self._size])
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self._sources)
+        if self._size + count <= capacity:
+            return
+        while capacity < self._size + count:
+            capacity *= 2
+        for name in ('_sources', '_destinations', '_weights'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add_edge(self, origin, destination, weight: float) -> None:
+        """
+        Add an edge. Unlike DiGraph, existing edges are not looked up: adding an edge twice keeps both.
+        """
+        self._reserve(1)
+        self._sources[self._size] = self.intern(origin)
+        self._destinations[self._size] = self.intern(destination)
+        self._weights[self._size] = weight
+        self._size += 1
+        self._csr = None
+
+    def add_edges(self, edges) -> None:
+        for origin, destination, weight in edges:
+            self.add_edge(origin, destination, weight)
+
+    def add_edge_arrays(self, sources, destinations, weights) -> None:
+        """
+        Add many edges between already interned nodes at once.
+
+        Args:
+            sources: Id of the origin of each edge
+            destinations: Id of the destination of each edge
+            weights: Weight of each edge
+        """
+        count = len(weights)
+        self._reserve(count)
+        self._sources[self._size:self._size + count] = sources
+        self._destinations[self._size:self._size + count] = destinations
+        self._weights[self._size:self._size + count] = weights
+        self._size += count
+        self._csr = None
+
+    def set_weights(self, edges, weights) -> None:
+        """
+        Change the weights of existing edges in place.
+
+        Args:
+            edges: Indices of the edges, in the order they were added
+            weights: New weight of each edge
+        """
+        self._weights[:self._size][edges] = weights
+        self._csr = None
+
+    def iter_edges(self):
+        """
+        Yields:
+            (origin, destination, weight) of every edge, like the items of DiGraph.edges
+        """
+        names = self._names
+        for source, destination, weight in zip(self.sources.tolist(), self.destinations.tolist(),
+                                               self.weights.tolist()):
+            yield names[source], names[destination], weight
+
+    def csr(self) -> tuple:
+        """
+        Edges sorted by origin, cached until the graph changes. The edges leaving node i are at positions
+        indptr[i]:indptr[i + 1] of indices (their destinations) and weights.
+
+        Returns:
+            tuple: (indptr, indices, weights) read-only arrays
+        """
+        if self._csr is None:
+            order = np.argsort(self.sources, kind='stable')
+            indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.sources, minlength=self.node_count), out=indptr[1:])
+            self._csr = tuple(_read_only(array) for array in (indptr, self.destinations[order],
+                                                                self.weights[order]))
+        return self._csr
+
+    def neighbours(self, name) -> tuple:
+        """
+        Edges leaving a node, as views into the CSR arrays.
+
+        Returns:
+            tuple: (destination ids, weights)
+        """
+        indptr, indices, weights = self.csr()
+        node_id = self._ids[name]
+        return indices[indptr[node_id]:indptr[node_id + 1]], weights[indptr[node_id]:indptr[node_id + 1]]
+
+    def edge_weight(self, origin, destination) -> float:
+        destinations, weights = self.neighbours(origin)
+        matches = np.flatnonzero(destinations == self._ids[destination])
+        if len(matches) == 0:
+            raise KeyError((origin, destination))
+        return float(weights[matches[0]])
+
+    @property
+    def inverse(self):
+        """
+        Graph with every edge reversed and weighted by the reciprocal of its weight, sharing this graph's node ids.
+        """
+        graph = CompactGraph(capacity=max(1, self._size))
+        graph._ids, graph._names = dict(self._ids), list(self._names)
+        graph.add_edge_arrays(self.destinations, self.sources, 1.0 / self.weights)
+        return graph
+
+    def add_inverse(self) -> None:
+        self.add_edge_arrays(self.destinations.copy(), self.sources.copy(), 1.0 / self.weights)
+
+    # endregion
+
+    # region Algorithms
+    def shortest_distances(self, source) -> dict:
+        """
+        Shortest distance from a source to every node it reaches, computed on the edge arrays.
+
+        Returns:
+            dict: Dictionary of the format {node: distance}
+        """
+        distances, predecessors, improving = arbitrage.bellman_ford(self.sources, self.destinations, self.weights,
+                                                                    self.node_count, source=self._ids[source])
+        if len(improving):
+            raise ValueError("Negative weight cycle reachable from {}.".format(source))
+        return {self._names[i]: distance for i, distance in enumerate(distances.tolist()) if distance != math.inf}
+
+    def arbitrage_cycles(self, source=None, tolerance: float = arbitrage.DEFAULT_TOLERANCE) -> list:
+        """
+        Arbitrage opportunities, taking edge weights as exchange rates. See DiGraph.arbitrage_cycles.
+        """
+        cycles = arbitrage.negative_cycles(self.sources, self.destinations, -np.log(self.weights), self.node_count,
+                                           source=None if source is None else self._ids[source], tolerance=tolerance)
+        return sorted((arbitrage.Cycle([self._names[i] for i in nodes], weight, math.exp(-weight))
+                       for nodes, weight in cycles), key=lambda cycle: cycle.weight)
+
+    # endregion
+
+    def __len__(self):
+        return self.node_count
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __repr__(self):
+        return '<CompactGraph [{} nodes, {} edges]>'.format(self.node_count, self.edge_count)
@@ -0,0 +1,358 @@
+"""
+Asynchronous delivery of Observable events.
+
+By default an Observable calls every observer's `handle` on the thread that set its state, so one slow observer
+holds up the source and every other observer. A dispatcher decouples them: each observer gets its own bounded
+queue, drained in order on a thread pool (ThreadedDispatcher) or an asyncio event loop (AsyncioDispatcher). Events
+waiting in a queue are delivered together in one `handle_batch` call.
+
+What happens when an observer's queue is full is decided by its backpressure policy:
+    BLOCK            the publisher waits until there is room
+    DROP_OLDEST      the oldest waiting event is discarded
+    COALESCE_LATEST  an event replaces the waiting event with the same key (for example the same symbol), so the
+                     observer only sees the latest state of each key; if there is none, the oldest is discarded
+"""
+import time
+import asyncio
+import logging
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from crizzle.patterns.observer import Observer
+
+logger = logging.getLogger(__name__)
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+COALESCE_LATEST = 'coalesce_latest'
+POLICIES = (BLOCK, DROP_OLDEST, COALESCE_LATEST)
+
+
+def _latest(state):
+    return None
+
+
+class EventQueue:
+    """
+    Bounded, thread-safe queue of (caller, state) events waiting for one observer.
+    """
+
+    def __init__(self, observer, maxsize: int = 1000, policy: str = BLOCK, batch_size: int = 100, key=None):
+        """
+        Args:
+            observer: Observer the events are delivered to
+            maxsize: Maximum number of waiting events
+            policy: BLOCK, DROP_OLDEST or COALESCE_LATEST
+            batch_size: Maximum number of events delivered in one `handle_batch` call
+            key: With COALESCE_LATEST, function returning the key of a state; by default every state has the
+                same key, so only the latest one is kept
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unknown backpressure policy '{}'.".format(policy))
+        self.observer = observer
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch_size = batch_size
+        self.key = _latest if key is None else key
+        self.dropped = 0
+        self.delivered = 0
+        self.scheduled = False  # Whether a drain of this queue is pending or running
+        self._events = OrderedDict()
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._events)
+
+    def put(self, caller, state) -> bool:
+        """
+        Add an event, applying the backpressure policy if the queue is full.
+
+        Returns:
+            bool: Whether the queue needs to be scheduled for draining
+        """
+        with self._condition:
+            if self.policy == COALESCE_LATEST:
+                key = (id(caller), self.key(state))
+                if key in self._events:
+                    self._events[key] = (caller, state, self._events[key][2])
+                    self.dropped += 1
+                    return False
+            else:
+                key = self._sequence
+                self._sequence += 1
+            if len(self._events) >= self.maxsize:
+                if self.policy == BLOCK:
+                    while len(self._events) >= self.maxsize:
+                        self._condition.wait()
+                else:
+                    self._events.popitem(last=False)
+                    self.dropped += 1
+            self._events[key] = (caller, state, time.perf_counter())
+            if self.scheduled:
+                return False
+            self.scheduled = True
+            return True
+
+    def take(self) -> list:
+        """
+        Remove up to `batch_size` events, oldest first.
+
+        Returns:
+            list: (caller, state, time enqueued) of each event
+        """
+        with self._condition:
+            batch = [self._events.popitem(last=False)[1] for _ in range(min(self.batch_size, len(self._events)))]
+            self._condition.notify_all()
+            return batch
+
+    def finish(self) -> bool:
+        """
+        Mark a drain as finished.
+
+        Returns:
+            bool: Whether events arrived in the meantime, in which case the queue stays scheduled
+        """
+        with self._condition:
+            self.scheduled = len(self._events) > 0
+            self._condition.notify_all()
+            return self.scheduled
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: not self.scheduled, timeout=timeout)
+
+
+def deliver(observer, batch: list) -> int:
+    """
+    Deliver a batch of events taken from a queue, calling `handle_batch` once per run of events from the same
+    caller.
+
+    Returns:
+        int: Number of `handle_batch` calls that raised an exception
+    """
+    errors = 0
+    start = 0
+    for i in range(1, len(batch) + 1):
+        if i == len(batch) or batch[i][0] is not batch[start][0]:
+            try:
+                observer.handle_batch(batch[start][0], [event[1] for event in batch[start:i]])
+            except Exception:
+                logger.exception("Observer {} failed to handle {} events".format(observer, i - start))
+                errors += 1
+            start = i
+    return errors
+
+
+class Dispatcher(metaclass=ABCMeta):
+    """
+    Base class of dispatchers. Subclasses decide where queues are drained.
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = BLOCK, batch_size: int = 100, instrumentation=None):
+        """
+        Args:
+            maxsize: Default maximum number of events waiting for an observer
+            policy: Default backpressure policy
+            batch_size: Default maximum number of events delivered in one call
+            instrumentation: Instrumentation recording handle latency, queueing lag, queue depth and event counts
+                of every observer (see crizzle.patterns.instrumentation)
+        """
+        self.defaults = {'maxsize': maxsize, 'policy': policy, 'batch_size': batch_size}
+        self.instrumentation = instrumentation
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def configure(self, observer, **options) -> EventQueue:
+        """
+        Set the queue options of one observer, overriding the dispatcher's defaults.
+
+        Args:
+            observer: Observer to configure
+            **options: Any of maxsize, policy, batch_size and key (see EventQueue)
+
+        Returns:
+            EventQueue: The observer's queue
+        """
+        with self._lock:
+            queue = self._queues.get(observer)
+            if queue is not None and len(queue):
+                raise RuntimeError("Cannot reconfigure the queue of {} while events are waiting.".format(observer))
+            self._queues[observer] = EventQueue(observer, **dict(self.defaults, **options))
+            return self._queues[observer]
+
+    def queue(self, observer) -> EventQueue:
+        with self._lock:
+            if observer not in self._queues:
+                self._queues[observer] = EventQueue(observer, **self.defaults)
+            return self._queues[observer]
+
+    def publish(self, caller, states, observers) -> None:
+        """
+        Queue events for observers.
+
+        Args:
+            caller: The object that emitted the events
+            states: States to deliver, in order
+            observers: Observers to deliver them to
+        """
+        for observer in observers:
+            queue = self.queue(observer)
+            dropped = queue.dropped
+            for state in states:
+                if queue.put(caller, state):
+                    self.schedule(queue)
+            if self.instrumentation is not None:
+                self.instrumentation.record_depth(observer, len(queue))
+                if queue.dropped > dropped:
+                    self.instrumentation.count(observer, 'dropped', queue.dropped - dropped)
+
+    def drain(self, queue: EventQueue) -> None:
+        """
+        Deliver waiting events of a queue until it is empty.
+        """
+        while True:
+            batch = queue.take()
+            if batch:
+                start = time.perf_counter()
+                errors = deliver(queue.observer, batch)
+                self.record(queue, batch, start, errors)
+            if not queue.finish():
+                return
+
+    def record(self, queue: EventQueue, batch: list, start: float, errors: int) -> None:
+        """
+        Count a delivered batch and report it to the instrumentation.
+        """
+        queue.delivered += len(batch)
+        if self.instrumentation is not None:
+            self.instrumentation.record_lag(queue.observer, start - batch[0][2])
+            self.instrumentation.record_handle(queue.observer, time.perf_counter() - start, len(batch))
+            if errors:
+                self.instrumentation.count(queue.observer, 'errors', errors)
+
+    @abstractmethod
+    def schedule(self, queue: EventQueue) -> None:
+        """
+        Arrange for `drain` to be called on a queue that has events waiting.
+        """
+        pass
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Dictionary of the format {observer: {'waiting': int, 'delivered': int, 'dropped': int}}
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+        return {queue.observer: {'waiting': len(queue), 'delivered': queue.delivered, 'dropped': queue.dropped}
+                for queue in queues}
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Wait until every queue is drained.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+        return all(queue.wait_idle(timeout) for queue in queues)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ThreadedDispatcher(Dispatcher):
+    """
+    Drains observer queues on a thread pool. An observer's events are delivered in order and never concurrently,
+    while different observers are served in parallel.
+    """
+
+    def __init__(self, workers: int = 4, **kwargs):
+        super(ThreadedDispatcher, self).__init__(**kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crizzle-dispatch')
+
+    def schedule(self, queue: EventQueue) -> None:
+        self.executor.submit(self.drain, queue)
+
+    def close(self) -> None:
+        self.join()
+        self.executor.shutdown(wait=True)
+
+
+class AsyncioDispatcher(Dispatcher):
+    """
+    Drains observer queues as tasks of an asyncio event loop. Observers may define `handle` or `handle_batch` as
+    coroutines. Events may be published from any thread; with the BLOCK policy, publishing from the loop's own
+    thread must not fill a queue, since the loop could then never drain it.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None, **kwargs):
+        """
+        Args:
+            loop: Event loop draining the queues, or None for the running loop, in which case the dispatcher must be
+                created from within it
+            **kwargs: Further arguments of Dispatcher
+
+        Raises:
+            RuntimeError: If no loop is given and none is running
+        """
+        super(AsyncioDispatcher, self).__init__(**kwargs)
+        self.loop = asyncio.get_running_loop() if loop is None else loop
+
+    def schedule(self, queue: EventQueue) -> None:
+        self.loop.call_soon_threadsafe(self.loop.create_task, self.drain_async(queue))
+
+    async def drain_async(self, queue: EventQueue) -> None:
+        while True:
+            batch = queue.take()
+            if batch:
+                start = time.perf_counter()
+                errors = await deliver_async(queue.observer, batch)
+                self.record(queue, batch, start, errors)
+            if not queue.finish():
+                return
+            await asyncio.sleep(0)  # Let other observers run between batches
+
+    async def join_async(self) -> None:
+        """
+        Wait, from within the event loop, until every queue is drained.
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+        while any(queue.scheduled for queue in queues):
+            await asyncio.sleep(0.001)
+
+
+async def deliver_async(observer, batch: list) -> int:
+    """
+    Like `deliver`, awaiting observers whose `handle_batch` or `handle` is a coroutine.
+    """
+    per_state = type(observer).handle_batch is Observer.handle_batch and asyncio.iscoroutinefunction(observer.handle)
+    errors = 0
+    start = 0
+    for i in range(1, len(batch) + 1):
+        if i == len(batch) or batch[i][0] is not batch[start][0]:
+            caller, states = batch[start][0], [event[1] for event in batch[start:i]]
+            try:
+                if per_state:
+                    for state in states:
+                        await observer.handle(caller, state)
+                else:
+                    result = observer.handle_batch(caller, states)
+                    if asyncio.iscoroutine(result):
+                        await result
+            except Exception:
+                logger.exception("Observer {} failed to handle {} events".format(observer, i - start))
+                errors += 1
+            start = i
+    return errors
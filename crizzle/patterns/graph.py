@@ -1,3 +1,13 @@
+import heapq
+import logging
+from collections import deque
+import numpy as np
+
+from crizzle.patterns import arbitrage
+
+logger = logging.getLogger(__name__)
+
+
 def initialize(graph, source):
     d = {}  # Stands for destination
     p = {}  # Stands for predecessor
@@ -27,19 +37,126 @@ def bellman_ford(graph, source):
     for i in range(len(graph) - 1):  # Run iterations until convergence
         bellman_ford_iteration(graph, d, p)
 
-    # Check for negative-weight cycles
+    # Check for negative-weight cycles; use arbitrage.negative_cycles to find them
+    violations = [(u, v) for u in graph for v in graph[u] if d[v] > d[u] + graph[u][v]]
+    if violations:
+        logger.warning("Detected a negative weight cycle; {} edges can still be relaxed, such as {} -> {}".format(
+            len(violations), *violations[0]))
+    return d, p
+
+
+def dijkstra(graph, source):
+    """
+    Shortest paths from a source in a graph without negative weights, using a binary heap.
+
+    Args:
+        graph: Adjacency dictionary of the format {node: {neighbour: weight}}
+        source: Node to measure distances from
+
+    Returns:
+        tuple: (distances, predecessors) dictionaries; unreachable nodes have an infinite distance and no
+        predecessor
+    """
+    d, p = initialize(graph, source)
+    done = set()
+    heap = [(0, 0, source)]
+    counter = 1  # Breaks ties between equal distances without comparing nodes
+    while heap:
+        distance, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        for v, weight in graph[u].items():
+            if weight < 0:
+                raise ValueError("Dijkstra's algorithm does not support negative weights ({} -> {}).".format(u, v))
+            if distance + weight < d[v]:
+                d[v] = distance + weight
+                p[v] = u
+                heapq.heappush(heap, (d[v], counter, v))
+                counter += 1
+    return d, p
+
+
+def spfa(graph, source):
+    """
+    Shortest paths from a source in a graph that may have negative weights, relaxing only the edges leaving
+    nodes whose distance changed (the queue-based Bellman-Ford known as SPFA).
+
+    Args:
+        graph: Adjacency dictionary of the format {node: {neighbour: weight}}
+        source: Node to measure distances from
+
+    Returns:
+        tuple: (distances, predecessors) dictionaries
+
+    Raises:
+        ValueError: If a negative cycle is reachable from the source
+    """
+    d, p = initialize(graph, source)
+    queue = deque([source])
+    queued = {source}
+    relaxations = dict.fromkeys(graph, 0)
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        for v, weight in graph[u].items():
+            if d[u] + weight < d[v]:
+                d[v] = d[u] + weight
+                p[v] = u
+                relaxations[v] += 1
+                if relaxations[v] >= len(graph):
+                    raise ValueError("Negative weight cycle reachable from {} through {}.".format(source, v))
+                if v not in queued:
+                    queue.append(v)
+                    queued.add(v)
+    return d, p
+
+
+def floyd_warshall(graph):
+    """
+    Shortest paths between all pairs of nodes. Runs in O(n^3) time, so it suits small graphs that are queried
+    from many sources.
+
+    Args:
+        graph: Adjacency dictionary of the format {node: {neighbour: weight}}
+
+    Returns:
+        tuple: (distances, predecessors) dictionaries of the format {source: {node: value}}
+
+    Raises:
+        ValueError: If the graph contains a negative cycle
+    """
+    nodes = list(graph)
+    ids = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    distances = np.full((n, n), np.inf)
+    predecessors = np.full((n, n), -1, dtype=np.int64)
     for u in graph:
-        for v in graph[u]:
-            try:
-                assert d[v] <= d[u] + graph[u][v]
-            except AssertionError:
-                print("Detected a negative weight cycle:", u, v)
+        for v, weight in graph[u].items():
+            distances[ids[u], ids[v]] = weight
+            predecessors[ids[u], ids[v]] = ids[u]
+    np.fill_diagonal(distances, np.minimum(np.diagonal(distances), 0))
+    for k in range(n):
+        through = distances[:, k:k + 1] + distances[k:k + 1, :]
+        improved = through < distances
+        distances = np.where(improved, through, distances)
+        predecessors = np.where(improved, predecessors[k:k + 1, :], predecessors)
+    if (np.diagonal(distances) < 0).any():
+        raise ValueError("Graph contains a negative weight cycle.")
+    d = {u: dict(zip(nodes, distances[i].tolist())) for i, u in enumerate(nodes)}
+    p = {u: {v: None if predecessors[i, j] < 0 or i == j else nodes[predecessors[i, j]]
+             for j, v in enumerate(nodes)} for i, u in enumerate(nodes)}
     return d, p
 
 
+SHORTEST_PATH_METHODS = {'dijkstra': dijkstra, 'spfa': spfa, 'bellman_ford': bellman_ford}
+
+
 class DiGraph:
     def __init__(self, adjacency=None, edges=None, name=None):
         self._adjacency = {}
+        self._trees = {}
+        self._has_negative_weights = None
         self.name = None
         if isinstance(adjacency, dict):
             assert edges is None
@@ -100,9 +217,18 @@ class DiGraph:
                 edges.append((node, nb, neighbors[nb]))
         return edges
 
+    def invalidate(self):
+        """
+        Forget cached shortest paths. Called whenever the graph changes through its methods; call it after
+        modifying `adjacency` directly.
+        """
+        self._trees = {}
+        self._has_negative_weights = None
+
     def add_node(self, name):
         if name not in self._adjacency:
             self._adjacency[name] = {}
+            self.invalidate()
 
     def add_nodes(self, *names):
         for name in names:
@@ -112,6 +238,7 @@ class DiGraph:
         self.add_nodes(origin, destination)
         if destination not in self._adjacency[origin]:
             self._adjacency[origin][destination] = weight
+            self.invalidate()
 
     def add_edges(self, edges):
         for edge in edges:
@@ -120,17 +247,93 @@ class DiGraph:
     def edge_weight(self, origin, destination):
         return self._adjacency[origin][destination]
 
-    def shortest_path(self, source, destination):
-        try:
-            path = [destination]
-            d, p = bellman_ford(self._adjacency, source)
-            predecessor = p[destination]
-            while predecessor != source:
-                path.append(predecessor)
-                predecessor = p[predecessor]
-            return list(reversed(path))
-        except AssertionError as e:
-            print(e)
+    # region Shortest paths
+    @property
+    def has_negative_weights(self) -> bool:
+        if self._has_negative_weights is None:
+            self._has_negative_weights = any(weight < 0 for neighbours in self._adjacency.values()
+                                             for weight in neighbours.values())
+        return self._has_negative_weights
+
+    def shortest_path_tree(self, source, method=None):
+        """
+        Shortest distances and predecessors from a source, cached by source and method until the graph changes.
+
+        Args:
+            source: Node to measure distances from
+            method: 'dijkstra', 'spfa', 'bellman_ford' or 'floyd_warshall' (the tree computed by
+                `all_pairs_shortest_paths`), or None to use Dijkstra's algorithm if no weight is negative and SPFA
+                otherwise
+
+        Returns:
+            tuple: (distances, predecessors) dictionaries
+        """
+        if method is None:
+            method = 'spfa' if self.has_negative_weights else 'dijkstra'
+        if (source, method) not in self._trees:
+            if method == 'floyd_warshall':
+                self.all_pairs_shortest_paths()
+            else:
+                self._trees[(source, method)] = SHORTEST_PATH_METHODS[method](self._adjacency, source)
+        return self._trees[(source, method)]
+
+    def all_pairs_shortest_paths(self):
+        """
+        Compute the shortest path tree of every node at once with the Floyd-Warshall algorithm, which is faster
+        than one search per source on small graphs. The trees are cached under the method 'floyd_warshall', next
+        to any computed per source; pass that method to `shortest_path_tree` and `shortest_path` to reuse them.
+
+        Returns:
+            tuple: (distances, predecessors) dictionaries of the format {source: {node: value}}
+        """
+        d, p = floyd_warshall(self._adjacency)
+        for source in d:
+            self._trees[(source, 'floyd_warshall')] = (d[source], p[source])
+        return d, p
+
+    def shortest_path(self, source, destination, method=None):
+        """
+        Nodes on the shortest path between two nodes.
+
+        Args:
+            source: First node of the path
+            destination: Last node of the path
+            method: See `shortest_path_tree`
+
+        Returns:
+            list: Nodes on the path, including the source and destination, or None if the destination cannot be
+            reached
+        """
+        d, p = self.shortest_path_tree(source, method=method)
+        if d.get(destination, float('Inf')) == float('Inf'):
+            return None
+        path = [destination]
+        while path[-1] != source:
+            if len(path) > len(self._adjacency):
+                raise ValueError("Predecessors of {} loop through a negative weight cycle.".format(destination))
+            path.append(p[path[-1]])
+        return list(reversed(path))
+
+    def path_length(self, source, destination, method=None):
+        """
+        Total weight of the shortest path between two nodes, or infinity if the destination cannot be reached.
+        """
+        d, p = self.shortest_path_tree(source, method=method)
+        return d.get(destination, float('Inf'))
+
+    # endregion
+
+    def arbitrage_cycles(self, source=None):
+        """
+        Cycles of edges whose weights, taken as exchange rates, multiply to more than 1.
+
+        Args:
+            source: Only look for cycles reachable from this node, or None
+
+        Returns:
+            list: arbitrage.Cycle of each opportunity, the most profitable first
+        """
+        return arbitrage.arbitrage_cycles(self, source=source)
 
     def add_inverse(self):
         inverse = self.inverse
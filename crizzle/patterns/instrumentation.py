@@ -0,0 +1,216 @@
+"""
+Latency and throughput metrics of observers.
+
+An Instrumentation object passed to an Observable, a HandlerChain or a dispatcher records, for every observer:
+    handle_seconds      time spent in each `handle` or `handle_batch` call
+    can_handle_seconds  time spent in each `can_handle` call (HandlerChain only)
+    lag_seconds         time the oldest event of each delivered batch waited in its queue (dispatchers only)
+    queue_depth         number of events waiting in the observer's queue after each publish (dispatchers only)
+and counts the events, batches, errors and dropped events. `snapshot` returns them as dictionaries and
+`prometheus` in the Prometheus text exposition format.
+"""
+import time
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+COUNTERS = ('events', 'batches', 'errors', 'dropped')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Upper bounds of the buckets, in increasing order; an overflow bucket is added above them
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate of a quantile: the upper bound of the bucket it falls in (or the maximum, in the overflow bucket).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative_counts(self) -> list:
+        """
+        Returns:
+            list: (upper bound, number of values at or below it) of every bucket, ending with (inf, count)
+        """
+        cumulative = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else 0.0,
+                'max': self.max, 'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99)}
+
+
+class ObserverMetrics:
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, depth_buckets=DEPTH_BUCKETS):
+        self.histograms = {'handle_seconds': Histogram(latency_buckets),
+                           'can_handle_seconds': Histogram(latency_buckets),
+                           'lag_seconds': Histogram(latency_buckets),
+                           'queue_depth': Histogram(depth_buckets)}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def snapshot(self) -> dict:
+        snapshot = dict(self.counters)
+        snapshot.update({name: histogram.snapshot() for name, histogram in self.histograms.items()})
+        return snapshot
+
+
+class Instrumentation:
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, depth_buckets=DEPTH_BUCKETS, clock=time.perf_counter):
+        """
+        Args:
+            latency_buckets: Bucket bounds of the latency histograms, in seconds
+            depth_buckets: Bucket bounds of the queue depth histograms
+            clock: Function returning the current time in seconds
+        """
+        self.latency_buckets = latency_buckets
+        self.depth_buckets = depth_buckets
+        self.clock = clock
+        self._metrics = {}
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def name(self, observer) -> str:
+        """
+        Label of an observer: its `name` attribute if it has one, otherwise its class name, numbered if several
+        instances of the class are instrumented.
+        """
+        with self._lock:
+            return self._name(observer)
+
+    def _name(self, observer) -> str:
+        name = self._names.get(observer)
+        if name is None:
+            name = getattr(observer, 'name', None)
+            if not isinstance(name, str):
+                name = type(observer).__name__
+                taken = set(self._names.values())
+                if name in taken:
+                    name = next('{}-{}'.format(name, i) for i in range(2, len(taken) + 2)
+                                if '{}-{}'.format(name, i) not in taken)
+            self._names[observer] = name
+        return name
+
+    def _observer_metrics(self, observer) -> ObserverMetrics:
+        metrics = self._metrics.get(observer)
+        if metrics is None:
+            self._name(observer)
+            metrics = self._metrics[observer] = ObserverMetrics(self.latency_buckets, self.depth_buckets)
+        return metrics
+
+    # region Recording
+    def measure(self, observer, kind: str, function, *args, events: int = 1):
+        """
+        Call a method of an observer, recording how long it took.
+
+        Args:
+            observer: Observer whose method is called
+            kind: 'handle' or 'can_handle'
+            function: Method to call
+            *args: Arguments of the method
+            events: Number of events the call handles
+
+        Returns:
+            The method's result. Exceptions are counted as errors and re-raised.
+        """
+        start = self.clock()
+        try:
+            return function(*args)
+        except Exception:
+            self.count(observer, 'errors')
+            raise
+        finally:
+            elapsed = self.clock() - start
+            if kind == 'handle':
+                self.record_handle(observer, elapsed, events)
+            else:
+                with self._lock:
+                    self._observer_metrics(observer).histograms['can_handle_seconds'].observe(elapsed)
+
+    def record_handle(self, observer, seconds: float, events: int = 1) -> None:
+        with self._lock:
+            metrics = self._observer_metrics(observer)
+            metrics.histograms['handle_seconds'].observe(seconds)
+            metrics.counters['events'] += events
+            metrics.counters['batches'] += 1
+
+    def record_lag(self, observer, seconds: float) -> None:
+        with self._lock:
+            self._observer_metrics(observer).histograms['lag_seconds'].observe(seconds)
+
+    def record_depth(self, observer, depth: int) -> None:
+        with self._lock:
+            self._observer_metrics(observer).histograms['queue_depth'].observe(depth)
+
+    def count(self, observer, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._observer_metrics(observer).counters[counter] += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics = {}
+
+    # endregion
+
+    # region Export
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Dictionary of the format {observer name: {counter: int, histogram: {'count', 'sum', 'mean',
+            'max', 'p50', 'p90', 'p99'}}}
+        """
+        with self._lock:
+            return {self._names[observer]: metrics.snapshot() for observer, metrics in self._metrics.items()}
+
+    def prometheus(self, prefix: str = 'crizzle_observer') -> str:
+        """
+        All metrics in the Prometheus text exposition format, labelled by observer.
+        """
+        lines = []
+        with self._lock:
+            observers = [(self._names[observer], metrics) for observer, metrics in self._metrics.items()]
+            for counter in COUNTERS:
+                name = '{}_{}_total'.format(prefix, counter)
+                lines.append('# TYPE {} counter'.format(name))
+                for label, metrics in observers:
+                    lines.append('{}{{observer="{}"}} {}'.format(name, label, metrics.counters[counter]))
+            for histogram_name in ('handle_seconds', 'can_handle_seconds', 'lag_seconds', 'queue_depth'):
+                name = '{}_{}'.format(prefix, histogram_name)
+                lines.append('# TYPE {} histogram'.format(name))
+                for label, metrics in observers:
+                    histogram = metrics.histograms[histogram_name]
+                    for bound, count in histogram.cumulative_counts():
+                        lines.append('{}_bucket{{observer="{}",le="{}"}} {}'.format(
+                            name, label, '+Inf' if bound == float('inf') else repr(float(bound)), count))
+                    lines.append('{}_sum{{observer="{}"}} {}'.format(name, label, repr(histogram.sum)))
+                    lines.append('{}_count{{observer="{}"}} {}'.format(name, label, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    # endregion
@@ -3,10 +3,67 @@ A set of parent classes to implement the Observer design pattern.
 These are used to enable the  event-driven nature of crizzle.
 """
 import logging
+import itertools
+from collections import namedtuple
 from abc import ABCMeta, abstractmethod
 
 logger = logging.getLogger(__name__)
 
+# Matches any value of a topic field in a subscription.
+ANY = None
+
+# What an event is about, for example Topic('kline', 'ETHBTC', '1m'). Fields left as ANY in a subscription match
+# every value.
+Topic = namedtuple('Topic', ['event_type', 'symbol', 'interval'])
+Topic.__new__.__defaults__ = (ANY, ANY)
+
+
+class RoutingTable:
+    """
+    Observers subscribed to topics. Finding the observers of an event's topic looks up the at most 8 subscriptions
+    that match it (each field either equal or ANY), so it costs O(subscribers of the topic) however many
+    observers subscribe to other topics.
+    """
+    def __init__(self):
+        self._routes = {}  # Topic -> {observer: None}, an ordered set
+        self._matches = {}  # Topic of an event -> list of observers, cached until subscriptions change
+
+    def add(self, observer, topic: Topic):
+        self._routes.setdefault(Topic(*topic), {})[observer] = None
+        self._matches = {}
+
+    def remove(self, observer, topic: Topic = None):
+        """
+        Remove an observer's subscription to a topic, or all of its subscriptions if topic is None.
+        """
+        topics = list(self._routes) if topic is None else [Topic(*topic)]
+        for key in topics:
+            observers = self._routes.get(key, {})
+            observers.pop(observer, None)
+            if len(observers) == 0:
+                self._routes.pop(key, None)
+        self._matches = {}
+
+    def match(self, topic: Topic) -> list:
+        """
+        Returns:
+            list: Observers subscribed to a topic matching the given one, each listed once
+        """
+        topic = Topic(*topic)
+        observers = self._matches.get(topic)
+        if observers is None:
+            observers = {}
+            for key in set(itertools.product(*((field, ANY) for field in topic))):
+                observers.update(self._routes.get(key, {}))
+            observers = self._matches[topic] = list(observers)
+        return observers
+
+    def topics(self, observer) -> list:
+        return [topic for topic, observers in self._routes.items() if observer in observers]
+
+    def __len__(self):
+        return len(self._routes)
+
 
 class Observable:
     """
@@ -18,29 +75,113 @@ class Observable:
 
         Data handlers - On the arrival of new data, update the object's state so observers know when to emit an event.
     """
-    def __init__(self):
+    def __init__(self, dispatcher=None, instrumentation=None):
+        """
+        Args:
+            dispatcher: Dispatcher delivering events to observers asynchronously (see crizzle.patterns.dispatch),
+                or None to call observers synchronously on the thread that sets the state
+            instrumentation: Instrumentation recording how long synchronous observers take to handle events
+                (see crizzle.patterns.instrumentation); give it to the dispatcher instead when there is one
+        """
         self._observers = set()
+        self._routes = RoutingTable()
         self._state = None
+        self.dispatcher = dispatcher
+        self.instrumentation = instrumentation
 
     def register(self, observer):
+        """
+        Add an observer to notify of every event.
+
+        Args:
+            observer: an instance of the Observer class
+        """
         self._observers.add(observer)
         observer.add_subject(self)
 
     def unregister(self, observer):
         """
-        Add an observer to notify on event
+        Remove an observer, along with all of its subscriptions.
+
+        Args:
+            observer: an instance of the Observer class
+        """
+        self._observers.discard(observer)
+        self._routes.remove(observer)
+
+    def subscribe(self, observer, event_type=ANY, symbol=ANY, interval=ANY):
+        """
+        Add an observer to notify only of events published with a matching topic. The observer's `can_handle`
+        is not consulted for them.
 
         Args:
             observer: an instance of the Observer class
+            event_type: Type of event, for example 'kline' or 'trade', or ANY
+            symbol: Trading symbol, or ANY
+            interval: Candlestick interval, or ANY
+        """
+        self._routes.add(observer, Topic(event_type, symbol, interval))
+        observer.add_subject(self)
+
+    def unsubscribe(self, observer, event_type=ANY, symbol=ANY, interval=ANY):
+        self._routes.remove(observer, Topic(event_type, symbol, interval))
+
+    def observers(self, topic: Topic = None) -> list:
+        """
+        Observers to notify of an event.
+
+        Args:
+            topic: Topic the event was published with, or None for an event without one, which only goes to
+                observers registered for every event
 
         Returns:
+            list: Registered observers followed by those subscribed to the topic
+        """
+        if topic is None or len(self._routes) == 0:
+            return list(self._observers)
+        return list(self._observers) + [observer for observer in self._routes.match(topic)
+                                        if observer not in self._observers]
 
+    def publish(self, state, event_type, symbol=None, interval=None):
+        """
+        Set the state and notify the observers of its topic.
+        """
+        self._state = state
+        self.notify(Topic(event_type, symbol, interval))
+
+    def notify(self, topic: Topic = None):
+        observers = self.observers(topic)
+        if self.dispatcher is not None:
+            self.dispatcher.publish(self, [self._state], observers)
+            return
+        for observer in observers:
+            if self.instrumentation is None:
+                observer.handle(self, self._state)
+            else:
+                self.instrumentation.measure(observer, 'handle', observer.handle, self, self._state)
+
+    def notify_batch(self, states: list, topic: Topic = None):
         """
-        self._observers.remove(observer)
+        Emit several states at once. Each observer receives all of them in a single `handle_batch` call
+        (or in batches of its queue's batch size, with a dispatcher).
 
-    def notify(self):
-        for observer in self._observers:
-            observer.handle(self, self._state)
+        Args:
+            states: New states, oldest first; the last one becomes the object's state
+            topic: Topic shared by the states, see `observers`
+        """
+        if len(states) == 0:
+            return
+        self._state = states[-1]
+        observers = self.observers(topic)
+        if self.dispatcher is not None:
+            self.dispatcher.publish(self, states, observers)
+            return
+        for observer in observers:
+            if self.instrumentation is None:
+                observer.handle_batch(self, states)
+            else:
+                self.instrumentation.measure(observer, 'handle', observer.handle_batch, self, states,
+                                             events=len(states))
 
     @property
     def state(self):
@@ -73,6 +214,20 @@ class Observer(metaclass=ABCMeta):
         """
         pass
 
+    def handle_batch(self, caller, states):
+        """
+        Handle several events from the same caller at once. Override to avoid paying per-event overhead.
+
+        Args:
+            caller: The object that emitted the events
+            states: Event data, oldest first
+
+        Returns:
+            None
+        """
+        for state in states:
+            self.handle(caller, state)
+
     @abstractmethod
     def can_handle(self, caller, state) -> bool:
         """
@@ -102,25 +257,55 @@ class HandlerChain(Observer):
     When an event is received, it is passed down a chain of registered Observer
     objects, each of which handles the event its own way.
     """
-    def __init__(self):
+    def __init__(self, instrumentation=None, topic=None):
+        """
+        Args:
+            instrumentation: Instrumentation recording how long handlers take to check and handle events
+            topic: Function returning the Topic of a state, needed to route events to handlers added with a topic
+        """
         super(HandlerChain, self).__init__()
         self._handlers = []
+        self._routes = RoutingTable()
+        self.instrumentation = instrumentation
+        self.topic = topic
 
-    def add_handler(self, handler):
+    def add_handler(self, handler, event_type=ANY, symbol=ANY, interval=ANY):
+        """
+        Add a handler to the chain. A handler added with a topic only receives events whose topic matches, without
+        its `can_handle` being called; otherwise it is asked `can_handle` for every event.
+        """
         assert isinstance(handler, Observer)
-        self._handlers.append(handler)
+        topic = Topic(event_type, symbol, interval)
+        if topic == Topic(ANY):
+            self._handlers.append(handler)
+        else:
+            if self.topic is None:
+                raise ValueError("Routing handlers by topic needs a topic function.")
+            self._routes.add(handler, topic)
 
     def remove_handler(self, handler):
         if handler in self._handlers:
             self._handlers.remove(handler)
+        self._routes.remove(handler)
 
     def handle(self, caller, state):
         handled = False
-        if len(self._handlers) == 0:
+        if len(self._handlers) == 0 and len(self._routes) == 0:
             raise Exception("Handler chain is empty.")
+        if len(self._routes) > 0:
+            for handler in self._routes.match(self.topic(state)):
+                if self.instrumentation is None:
+                    handler.handle(caller, state)
+                else:
+                    self.instrumentation.measure(handler, 'handle', handler.handle, caller, state)
+                handled = True
         for handler in self._handlers:
-            if handler.can_handle(caller, state):
-                handler.handle(caller, )
+            if self.instrumentation is None:
+                if handler.can_handle(caller, state):
+                    handler.handle(caller, state)
+                    handled = True
+            elif self.instrumentation.measure(handler, 'can_handle', handler.can_handle, caller, state):
+                self.instrumentation.measure(handler, 'handle', handler.handle, caller, state)
                 handled = True
         if not handled:
             raise Exception("No valid handlers found.")
@@ -0,0 +1,211 @@
+"""
+Incrementally updated graph of exchange rates for spotting triangular arbitrage.
+
+Every trading pair contributes two edges: selling the base asset for the quote asset, and buying it back. All
+triangles of edges are enumerated once, when pairs are added, and indexed by the pairs they trade. A price update
+then only rewrites the two edges of its pair and re-checks the triangles that go through them, and only if the
+price actually changed.
+
+Rates are kept as logarithms in one array, so checking a set of triangles is a single gather and sum.
+"""
+import math
+import logging
+import numpy as np
+
+from crizzle.patterns.arbitrage import Cycle, DEFAULT_TOLERANCE
+from crizzle.patterns.graph import DiGraph
+
+logger = logging.getLogger(__name__)
+
+
+class PriceGraph:
+    def __init__(self, pairs=None, min_rate: float = 1.0, tolerance: float = DEFAULT_TOLERANCE):
+        """
+        Args:
+            pairs: (symbol, base asset, quote asset) of each trading pair
+            min_rate: Rate a triangle must return to be reported as an opportunity, for example 1.001 to ignore
+                opportunities returning less than 0.1%
+            tolerance: Amount by which a triangle's log rate must exceed log(min_rate), so that rounding errors are
+                not mistaken for opportunities
+        """
+        self.min_rate = min_rate
+        self.tolerance = tolerance
+        self._pairs = {}  # symbol -> (base, quote, index of its forward edge; the inverse edge follows it)
+        self._edges = {}  # (origin, destination) -> edge index
+        self._neighbours = {}  # asset -> set of assets it trades against
+        self._edge_info = []  # (origin, destination, symbol) of each edge
+        self._log_rates = np.full(64, np.nan)  # grown by doubling; only the first len(self._edge_info) are used
+        self._cycles = []  # edge indices of each triangle
+        self._cycles_of = {}  # symbol -> indices of the triangles trading it
+        self._cycle_array = np.empty((0, 3), dtype=np.int64)
+        self._cycles_of_array = {}
+        self.checked = 0  # Number of triangle checks, for monitoring how much work updates cause
+        if pairs is not None:
+            for symbol, base, quote in pairs:
+                self.add_pair(symbol, base, quote)
+
+    # region Structure
+    @property
+    def symbols(self) -> list:
+        return list(self._pairs)
+
+    @property
+    def assets(self) -> list:
+        return list(self._neighbours)
+
+    @property
+    def cycle_count(self) -> int:
+        return len(self._cycles)
+
+    def add_pair(self, symbol: str, base: str, quote: str) -> None:
+        """
+        Add a trading pair, enumerating the triangles it closes. Its rates are unknown until it is updated.
+        """
+        if symbol in self._pairs:
+            return
+        if (base, quote) in self._edges or (quote, base) in self._edges:
+            raise ValueError("Assets {} and {} are already traded by another pair.".format(base, quote))
+        forward = len(self._edge_info)
+        self._pairs[symbol] = (base, quote, forward)
+        self._edges[(base, quote)] = forward
+        self._edges[(quote, base)] = forward + 1
+        self._edge_info.extend([(base, quote, symbol), (quote, base, symbol)])
+        if len(self._edge_info) > len(self._log_rates):
+            self._log_rates = np.concatenate([self._log_rates, np.full(len(self._log_rates), np.nan)])
+        self._cycles_of[symbol] = []
+        for third in self._neighbours.get(base, set()) & self._neighbours.get(quote, set()):
+            for a, b in ((base, quote), (quote, base)):
+                self._add_cycle([a, b, third])
+        self._neighbours.setdefault(base, set()).add(quote)
+        self._neighbours.setdefault(quote, set()).add(base)
+        self._cycle_array = None
+
+    def _add_cycle(self, nodes: list) -> None:
+        edges = [self._edges[(nodes[i], nodes[(i + 1) % len(nodes)])] for i in range(len(nodes))]
+        index = len(self._cycles)
+        self._cycles.append(edges)
+        for symbol in {self._edge_info[edge][2] for edge in edges}:
+            self._cycles_of[symbol].append(index)
+
+    def _build_arrays(self) -> None:
+        self._cycle_array = np.array(self._cycles, dtype=np.int64).reshape(-1, 3)
+        self._cycles_of_array = {symbol: np.array(cycles, dtype=np.int64)
+                                 for symbol, cycles in self._cycles_of.items()}
+
+    def _cycle(self, index: int, log_rate: float) -> Cycle:
+        nodes = [self._edge_info[edge][0] for edge in self._cycles[index]]
+        return Cycle(nodes, -log_rate, math.exp(log_rate))
+
+    # endregion
+
+    # region Updates
+    def rate(self, origin: str, destination: str) -> float:
+        """
+        Amount of `destination` received for one `origin`, or NaN if not known yet.
+        """
+        return math.exp(self._log_rates[self._edges[(origin, destination)]])
+
+    def set_price(self, symbol: str, bid: float, ask: float = None) -> bool:
+        """
+        Update the edges of one pair without checking for opportunities.
+
+        Args:
+            symbol: Trading symbol
+            bid: Price the base asset can be sold at
+            ask: Price the base asset can be bought at, or None if the same as `bid`
+
+        Returns:
+            bool: Whether either rate of the pair changed
+        """
+        forward = self._pairs[symbol][2]
+        ask = bid if ask is None else ask
+        sell = math.log(bid) if bid > 0 else np.nan
+        buy = -math.log(ask) if ask > 0 else np.nan
+        old_sell, old_buy = self._log_rates[forward], self._log_rates[forward + 1]
+        if (sell == old_sell or (sell != sell and old_sell != old_sell)) and \
+                (buy == old_buy or (buy != buy and old_buy != old_buy)):
+            return False
+        self._log_rates[forward] = sell
+        self._log_rates[forward + 1] = buy
+        return True
+
+    def update(self, symbol: str, bid: float, ask: float = None) -> list:
+        """
+        Update the prices of one pair and re-check the triangles trading it, if its prices changed.
+
+        Returns:
+            list: arbitrage.Cycle of each opportunity through the pair, the most profitable first
+        """
+        if not self.set_price(symbol, bid, ask):
+            return []
+        return self.check([symbol])
+
+    def update_many(self, prices: dict) -> list:
+        """
+        Update the prices of several pairs and re-check the triangles trading any pair whose prices changed.
+
+        Args:
+            prices: Dictionary of the format {symbol: price} or {symbol: (bid, ask)}. Unknown symbols are ignored.
+
+        Returns:
+            list: arbitrage.Cycle of each opportunity through the changed pairs, the most profitable first
+        """
+        changed = []
+        for symbol, price in prices.items():
+            if symbol not in self._pairs:
+                continue
+            if isinstance(price, (tuple, list)):
+                updated = self.set_price(symbol, *price)
+            else:
+                updated = self.set_price(symbol, price)
+            if updated:
+                changed.append(symbol)
+        return self.check(changed)
+
+    def check(self, symbols=None) -> list:
+        """
+        Find opportunities among the triangles trading any of the given pairs.
+
+        Args:
+            symbols: Trading symbols, or None to check every triangle
+
+        Returns:
+            list: arbitrage.Cycle of each opportunity, the most profitable first
+        """
+        if self._cycle_array is None:
+            self._build_arrays()
+        if symbols is None:
+            indices = np.arange(len(self._cycle_array))
+        elif len(symbols) == 0:
+            return []
+        elif len(symbols) == 1:
+            indices = self._cycles_of_array[symbols[0]]
+        else:
+            indices = np.unique(np.concatenate([self._cycles_of_array[symbol] for symbol in symbols]))
+        if len(indices) == 0:
+            return []
+        self.checked += len(indices)
+        log_rates = self._log_rates[self._cycle_array[indices]].sum(axis=1)
+        profitable = np.flatnonzero(log_rates > math.log(self.min_rate) + self.tolerance)
+        profitable = profitable[np.argsort(-log_rates[profitable])]
+        return [self._cycle(int(indices[i]), float(log_rates[i])) for i in profitable]
+
+    # endregion
+
+    def to_digraph(self, inverse: bool = True):
+        """
+        Snapshot of the known rates as a DiGraph.
+
+        Args:
+            inverse: Whether to include the edges buying back each pair's base asset
+
+        Returns:
+            DiGraph: Graph whose edge weights are exchange rates
+        """
+        edges = []
+        for symbol, (base, quote, forward) in self._pairs.items():
+            if not np.isnan(self._log_rates[forward]):
+                edges.append([base, quote, math.exp(self._log_rates[forward])])
+            if inverse and not np.isnan(self._log_rates[forward + 1]):
+                edges.append([quote, base, math.exp(self._log_rates[forward + 1])])
+        return DiGraph(edges=edges)
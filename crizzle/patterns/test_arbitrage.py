@@ -0,0 +1,66 @@
+import math
+import numpy as np
+
+from crizzle.patterns import arbitrage
+from crizzle.patterns.graph import DiGraph
+
+
+def triangle(rate):
+    graph = DiGraph(edges=[['ETH', 'BTC', 0.07], ['LTC', 'ETH', 0.2], ['BTC', 'LTC', 1 / 0.014 * rate]])
+    graph.add_inverse()
+    return graph
+
+
+def test_no_cycle():
+    assert triangle(1.0).arbitrage_cycles() == []
+
+
+def test_triangle():
+    cycles = triangle(1.01).arbitrage_cycles()
+    assert len(cycles) == 1
+    cycle = cycles[0]
+    assert cycle.nodes in (['ETH', 'BTC', 'LTC'], ['BTC', 'LTC', 'ETH'], ['LTC', 'ETH', 'BTC'])
+    assert math.isclose(cycle.rate, 1.01)
+    assert math.isclose(cycle.weight, -math.log(1.01))
+
+
+def test_reverse_triangle():
+    cycles = triangle(0.99).arbitrage_cycles()
+    assert len(cycles) == 1
+    assert cycles[0].nodes in (['ETH', 'LTC', 'BTC'], ['LTC', 'BTC', 'ETH'], ['BTC', 'ETH', 'LTC'])
+    assert math.isclose(cycles[0].rate, 1 / 0.99)
+
+
+def test_unreachable_from_source():
+    graph = triangle(1.01)
+    graph.add_edges([['USDT', 'EUR', 0.9], ['EUR', 'USDT', 1 / 0.9]])
+    assert graph.arbitrage_cycles(source='USDT') == []
+    assert len(graph.arbitrage_cycles(source='ETH')) == 1
+
+
+def test_dense():
+    weights = np.full((4, 4), np.inf)
+    weights[0, 1], weights[1, 2], weights[2, 0] = 1, -2, 0.5
+    weights[2, 3], weights[3, 2] = 1, -0.5
+    sources, destinations, values = arbitrage.dense_to_edges(weights)
+    cycles = arbitrage.negative_cycles(sources, destinations, values, 4)
+    assert cycles == [([0, 1, 2], -0.5)]
+
+
+def test_csr():
+    # Two disjoint negative cycles: 0 -> 1 -> 0 and 2 -> 3 -> 2
+    indptr = [0, 1, 2, 3, 4]
+    indices = [1, 0, 3, 2]
+    data = [-1, 0.5, 2, -3]
+    sources, destinations, values = arbitrage.csr_to_edges(indptr, indices, data)
+    cycles = arbitrage.negative_cycles(sources, destinations, values, 4)
+    assert sorted(cycles) == [([0, 1], -0.5), ([2, 3], -1.0)]
+
+
+def test_distances():
+    sources, destinations, weights = [0, 0, 1, 2], [1, 2, 3, 3], [1, 4, 2, 0.5]
+    distances, predecessors, improving = arbitrage.bellman_ford(sources, destinations, weights, 5, source=0)
+    assert list(distances[:4]) == [0, 1, 4, 3]
+    assert distances[4] == np.inf
+    assert list(predecessors) == [-1, 0, 1, 2, -1]
+    assert len(improving) == 0
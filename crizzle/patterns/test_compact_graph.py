@@ -0,0 +1,62 @@
+import math
+import numpy as np
+from nose.tools import assert_raises
+
+from crizzle.patterns import CompactGraph, DiGraph
+
+adjacency = {'ETH': {'BTC': 0.07}, 'LTC': {'BTC': 0.014, 'ETH': 0.21}, 'BTC': {}}
+
+
+def test_round_trip():
+    graph = CompactGraph.from_adjacency(adjacency)
+    assert graph.nodes == ['ETH', 'LTC', 'BTC']
+    assert graph.edge_count == 3
+    assert list(graph.iter_edges()) == DiGraph(adjacency=adjacency).edges
+    assert graph.to_adjacency() == adjacency
+    assert graph.to_digraph().edges == DiGraph(adjacency=adjacency).edges
+
+
+def test_views():
+    graph = CompactGraph.from_adjacency(adjacency)
+    assert graph.sources.tolist() == [0, 1, 1]
+    assert graph.destinations.tolist() == [2, 2, 0]
+    with assert_raises(ValueError):
+        graph.weights[0] = 1
+    graph.add_edge('BTC', 'USDT', 9000)
+    indptr, indices, weights = graph.csr()
+    assert indptr.tolist() == [0, 1, 3, 4, 4]
+    destinations, weights = graph.neighbours('LTC')
+    assert [graph.name(i) for i in destinations] == ['BTC', 'ETH']
+    assert np.shares_memory(destinations, graph.csr()[1])
+    assert graph.edge_weight('LTC', 'ETH') == 0.21
+    with assert_raises(KeyError):
+        graph.edge_weight('BTC', 'LTC')
+
+
+def test_growth():
+    graph = CompactGraph(capacity=1)
+    for i in range(100):
+        graph.add_edge(i, i + 1, float(i))
+    assert graph.edge_count == 100
+    assert graph.node_count == 101
+    assert graph.weights.sum() == sum(range(100))
+
+
+def test_inverse():
+    graph = CompactGraph.from_adjacency(adjacency)
+    inverse = graph.inverse
+    assert math.isclose(inverse.edge_weight('BTC', 'ETH'), 1 / 0.07)
+    assert inverse.edge_count == 3
+    graph.add_inverse()
+    assert graph.edge_count == 6
+    assert math.isclose(graph.edge_weight('ETH', 'LTC'), 1 / 0.21)
+
+
+def test_algorithms():
+    graph = CompactGraph.from_adjacency(adjacency)
+    graph.add_inverse()
+    cycles = graph.arbitrage_cycles()
+    assert len(cycles) == 1
+    assert math.isclose(cycles[0].rate, 0.21 * 0.07 / 0.014)
+    distances = CompactGraph.from_adjacency({'A': {'B': 1, 'C': 4}, 'B': {'C': 2}, 'D': {}}).shortest_distances('A')
+    assert distances == {'A': 0, 'B': 1, 'C': 3}
@@ -0,0 +1,143 @@
+import time
+import asyncio
+import threading
+from nose.tools import assert_raises
+
+from crizzle.patterns import Observable, Observer
+from crizzle.patterns import dispatch
+
+
+class Recorder(Observer):
+    def __init__(self, delay=0.0, gate=None):
+        super(Recorder, self).__init__()
+        self.delay = delay
+        self.gate = gate  # Event every batch waits for before it is handled
+        self.batches = []
+        self.threads = set()
+
+    def handle(self, caller, state):
+        self.handle_batch(caller, [state])
+
+    def handle_batch(self, caller, states):
+        self.threads.add(threading.current_thread().name)
+        if self.gate is not None:
+            self.gate.wait(timeout=10)
+        time.sleep(self.delay)
+        self.batches.append(list(states))
+
+    def can_handle(self, caller, state):
+        return True
+
+    @property
+    def states(self):
+        return [state for batch in self.batches for state in batch]
+
+
+class AsyncRecorder(Recorder):
+    async def handle(self, caller, state):
+        await asyncio.sleep(0)
+        self.batches.append([state])
+
+    handle_batch = Observer.handle_batch
+
+
+def test_synchronous():
+    subject = Observable()
+    observer = Recorder()
+    subject.register(observer)
+    subject.state = 1
+    subject.notify_batch([2, 3])
+    assert observer.batches == [[1], [2, 3]]
+    assert subject.state == 3
+
+
+def test_slow_observer_does_not_block():
+    gate = threading.Event()
+    with dispatch.ThreadedDispatcher(workers=2) as dispatcher:
+        subject = Observable(dispatcher=dispatcher)
+        slow, fast = Recorder(gate=gate), Recorder()
+        subject.register(slow)
+        subject.register(fast)
+        for i in range(20):
+            subject.state = i
+        # Publishing returned and the fast observer got every event while the slow one is still stuck
+        assert dispatcher.queue(fast).wait_idle(timeout=5)
+        assert fast.states == list(range(20))
+        assert slow.states == []
+        gate.set()
+        assert dispatcher.join(timeout=5)
+    assert slow.states == list(range(20))
+    assert len(slow.batches) < 20  # Events queued behind a slow call arrive together
+    assert all(name.startswith('crizzle-dispatch') for name in slow.threads)
+
+
+def test_drop_oldest():
+    dispatcher = dispatch.ThreadedDispatcher(workers=1)
+    subject = Observable(dispatcher=dispatcher)
+    observer = Recorder(delay=0.05)
+    dispatcher.configure(observer, maxsize=3, policy=dispatch.DROP_OLDEST)
+    subject.register(observer)
+    subject.notify_batch(list(range(10)))
+    dispatcher.close()
+    assert observer.states[-3:] == [7, 8, 9]
+    stats = dispatcher.stats()[observer]
+    assert stats['delivered'] + stats['dropped'] == 10
+    assert stats['dropped'] > 0
+
+
+def test_coalesce_latest():
+    dispatcher = dispatch.ThreadedDispatcher(workers=1)
+    subject = Observable(dispatcher=dispatcher)
+    observer = Recorder(delay=0.05)
+    dispatcher.configure(observer, policy=dispatch.COALESCE_LATEST, key=lambda state: state['symbol'])
+    subject.register(observer)
+    subject.notify_batch([{'symbol': 'ETHBTC', 'price': i} for i in range(5)] +
+                         [{'symbol': 'LTCBTC', 'price': i} for i in range(5)])
+    dispatcher.close()
+    assert observer.states[-2:] == [{'symbol': 'ETHBTC', 'price': 4}, {'symbol': 'LTCBTC', 'price': 4}]
+    assert len(observer.states) < 10
+
+
+def test_block():
+    gate = threading.Event()
+    dispatcher = dispatch.ThreadedDispatcher(workers=1)
+    subject = Observable(dispatcher=dispatcher)
+    observer = Recorder(gate=gate)
+    dispatcher.configure(observer, maxsize=2, batch_size=1)
+    subject.register(observer)
+    publisher = threading.Thread(target=subject.notify_batch, args=(list(range(6)),))
+    publisher.start()
+    publisher.join(timeout=0.1)
+    assert publisher.is_alive()  # The publisher waits for room while the observer is stuck
+    gate.set()
+    publisher.join(timeout=5)
+    assert not publisher.is_alive()
+    dispatcher.close()
+    assert observer.states == list(range(6))
+    assert observer.batches == [[i] for i in range(6)]
+
+
+def test_unknown_policy():
+    with assert_raises(ValueError):
+        dispatch.ThreadedDispatcher().configure(Recorder(), policy='shed')
+    with assert_raises(TypeError):
+        dispatch.Dispatcher()  # schedule is abstract
+
+
+def test_asyncio():
+    async def run():
+        dispatcher = dispatch.AsyncioDispatcher()
+        subject = Observable(dispatcher=dispatcher)
+        observer, coroutine_observer = Recorder(), AsyncRecorder()
+        subject.register(observer)
+        subject.register(coroutine_observer)
+        thread = threading.Thread(target=subject.notify_batch, args=([1, 2, 3],))
+        thread.start()
+        thread.join()
+        subject.state = 4
+        await dispatcher.join_async()
+        return observer, coroutine_observer
+    assert_raises(RuntimeError, dispatch.AsyncioDispatcher)  # No loop is running
+    observer, coroutine_observer = asyncio.run(run())
+    assert observer.states == [1, 2, 3, 4]
+    assert coroutine_observer.batches == [[1], [2], [3], [4]]
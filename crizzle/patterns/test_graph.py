@@ -1,4 +1,6 @@
-from .graph import DiGraph
+from nose.tools import assert_raises
+
+from .graph import DiGraph, dijkstra
 
 def test_graph():
     g = DiGraph({
@@ -171,4 +173,65 @@ large = DiGraph(
                ['GRS', 'BTC', 0.00015789], ['GRS', 'ETH', 0.00202985], ['ADA', 'USDT', 0.37455],
                ['ADA', 'BNB', 0.02604], ['CLOAK', 'BTC', 0.0016176], ['CLOAK', 'ETH', 0.020852],
                ['GNT', 'BTC', 9.48e-05], ['GNT', 'ETH', 0.00121369], ['GNT', 'BNB', 0.06136],
-               ['LOOM', 'BTC', 5.451e-05], ['LOOM', 'ETH', 0.00069659], ['LOOM', 'BNB', 0.03492]])
\ No newline at end of file
+               ['LOOM', 'BTC', 5.451e-05], ['LOOM', 'ETH', 0.00069659], ['LOOM', 'BNB', 0.03492]])
+
+def weighted():
+    return DiGraph(edges=[['A', 'B', 4], ['A', 'C', 1], ['C', 'B', 2], ['B', 'D', 1], ['C', 'D', 5], ['E', 'A', 1]])
+
+
+def test_shortest_path():
+    g = weighted()
+    for method in ('dijkstra', 'spfa', 'bellman_ford'):
+        g.invalidate()
+        assert g.shortest_path('A', 'D', method=method) == ['A', 'C', 'B', 'D']
+        assert g.path_length('A', 'D') == 4
+        assert g.shortest_path('A', 'A', method=method) == ['A']
+
+
+def test_unreachable():
+    g = weighted()
+    assert g.shortest_path('A', 'E') is None
+    assert g.path_length('A', 'E') == float('Inf')
+    assert g.shortest_path('A', 'F') is None
+
+
+def test_negative_weights():
+    g = weighted()
+    g.add_edge('D', 'C', -3)
+    assert g.has_negative_weights
+    assert g.shortest_path('A', 'C') == ['A', 'C']
+    assert g.shortest_path('B', 'C') == ['B', 'D', 'C']
+    with assert_raises(ValueError):
+        dijkstra(g.adjacency, 'E')
+    g.add_edge('C', 'A', -2)
+    with assert_raises(ValueError):
+        g.shortest_path('A', 'D')
+
+
+def test_path_cache():
+    g = weighted()
+    tree = g.shortest_path_tree('A')
+    assert g.shortest_path_tree('A') is tree
+    g.add_edge('A', 'C', 0)  # Existing edges are not replaced
+    assert g.shortest_path_tree('A') is tree
+    g.add_edge('A', 'D', 2)
+    assert g.shortest_path_tree('A') is not tree
+    assert g.shortest_path('A', 'D') == ['A', 'D']
+    # Each method has its own tree, and computing all pairs leaves the others in place
+    tree = g.shortest_path_tree('A', method='dijkstra')
+    assert g.shortest_path_tree('A', method='bellman_ford') is not tree
+    assert g.shortest_path_tree('A', method='dijkstra') is tree
+    g.all_pairs_shortest_paths()
+    assert g.shortest_path_tree('A') is tree
+
+
+def test_all_pairs():
+    g = weighted()
+    d, p = g.all_pairs_shortest_paths()
+    assert d['E']['D'] == 5
+    assert d['D']['A'] == float('Inf')
+    assert g.shortest_path('E', 'D', method='floyd_warshall') == ['E', 'A', 'C', 'B', 'D']
+    assert g.shortest_path_tree('E', method='floyd_warshall')[0] is d['E']
+    for source in g.nodes:
+        g_single = weighted()
+        assert g_single.shortest_path_tree(source)[0] == d[source]
@@ -0,0 +1,108 @@
+from nose.tools import assert_raises
+
+from crizzle.patterns import Observable, Observer
+from crizzle.patterns import dispatch
+from crizzle.patterns.observer import HandlerChain
+from crizzle.patterns.instrumentation import Histogram, Instrumentation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Timed(Observer):
+    def __init__(self, clock, seconds, accepts=int, name=None):
+        super(Timed, self).__init__()
+        self.clock = clock
+        self.seconds = seconds
+        self.accepts = accepts
+        self.states = []
+        if name is not None:
+            self.name = name
+
+    def handle(self, caller, state):
+        if state == 'fail':
+            raise RuntimeError(state)
+        self.clock.now += self.seconds
+        self.states.append(state)
+
+    def can_handle(self, caller, state):
+        return state == 'fail' or isinstance(state, self.accepts)
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 4, 10):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(1.0) == 10
+    assert histogram.cumulative_counts() == [(1, 1), (2, 3), (5, 4), (float('inf'), 5)]
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5 and snapshot['max'] == 10 and snapshot['mean'] == 3.5
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_observable():
+    clock = FakeClock()
+    instrumentation = Instrumentation(clock=clock)
+    subject = Observable(instrumentation=instrumentation)
+    slow, fast = Timed(clock, 0.2, name='slow'), Timed(clock, 0.001, name='fast')
+    subject.register(slow)
+    subject.register(fast)
+    subject.state = 1
+    subject.notify_batch([2, 3])
+    snapshot = instrumentation.snapshot()
+    assert snapshot['slow']['events'] == 3 and snapshot['slow']['batches'] == 2
+    assert abs(snapshot['slow']['handle_seconds']['sum'] - 0.6) < 1e-9
+    assert snapshot['fast']['handle_seconds']['max'] < 0.01
+    with assert_raises(RuntimeError):
+        subject.state = 'fail'
+    assert instrumentation.snapshot()['slow']['errors'] + instrumentation.snapshot()['fast']['errors'] >= 1
+
+
+def test_handler_chain():
+    clock = FakeClock()
+    instrumentation = Instrumentation(clock=clock)
+    chain = HandlerChain(instrumentation=instrumentation)
+    numbers, words = Timed(clock, 0.01), Timed(clock, 0.02, accepts=str)
+    chain.add_handler(numbers)
+    chain.add_handler(words)
+    chain.handle(None, 1)
+    chain.handle(None, 'a')
+    assert numbers.states == [1] and words.states == ['a']
+    snapshot = instrumentation.snapshot()
+    assert set(snapshot) == {'Timed', 'Timed-2'}
+    assert snapshot['Timed']['can_handle_seconds']['count'] == 2
+    assert snapshot['Timed']['events'] == 1 and snapshot['Timed-2']['events'] == 1
+
+
+def test_dispatcher():
+    instrumentation = Instrumentation()
+    with dispatch.ThreadedDispatcher(workers=1, maxsize=2, policy=dispatch.DROP_OLDEST,
+                                     instrumentation=instrumentation) as dispatcher:
+        observer = Timed(FakeClock(), 0, name='queued')
+        dispatcher.publish(None, [1, 2, 3, 4], [observer])
+        dispatcher.join()
+    snapshot = instrumentation.snapshot()['queued']
+    assert snapshot['events'] + snapshot['dropped'] == 4
+    assert snapshot['events'] == len(observer.states)
+    assert snapshot['lag_seconds']['count'] == snapshot['batches'] > 0
+    assert snapshot['queue_depth']['max'] <= 2
+
+
+def test_prometheus():
+    instrumentation = Instrumentation(latency_buckets=(0.1, 1.0))
+    observer = Timed(FakeClock(), 0, name='strategy')
+    instrumentation.record_handle(observer, 0.5, events=3)
+    text = instrumentation.prometheus()
+    assert '# TYPE crizzle_observer_events_total counter' in text
+    assert 'crizzle_observer_events_total{observer="strategy"} 3' in text
+    assert 'crizzle_observer_handle_seconds_bucket{observer="strategy",le="0.1"} 0' in text
+    assert 'crizzle_observer_handle_seconds_bucket{observer="strategy",le="+Inf"} 1' in text
+    assert 'crizzle_observer_handle_seconds_count{observer="strategy"} 1' in text
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {}
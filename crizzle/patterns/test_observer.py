@@ -0,0 +1,73 @@
+from nose.tools import assert_raises
+
+from crizzle.patterns import Observable, Observer, Topic, ANY
+from crizzle.patterns.observer import HandlerChain, RoutingTable
+
+
+class Recorder(Observer):
+    def __init__(self):
+        super(Recorder, self).__init__()
+        self.states = []
+        self.checked = 0
+
+    def handle(self, caller, state):
+        self.states.append(state)
+
+    def can_handle(self, caller, state):
+        self.checked += 1
+        return False
+
+
+def test_routing_table():
+    table = RoutingTable()
+    a, b, c = object(), object(), object()
+    table.add(a, Topic('kline', 'ETHBTC', '1m'))
+    table.add(b, Topic('kline'))
+    table.add(c, Topic(ANY, 'ETHBTC'))
+    table.add(c, Topic('kline', 'ETHBTC'))
+    assert set(table.match(Topic('kline', 'ETHBTC', '1m'))) == {a, b, c}
+    assert len(table.match(Topic('kline', 'ETHBTC', '1m'))) == 3
+    assert set(table.match(Topic('kline', 'LTCBTC', '1m'))) == {b}
+    assert set(table.match(Topic('trade', 'ETHBTC'))) == {c}
+    table.remove(c)
+    assert table.match(Topic('trade', 'ETHBTC')) == []
+    assert table.topics(a) == [Topic('kline', 'ETHBTC', '1m')]
+
+
+def test_subscribe():
+    subject = Observable()
+    everything, klines, eth = Recorder(), Recorder(), Recorder()
+    subject.register(everything)
+    subject.subscribe(klines, 'kline', interval='1m')
+    subject.subscribe(eth, symbol='ETHBTC')
+    subject.publish(1, 'kline', 'ETHBTC', '1m')
+    subject.publish(2, 'kline', 'LTCBTC', '1h')
+    subject.publish(3, 'trade', 'ETHBTC')
+    subject.state = 4
+    subject.notify_batch([5, 6], topic=Topic('kline', 'LTCBTC', '1m'))
+    assert everything.states == [1, 2, 3, 4, 5, 6]
+    assert klines.states == [1, 5, 6]
+    assert eth.states == [1, 3]
+    assert klines.checked == eth.checked == 0
+    subject.unsubscribe(klines, 'kline', interval='1m')
+    subject.unregister(eth)
+    subject.publish(7, 'kline', 'ETHBTC', '1m')
+    assert klines.states == [1, 5, 6] and eth.states == [1, 3]
+
+
+def test_handler_chain_routing():
+    with assert_raises(ValueError):
+        HandlerChain().add_handler(Recorder(), 'kline')
+    chain = HandlerChain(topic=lambda state: Topic(*state[:3]))
+    routed, polled = Recorder(), Recorder()
+    chain.add_handler(routed, 'kline', 'ETHBTC')
+    chain.add_handler(polled)
+    chain.handle(None, ('kline', 'ETHBTC', '1m', 1.0))
+    assert routed.states == [('kline', 'ETHBTC', '1m', 1.0)]
+    assert routed.checked == 0 and polled.checked == 1
+    with assert_raises(Exception):
+        chain.handle(None, ('kline', 'LTCBTC', '1m', 1.0))
+    chain.remove_handler(routed)
+    chain.remove_handler(polled)
+    with assert_raises(Exception):
+        chain.handle(None, ('kline', 'ETHBTC', '1m', 1.0))
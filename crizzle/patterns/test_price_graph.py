@@ -0,0 +1,80 @@
+import math
+from nose.tools import assert_raises
+
+from crizzle.patterns import PriceGraph
+
+pairs = [('ETHBTC', 'ETH', 'BTC'), ('LTCBTC', 'LTC', 'BTC'), ('LTCETH', 'LTC', 'ETH'), ('BNBBTC', 'BNB', 'BTC')]
+
+
+def test_structure():
+    graph = PriceGraph(pairs)
+    assert graph.symbols == ['ETHBTC', 'LTCBTC', 'LTCETH', 'BNBBTC']
+    assert sorted(graph.assets) == ['BNB', 'BTC', 'ETH', 'LTC']
+    assert graph.cycle_count == 2  # ETH, BTC, LTC in both directions
+    with assert_raises(ValueError):
+        graph.add_pair('BTCETH', 'BTC', 'ETH')
+
+
+def test_updates():
+    graph = PriceGraph(pairs)
+    assert graph.update_many({'ETHBTC': 0.07, 'LTCBTC': 0.014, 'XRPBTC': 0.0001}) == []
+    assert graph.update('LTCETH', 0.2) == []
+    assert math.isclose(graph.rate('BTC', 'ETH'), 1 / 0.07)
+    opportunities = graph.update('LTCETH', 0.21)
+    assert len(opportunities) == 1
+    assert opportunities[0].nodes in (['LTC', 'ETH', 'BTC'], ['ETH', 'BTC', 'LTC'], ['BTC', 'LTC', 'ETH'])
+    assert math.isclose(opportunities[0].rate, 1.05)
+    assert graph.update('BNBBTC', 0.0015) == []
+    assert graph.check() == opportunities
+
+
+def test_unchanged_prices():
+    graph = PriceGraph(pairs)
+    ticker = {'ETHBTC': 0.07, 'LTCBTC': 0.014, 'LTCETH': 0.2, 'BNBBTC': 0.0015}
+    graph.update_many(ticker)
+    checked = graph.checked
+    assert checked > 0
+    assert graph.update_many(dict(ticker)) == []
+    assert graph.update('LTCETH', 0.2) == []
+    assert graph.checked == checked
+    assert graph.update_many(dict(ticker, BNBBTC=0.0016)) == []  # BNBBTC closes no triangle
+    assert graph.checked == checked
+    assert len(graph.update_many(dict(ticker, LTCETH=0.21))) == 1
+    assert graph.checked == checked + 2
+
+
+def test_bid_ask():
+    graph = PriceGraph(pairs, min_rate=1.001)
+    graph.update_many({'ETHBTC': (0.07, 0.0701), 'LTCBTC': (0.014, 0.01401)})
+    assert graph.update('LTCETH', 0.2, 0.2001) == []
+    assert math.isclose(graph.rate('ETH', 'LTC'), 1 / 0.2001)
+    assert graph.update('LTCETH', 0.2003, 0.2004) == []  # Returns less than min_rate
+    assert len(graph.update('LTCETH', 0.21, 0.2101)) == 1
+
+
+def test_to_digraph():
+    graph = PriceGraph(pairs)
+    graph.update_many({'ETHBTC': 0.07, 'LTCBTC': 0.014, 'LTCETH': 0.21})
+    digraph = graph.to_digraph()
+    assert digraph.edge_weight('ETH', 'BTC') == 0.07
+    assert math.isclose(digraph.edge_weight('BTC', 'ETH'), 1 / 0.07)
+    assert 'BNB' not in digraph.nodes
+    assert len(graph.to_digraph(inverse=False).edges) == 3
+    assert math.isclose(digraph.arbitrage_cycles()[0].rate, graph.check()[0].rate)
+
+
+def test_update_work():
+    quotes = ['BTC', 'ETH', 'BNB', 'USDT']
+    graph = PriceGraph([(quote + 'USDT', quote, 'USDT') for quote in quotes[:3]])
+    for i in range(300):
+        for quote in quotes:
+            graph.add_pair('A{}{}'.format(i, quote), 'A{}'.format(i), quote)
+    graph.update_many({symbol: 1.0 for symbol in graph.symbols})
+    # An update re-checks only the triangles through its pair, in both directions, however large the graph
+    checked = graph.checked
+    for i in range(1, 1001):
+        graph.update('A0BTC', 1.0 + i % 2)
+    assert graph.checked - checked == 2 * 1000
+    checked = graph.checked
+    graph.update('BTCUSDT', 2.0)  # Closes a triangle with each of the 300 A assets
+    assert graph.checked - checked == 2 * 300
@@ -8,4 +8,4 @@ from crizzle.patterns import memoize
 def make(exchange_name, *args, **kwargs):
     exchanges = {'poloniex': poloniex,
                  'binance': binance}
-    return exchanges[exchange_name].BinanceService(*args, **kwargs)
+    return exchanges[exchange_name].Service(*args, **kwargs)
@@ -1,2 +1,5 @@
 from crizzle.services.base.service import Service
 from crizzle.services.base.error import EnvironmentException
+from crizzle.services.base.rate_limiter import RateLimit, RateLimiter
+from crizzle.services.base.async_service import AsyncService
+from crizzle.services.base.credentials import Credentials, HmacSigner
@@ -0,0 +1,133 @@
+import json
+import asyncio
+import logging
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from crizzle.services.base.service import Service
+
+logger = logging.getLogger(__name__)
+
+
+class Response:
+    """
+    Fully-read response to a request sent by an AsyncService.
+
+    Mirrors the parts of `requests.Response` used by services so that response handling
+    (rate limit feedback, decoding) is shared between the synchronous and asynchronous transports.
+    """
+
+    def __init__(self, method: str, url: str, status_code: int, headers, content: bytes, reason: str = None):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.reason = reason
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError('{} Error: {} for url: {}'.format(self.status_code, self.reason, self.url),
+                                     response=self)
+
+    def __repr__(self):
+        return '<Response [{}]>'.format(self.status_code)
+
+
+class AsyncService(Service):
+    """
+    Service that sends its requests concurrently over a pooled asyncio HTTP client.
+
+    Request building, signing, rate limiting and decoding are shared with the synchronous `Service`;
+    only the transport differs, so every endpoint method of a service returns an awaitable when mixed in.
+    """
+
+    def __init__(self, *args, concurrency: int = 10, **kwargs):
+        """
+        Args:
+            *args: Positional arguments of the service being made asynchronous
+            concurrency (int): Maximum number of requests in flight at once
+            **kwargs: Keyword arguments of the service being made asynchronous
+        """
+        super(AsyncService, self).__init__(*args, **kwargs)
+        self.concurrency = concurrency
+        self.client = None
+
+    def open(self) -> aiohttp.ClientSession:
+        """
+        Create the pooled HTTP client if it does not exist yet. Must be called from a running event loop.
+
+        Returns:
+            aiohttp.ClientSession: The client used to send requests
+        """
+        if self.client is None or self.client.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+            self.client = aiohttp.ClientSession(connector=connector)
+        return self.client
+
+    async def close(self) -> None:
+        super(AsyncService, self).close()
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def __enter__(self):
+        raise TypeError("{} closes asynchronously; use 'async with' instead of 'with'.".format(type(self).__name__))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        raise TypeError("{} closes asynchronously; use 'async with' instead of 'with'.".format(type(self).__name__))
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def request(self, request_type: str, endpoint: str, params=None, api_version=None, data=None,
+                      headers=None, sign=False):
+        """
+        Send an asynchronous request to an API endpoint.
+
+        Args:
+            request_type (str): get | post | put | delete.
+            endpoint (str): API endpoint to send the request to, for example: '24hticker'
+            params (dict): Dictionary-like object containing the parameters to send with request
+            api_version (str): API version to send the request to
+            data (dict): Dictionary-like object containing the data to send with request
+            headers (dict): Additional headers to send with the request
+            sign (bool): whether or not to sign the request using the secret key
+
+        Returns:
+            Response: The fully-read response
+        """
+        prepped = self.prepare_request(request_type, endpoint, params=params, api_version=api_version, data=data,
+                                       headers=headers, sign=sign)
+        if self.debug:
+            return prepped
+        delay = self.rate_limiter.reserve(**self.request_cost(request_type, endpoint, params))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        client = self.open()
+        async with client.request(prepped.method, prepped.url, data=prepped.body,
+                                  headers=dict(prepped.headers)) as raw:
+            response = Response(prepped.method, prepped.url, raw.status, raw.headers, await raw.read(),
+                                reason=raw.reason)
+        self.update_rate_limits(response)
+        if not response.ok:
+            logger.error("Error while querying endpoint '{}' of service '{}': '{}'".format(endpoint, self.name,
+                                                                                          response.text))
+        logger.debug('Queried {} at {}'.format(self.name, response.url))
+        return response
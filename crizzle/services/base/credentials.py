@@ -0,0 +1,81 @@
+import os
+import hmac
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HmacSigner:
+    """
+    HMAC signer keyed once with a secret.
+
+    Keying an HMAC hashes the secret into the inner and outer pads; copying the keyed object skips that work
+    for every signature.
+    """
+
+    def __init__(self, secret: str, digestmod=hashlib.sha256):
+        self._hmac = hmac.new(bytes(secret, 'utf-8'), digestmod=digestmod)
+
+    def sign(self, payload: bytes) -> str:
+        """
+        Args:
+            payload: Bytes to sign
+
+        Returns:
+            str: Hexadecimal signature
+        """
+        signature = self._hmac.copy()
+        signature.update(payload)
+        return signature.hexdigest()
+
+
+class Credentials:
+    """
+    API key and secret of a service, parsed once from the environment variable they are stored in.
+    """
+
+    def __init__(self, env_variable_name: str, digestmod=hashlib.sha256):
+        """
+        Args:
+            env_variable_name: Name of the environment variable holding the key as JSON ({"key": ..., "secret": ...})
+            digestmod: Hash function used by the signer
+        """
+        self.env_variable_name = env_variable_name
+        self.digestmod = digestmod
+        self.key = None
+        self.secret = None
+        self.signer = None
+        self.reload()
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.key and self.secret)
+
+    def reload(self) -> None:
+        """
+        Parse the key again from the environment, for example after it was replaced by `crizzle.load_key`.
+        """
+        self.key, self.secret, self.signer = None, None, None
+        if self.env_variable_name not in os.environ:
+            return
+        try:
+            contents = json.loads(os.environ[self.env_variable_name])
+        except json.JSONDecodeError:
+            logger.error("Could not parse key stored in '{}'.".format(self.env_variable_name))
+            return
+        self.key = contents.get('key')
+        self.secret = contents.get('secret')
+        if self.secret:
+            self.signer = HmacSigner(self.secret, digestmod=self.digestmod)
+
+    def rotate(self, key: str, secret: str) -> None:
+        """
+        Replace the key and secret, both in memory and in the environment.
+        """
+        os.environ[self.env_variable_name] = json.dumps({'key': key, 'secret': secret})
+        self.reload()
+
+    def as_dict(self) -> dict:
+        return {'key': self.key, 'secret': self.secret}
@@ -0,0 +1,167 @@
+"""
+Client-side rate limiting for services.
+
+Each limit is a token bucket that refills continuously at ``limit / interval`` tokens per second.
+Callers reserve tokens before sending a request and wait out whatever deficit the reservation leaves,
+so concurrent callers are queued in the order they asked instead of being rejected.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    def __init__(self, name: str, limit: int, interval: float):
+        """
+        A single token bucket.
+
+        Args:
+            name: Name of the quantity being limited, for example 'weight' or 'orders'
+            limit: Maximum amount that may be spent per interval
+            interval: Length of the interval in seconds
+        """
+        if limit <= 0 or interval <= 0:
+            raise ValueError("Rate limit '{}' must have a positive limit and interval.".format(name))
+        self.name = name
+        self.limit = limit
+        self.interval = interval
+        self.rate = limit / interval
+        self.tokens = float(limit)
+        self.updated = None
+
+    def refill(self, now: float) -> None:
+        if self.updated is not None:
+            self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float) -> float:
+        """
+        Time to wait until `cost` tokens are available, assuming the bucket has just been refilled.
+        """
+        deficit = cost - self.tokens
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def __repr__(self):
+        return "RateLimit({!r}, {}, {})".format(self.name, self.limit, self.interval)
+
+
+class RateLimiter:
+    """
+    A set of token buckets that are charged together for every request.
+
+    A request may be charged against several buckets at once (for example, an order costs request weight
+    as well as one unit from each of the per-second and per-day order buckets).
+    """
+
+    def __init__(self, limits=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            limits (list): RateLimit objects. Buckets with the same name are all charged for that name.
+            clock: Monotonic clock returning seconds
+            sleep: Function used to block the calling thread
+        """
+        self.limits = [] if limits is None else list(limits)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+    def add_limit(self, limit: RateLimit) -> None:
+        with self._lock:
+            self.limits.append(limit)
+
+    def reserve(self, **costs) -> float:
+        """
+        Spend tokens for a request without blocking.
+
+        Buckets may go into debt; the returned delay is how long the caller must wait before the request
+        would have fit within every limit. Subsequent callers inherit the debt, so requests are queued.
+
+        Args:
+            **costs: Amount to spend per limit name, for example ``weight=5, orders=1``
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        with self._lock:
+            now = self.clock()
+            delay = 0.0
+            for limit in self.limits:
+                cost = costs.get(limit.name, 0)
+                if not cost:
+                    continue
+                if cost > limit.limit:
+                    raise ValueError("Cost {} exceeds rate limit {}.".format(cost, limit))
+                limit.refill(now)
+                delay = max(delay, limit.delay(cost))
+            for limit in self.limits:
+                cost = costs.get(limit.name, 0)
+                if cost:
+                    limit.tokens -= cost
+            return delay
+
+    def acquire(self, **costs) -> float:
+        """
+        Spend tokens for a request, blocking until the request fits within every limit.
+
+        Args:
+            **costs: Amount to spend per limit name, for example ``weight=5, orders=1``
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        delay = self.reserve(**costs)
+        if delay > 0:
+            logger.debug("Rate limiter delaying request by {:.3f}s".format(delay))
+            self.sleep(delay)
+        return delay
+
+    def observe(self, name: str, used: float, interval: float = None) -> None:
+        """
+        Synchronise buckets with usage reported by the server.
+
+        The server's count includes requests sent by other clients sharing the same key or IP,
+        so the local bucket is only ever lowered to match it, never raised.
+
+        Args:
+            name: Name of the limit the usage applies to
+            used: Amount already spent in the server's current window
+            interval: Only update buckets with this interval (seconds). All buckets named `name` if None.
+        """
+        with self._lock:
+            now = self.clock()
+            for limit in self.limits:
+                if limit.name != name or (interval is not None and limit.interval != interval):
+                    continue
+                limit.refill(now)
+                limit.tokens = min(limit.tokens, limit.limit - used)
+
+    def backoff(self, seconds: float) -> None:
+        """
+        Hold back every request for at least `seconds`, for example after the server answers 429 or 418.
+
+        Args:
+            seconds: Time for which no tokens should be available
+
+        Returns:
+            None
+        """
+        with self._lock:
+            now = self.clock()
+            for limit in self.limits:
+                limit.refill(now)
+                limit.tokens = min(limit.tokens, -seconds * limit.rate)
+
+    def available(self, name: str) -> float:
+        """
+        Tokens currently available in the tightest bucket named `name`.
+        """
+        with self._lock:
+            now = self.clock()
+            tokens = []
+            for limit in self.limits:
+                if limit.name == name:
+                    limit.refill(now)
+                    tokens.append(limit.tokens)
+            return min(tokens) if tokens else float('Inf')
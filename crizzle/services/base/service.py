@@ -3,16 +3,46 @@ import time
 import json
 import logging
 import requests
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from abc import ABCMeta, abstractmethod
 
 from crizzle.patterns import assert_in
+from crizzle.services.base.rate_limiter import RateLimiter
+from crizzle.services.base.credentials import Credentials
 
 logger = logging.getLogger(__name__)
 
+# Seconds to back off for when a rate limited response carries a Retry-After header that cannot be read.
+DEFAULT_RETRY_AFTER = 60.0
+
+
+def retry_after_seconds(value: str, now: float = None) -> float:
+    """
+    Read a Retry-After header, given either as a number of seconds or as an HTTP-date.
+
+    Args:
+        value: Value of the header
+        now: Current UNIX time, to measure an HTTP-date from; by default the system time
+
+    Returns:
+        float: Seconds to wait, or None if the value is neither form
+    """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
 
 class Service(metaclass=ABCMeta):
     def __init__(self, name: str, root: str, key=None, default_api_version=None,
-                 debug=False, default_timestamp=None):
+                 debug=False, default_timestamp=None, rate_limits=None, pool_size=10):
         """
 
         Args:
@@ -21,16 +51,66 @@ class Service(metaclass=ABCMeta):
             key:
             default_api_version:
             debug:
+            rate_limits (list): RateLimit buckets every request is charged against
+            pool_size (int): Number of keep-alive connections kept open per host
         """
         self.name = name
         self.root = root
         self.default_api_version = default_api_version
         self.debug = debug
         self.default_timestamp = default_timestamp
+        self.credentials = Credentials('CrizzleKey_{}'.format(name))
         self.load_key(key)
-        self.session = requests.Session()
+        self.pool_size = pool_size
+        self.session = self.create_session()
+        self.rate_limiter = RateLimiter(rate_limits)
         logger.debug("Initialized {} environment".format(name))
 
+    # region Session methods
+    def create_session(self) -> requests.Session:
+        """
+        Create the HTTP session used for every request, with a connection pool of `pool_size` per host.
+
+        Returns:
+            requests.Session: A new session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def connection_stats(self) -> dict:
+        """
+        Count requests sent over the connection pools that are currently open,
+        and how many of them reused a keep-alive connection.
+
+        Returns:
+            dict: Dictionary of the format {'requests': int, 'new_connections': int, 'reused_connections': int}
+        """
+        sent = created = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                sent += pool.num_requests
+                created += pool.num_connections
+        return {'requests': sent, 'new_connections': created, 'reused_connections': sent - created}
+
+    def close(self) -> None:
+        """
+        Close every pooled connection. The service opens new connections if it is used again.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # endregion
+
     # region Helper methods
     @property
     @abstractmethod
@@ -73,6 +153,30 @@ class Service(metaclass=ABCMeta):
                     os.environ[env_variable_name] = json.dumps(key)
                 except json.JSONDecodeError:
                     logger.error('Could not parse contents of key dict.')
+            self.credentials.reload()
+
+    def reload_key(self) -> None:
+        """
+        Parse the key again from the environment variable it is stored in.
+        Needed only if the variable was changed without going through this service, e.g. by `crizzle.load_key`.
+
+        Returns:
+            None
+        """
+        self.credentials.reload()
+
+    def rotate_key(self, key: str, secret: str) -> None:
+        """
+        Replace the API key and secret used by this service.
+
+        Args:
+            key: New API key
+            secret: New secret key
+
+        Returns:
+            None
+        """
+        self.credentials.rotate(key, secret)
 
     @property
     def timestamp(self) -> int:
@@ -154,6 +258,40 @@ class Service(metaclass=ABCMeta):
         """
         pass
 
+    def request_cost(self, request_type: str, endpoint: str, params: dict) -> dict:
+        """
+        Amount each rate limit is charged for a request.
+
+        Args:
+            request_type (str): get | post | put | delete
+            endpoint (str): API endpoint the request is sent to
+            params (dict): Request parameters
+
+        Returns:
+            dict: Cost per rate limit name, for example ``{'weight': 5, 'orders': 1}``
+        """
+        return {}
+
+    def update_rate_limits(self, response) -> None:
+        """
+        Feed rate limit usage reported by the server back into the rate limiter.
+
+        Args:
+            response (requests.Response): Response to a request sent by this service
+
+        Returns:
+            None
+        """
+        retry_after = response.headers.get('Retry-After')
+        if response.status_code in (418, 429) and retry_after is not None:
+            seconds = retry_after_seconds(retry_after)
+            if seconds is None:
+                logger.warning("Unreadable Retry-After header '{}'; backing off for {}s".format(retry_after,
+                                                                                               DEFAULT_RETRY_AFTER))
+                seconds = DEFAULT_RETRY_AFTER
+            logger.warning("Service '{}' is rate limited for {}s".format(self.name, seconds))
+            self.rate_limiter.backoff(seconds)
+
     def json_number_hook(self, inp):
         if isinstance(inp, list):
             for k, v in enumerate(inp):
@@ -183,25 +321,37 @@ class Service(metaclass=ABCMeta):
                         pass
         return inp
 
+    def decode(self, response):
+        """
+        Parse the JSON body of a response, converting numeric strings to numbers.
+
+        Args:
+            response: Response returned by `request`
+
+        Returns:
+            The decoded response body
+        """
+        return self.json_number_hook(response.json())
+
     # endregion
 
     # region Request methods
-    def request(self, request_type: str, endpoint: str, params=None, api_version=None, data=None, headers=None,
-                sign=False):
+    def prepare_request(self, request_type: str, endpoint: str, params=None, api_version=None, data=None,
+                        headers=None, sign=False) -> requests.PreparedRequest:
         """
-        Send a synchronous request to an API endpoint.
+        Build, sign and prepare a request to an API endpoint without sending it.
 
         Args:
             request_type (str): get | post | put | delete.
             endpoint (str): API endpoint to send the request to, for example: '24hticker'
             params (dict): Dictionary-like object containing the parameters to send with request
-            api_version (str): API version to send the request to
+            api_version (str): API version to send the request to, or None for APIs whose paths are not versioned
             data (dict): Dictionary-like object containing the data to send with request
             headers (dict): Additional headers to send with the request
             sign (bool): whether or not to sign the request using the secret key
 
         Returns:
-
+            requests.PreparedRequest: The request, ready to be sent
         """
         arguments = locals()
         if api_version is None:
@@ -211,35 +361,52 @@ class Service(metaclass=ABCMeta):
         if data is None:
             data = {}
         final_params = self.__class__.get_params(**arguments)
+        try:
+            assert_in(request_type, 'request_type', ('get', 'post', 'put', 'delete'))
+        except ValueError:
+            logger.exception('invalid request type {}'.format(request_type))
+            raise
+        if sign:
+            self.sign_request_data(params=final_params, data=data, headers=headers)
+        self.add_api_key(params=final_params, data=data, headers=headers)
+        path = endpoint if api_version is None else "{}/{}".format(api_version, endpoint)
+        request = requests.Request(request_type.upper(), "{}/{}".format(self.root, path),
+                                   params=final_params, data=data, headers=headers)
+        return request.prepare()
 
-        # TODO: implement rate limiter
-
-        with self.session as session:
-            try:
-                assert_in(request_type, 'request_type', ('get', 'post', 'put', 'delete'))
-            except ValueError:
-                logger.exception('invalid request type {}'.format(request_type))
-                raise
-            else:
-                if sign:
-                    self.sign_request_data(params=final_params, data=data, headers=headers)
-                self.add_api_key(params=final_params, data=data, headers=headers)
-                request = requests.Request(request_type.upper(), self.root + "/{}/".format(api_version) + endpoint,
-                                           params=final_params, data=data, headers=headers)
-                prepped = request.prepare()
-                if self.debug:
-                    return prepped
-                else:
-                    response = session.send(prepped)
-                    try:
-                        response.raise_for_status()
-                    except requests.HTTPError as e:
-                        logger.exception(
-                            "Error while querying endpoint '{}' of service '{}': '{}'".format(endpoint, self.name,
-                                                                                              response.text))
-                    finally:
-                        logger.debug('Queried {} at {}'.format(self.name, response.url))
-                        return response
+    def request(self, request_type: str, endpoint: str, params=None, api_version=None, data=None, headers=None,
+                sign=False):
+        """
+        Send a synchronous request to an API endpoint.
+
+        Args:
+            request_type (str): get | post | put | delete.
+            endpoint (str): API endpoint to send the request to, for example: '24hticker'
+            params (dict): Dictionary-like object containing the parameters to send with request
+            api_version (str): API version to send the request to
+            data (dict): Dictionary-like object containing the data to send with request
+            headers (dict): Additional headers to send with the request
+            sign (bool): whether or not to sign the request using the secret key
+
+        Returns:
+
+        """
+        prepped = self.prepare_request(request_type, endpoint, params=params, api_version=api_version, data=data,
+                                       headers=headers, sign=sign)
+        if self.debug:
+            return prepped
+        self.rate_limiter.acquire(**self.request_cost(request_type, endpoint, params))
+        response = self.session.send(prepped)
+        self.update_rate_limits(response)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            logger.exception(
+                "Error while querying endpoint '{}' of service '{}': '{}'".format(endpoint, self.name,
+                                                                                  response.text))
+        finally:
+            logger.debug('Queried {} at {}'.format(self.name, response.url))
+            return response
 
     def get(self, endpoint: str, params=None, api_version=None, data=None, headers=None, sign=False):
         return self.request('get', endpoint, params=params, api_version=api_version, data=data, headers=headers,
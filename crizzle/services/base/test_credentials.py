@@ -0,0 +1,36 @@
+import os
+import hmac
+import json
+import hashlib
+
+from crizzle.services.base import Credentials, HmacSigner
+
+
+def test_signer():
+    signer = HmacSigner('secret')
+    expected = hmac.new(b'secret', b'symbol=ETHBTC', digestmod=hashlib.sha256).hexdigest()
+    assert signer.sign(b'symbol=ETHBTC') == expected
+    assert signer.sign(b'symbol=ETHBTC') == expected  # the keyed object is not consumed
+
+
+def test_missing_key():
+    credentials = Credentials('CrizzleKey_credentialsmissing')
+    assert not credentials.loaded
+    assert credentials.signer is None
+
+
+def test_parsed_once():
+    os.environ['CrizzleKey_credentialstest'] = json.dumps({'key': 'key1', 'secret': 'secret1'})
+    credentials = Credentials('CrizzleKey_credentialstest')
+    os.environ['CrizzleKey_credentialstest'] = json.dumps({'key': 'key2', 'secret': 'secret2'})
+    assert credentials.key == 'key1'
+    credentials.reload()
+    assert credentials.as_dict() == {'key': 'key2', 'secret': 'secret2'}
+
+
+def test_rotate():
+    credentials = Credentials('CrizzleKey_credentialsrotate')
+    credentials.rotate('key3', 'secret3')
+    assert credentials.loaded
+    assert credentials.signer.sign(b'x') == HmacSigner('secret3').sign(b'x')
+    assert json.loads(os.environ['CrizzleKey_credentialsrotate']) == {'key': 'key3', 'secret': 'secret3'}
@@ -0,0 +1,74 @@
+from nose.tools import assert_raises
+from crizzle.services.base import RateLimit, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_limiter(*limits):
+    clock = FakeClock()
+    return RateLimiter(limits, clock=clock, sleep=clock.sleep), clock
+
+
+def test_within_limit():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    for _ in range(10):
+        assert limiter.acquire(weight=1) == 0
+    assert clock.now == 0
+
+
+def test_blocks_until_refilled():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    limiter.acquire(weight=10)
+    assert limiter.acquire(weight=5) == 0.5
+    assert clock.now == 0.5
+
+
+def test_reservations_queue():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    limiter.reserve(weight=10)
+    assert limiter.reserve(weight=5) == 0.5
+    assert limiter.reserve(weight=5) == 1.0
+
+
+def test_tightest_limit_wins():
+    limiter, clock = make_limiter(RateLimit('orders', 10, 1), RateLimit('orders', 20, 100))
+    limiter.acquire(orders=10)
+    clock.now = 1.0
+    limiter.acquire(orders=10)
+    assert round(limiter.reserve(orders=1), 6) == 4.0
+
+
+def test_unrelated_costs_ignored():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    assert limiter.reserve(orders=100) == 0
+    assert limiter.available('weight') == 10
+
+
+def test_cost_larger_than_limit():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    assert_raises(ValueError, limiter.reserve, weight=11)
+
+
+def test_observe_lowers_tokens():
+    limiter, clock = make_limiter(RateLimit('weight', 1200, 60))
+    limiter.observe('weight', 1100, interval=60)
+    assert limiter.available('weight') == 100
+    limiter.observe('weight', 10, interval=60)
+    assert limiter.available('weight') == 100
+    limiter.observe('weight', 1200, interval=1)
+    assert limiter.available('weight') == 100
+
+
+def test_backoff():
+    limiter, clock = make_limiter(RateLimit('weight', 10, 1))
+    limiter.backoff(30)
+    assert limiter.reserve(weight=1) == 30.1
@@ -0,0 +1,82 @@
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from crizzle.services.base import Service, RateLimit
+from crizzle.services.base.service import retry_after_seconds, DEFAULT_RETRY_AFTER
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        content = b'{"price": "1.5", "symbol": "ETHBTC", "ids": ["1", "2"]}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubService(Service):
+    key = {'key': None, 'secret': None}
+    key_loaded = True
+
+    def __init__(self, root):
+        super(StubService, self).__init__('stub', root, default_api_version='v1', pool_size=2)
+
+    def get_default_params(self, **kwargs):
+        return {}
+
+    def sign_request_data(self, params=None, data=None, headers=None):
+        pass
+
+    def add_api_key(self, params=None, data=None, headers=None):
+        pass
+
+
+def serve():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}/api'.format(server.server_address[1])
+
+
+def test_connection_reuse():
+    server, root = serve()
+    try:
+        with StubService(root) as svc:
+            for _ in range(3):
+                assert svc.get('ticker').status_code == 200
+            assert svc.connection_stats() == {'requests': 3, 'new_connections': 1, 'reused_connections': 2}
+        assert svc.connection_stats()['requests'] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_decode():
+    server, root = serve()
+    try:
+        with StubService(root) as svc:
+            assert svc.decode(svc.get('ticker')) == {'price': 1.5, 'symbol': 'ETHBTC', 'ids': [1, 2]}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retry_after():
+    assert retry_after_seconds('120') == 120.0
+    assert retry_after_seconds('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412420) == 60.0
+    assert retry_after_seconds('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412540) == 0.0
+    assert retry_after_seconds('soon') is None
+
+    svc = StubService('http://127.0.0.1/api')
+    svc.rate_limiter.add_limit(RateLimit('weight', 10, 1))
+    response = requests.Response()
+    response.status_code = 429
+    response.headers['Retry-After'] = 'soon'
+    svc.update_rate_limits(response)  # Backs off by default instead of raising
+    assert svc.rate_limiter.available('weight') <= -(DEFAULT_RETRY_AFTER - 1) * 10
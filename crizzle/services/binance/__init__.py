@@ -1,4 +1,14 @@
 from crizzle.services.binance.binance_service import BinanceService
+from crizzle.services.binance.async_binance_service import AsyncBinanceService
+from crizzle.services.binance.decoding import CANDLESTICK_FIELDS, CANDLESTICK_DTYPE, AGGREGATED_TRADE_DTYPE
 
 Service = BinanceService
 INTERVALS = ['1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '1w', '1M']
+
+# Length of each interval in milliseconds. Months are counted as 31 days, the longest they can be.
+INTERVAL_MILLISECONDS = {'1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+                         '1h': 3600000, '2h': 7200000, '4h': 14400000, '6h': 21600000, '8h': 28800000,
+                         '12h': 43200000, '1d': 86400000, '1w': 604800000, '1M': 2678400000}
+
+# Maximum number of candlesticks returned by a single klines request.
+CANDLESTICK_LIMIT = 1000
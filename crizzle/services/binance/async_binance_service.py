@@ -0,0 +1,133 @@
+import time
+import asyncio
+import logging
+
+from crizzle.services.base import AsyncService
+from crizzle.services.binance.binance_service import BinanceService
+from crizzle.services.binance import orders
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBinanceService(AsyncService, BinanceService):
+    """
+    Asynchronous Binance service.
+
+    Every endpoint method of BinanceService is available and returns an awaitable. Parameter building,
+    signing, rate limiting and decoding are inherited unchanged.
+
+    Examples:
+        async with AsyncBinanceService(concurrency=50) as binance:
+            candlesticks = await binance.map_symbols('candlesticks', symbols, '1h')
+    """
+
+    def __init__(self, key=None, debug=False, mode='json', recv_window=None, name=None, default_timestamp=None,
+                 number_type=float, exchange_info_ttl=3600, concurrency=10):
+        super(AsyncBinanceService, self).__init__(key=key, debug=debug, mode=mode, recv_window=recv_window,
+                                                  name=name, default_timestamp=default_timestamp,
+                                                  number_type=number_type, exchange_info_ttl=exchange_info_ttl,
+                                                  concurrency=concurrency)
+
+    # region General Endpoints
+    async def refresh_exchange_info(self, force=False):
+        if force or self.exchange_info.expired:
+            self.cache_exchange_info(await self.get("exchangeInfo", headers=self.exchange_info.request_headers()))
+        return self.exchange_info
+
+    async def info(self, symbol=None, key=None):
+        if self.debug:
+            return await self.get("exchangeInfo")
+        return (await self.refresh_exchange_info()).get(symbol, key)
+
+    async def trading_assets(self):
+        if self.debug:
+            return await self.info(key='symbols')
+        return (await self.refresh_exchange_info()).assets()
+
+    async def trading_symbols(self):
+        """
+        Get a list of all symbols trading on the exchange.
+
+        Returns:
+            Symbols trading on the exchange.
+        """
+        if self.debug:
+            return await self.info(key='symbols')
+        return (await self.refresh_exchange_info()).symbols()
+
+    # endregion
+
+    # region Market Data Endpoints
+    async def book_tickers(self) -> list:
+        """
+        Best bid and ask of every trading pair. See BinanceService.book_tickers.
+        """
+        books, symbols = await asyncio.gather(self.ticker_book(), self.trading_symbols())
+        return self._book_tickers(self.decode(books), symbols)
+
+    # endregion
+
+    # region Account Endpoints
+    async def validate_orders(self, order_list: list, check_filters: bool = True) -> list:
+        exchange_info = None
+        if check_filters and (self.exchange_info.loaded or not self.debug):
+            exchange_info = await self.refresh_exchange_info()
+        return self._validate(order_list, exchange_info)
+
+    async def _timed_request(self, index: int, request_type: str, endpoint: str, params: dict) -> orders.OrderResult:
+        start = time.perf_counter()
+        try:
+            response = await self.request(request_type, endpoint, params=params, api_version='v3', sign=True)
+        except Exception as error:
+            return orders.OrderResult(index, params, None, str(error), time.perf_counter() - start)
+        error = None if getattr(response, 'ok', True) else '{} {}'.format(response.status_code, response.text)
+        return orders.OrderResult(index, params, response, error, time.perf_counter() - start)
+
+    async def batch_orders(self, order_list: list, test=False, check_filters: bool = True) -> list:
+        """
+        Validate a batch of orders, then send the valid ones concurrently, up to the service's concurrency.
+        See BinanceService.batch_orders.
+        """
+        endpoint = 'order{}'.format('/test' if test else '')
+        results = [None] * len(order_list)
+        requests = []
+        for index, (params, error) in enumerate(await self.validate_orders(order_list, check_filters)):
+            if params is None:
+                results[index] = orders.OrderResult(index, None, None, error, 0.0)
+            else:
+                requests.append(self._timed_request(index, 'post', endpoint, params))
+        for result in await asyncio.gather(*requests):
+            results[result.index] = result
+        return results
+
+    async def cancel_orders(self, cancel_list: list) -> list:
+        results = [None] * len(cancel_list)
+        requests = []
+        for index, kwargs in enumerate(cancel_list):
+            try:
+                requests.append(self._timed_request(index, 'delete', 'order', orders.cancel_params(**kwargs)))
+            except (ValueError, TypeError) as error:
+                results[index] = orders.OrderResult(index, None, None, str(error), 0.0)
+        for result in await asyncio.gather(*requests):
+            results[result.index] = result
+        return results
+
+    # endregion
+
+    async def map_symbols(self, method: str, symbols, *args, **kwargs) -> dict:
+        """
+        Call an endpoint method for many symbols concurrently.
+
+        Args:
+            method (str): Name of the endpoint method, for example 'candlesticks' or 'depth'
+            symbols: Trading symbols to call the method for
+            *args: Further positional arguments of the method
+            **kwargs: Keyword arguments of the method
+
+        Returns:
+            dict: Response for each symbol
+        """
+        symbols = list(symbols)
+        func = getattr(self, method)
+        responses = await asyncio.gather(*(func(symbol, *args, **kwargs) for symbol in symbols))
+        return dict(zip(symbols, responses))
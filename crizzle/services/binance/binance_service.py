@@ -1,48 +1,82 @@
-import os
 import time
-import hmac
-import json
 import urllib
 import logging
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from crizzle.services.base import Service as BaseService
+from crizzle.services.base import RateLimit
+from crizzle.services.binance import decoding
+from crizzle.services.binance import schemas
+from crizzle.services.binance import orders
+from crizzle.services.binance.exchange_info import ExchangeInfo
 from crizzle import patterns
 
 logger = logging.getLogger(__name__)
 
+# Request weight of endpoints whose cost does not depend on their parameters. Unlisted endpoints weigh 1.
+ENDPOINT_WEIGHTS = {
+    'historicalTrades': 5,
+    'allOrders': 5,
+    'account': 5,
+    'myTrades': 5,
+}
+
+# Request weight of endpoints that are more expensive when no symbol is given.
+ALL_SYMBOLS_WEIGHTS = {
+    'ticker/24hr': 40,
+    'ticker/price': 2,
+    'ticker/bookTicker': 2,
+    'openOrders': 40,
+}
+
+# Request weight of the depth endpoint for each value of 'limit'.
+DEPTH_WEIGHTS = {5: 1, 10: 1, 20: 1, 50: 1, 100: 1, 500: 5, 1000: 10}
+
+USED_WEIGHT_HEADER = 'X-MBX-USED-WEIGHT'
+ORDER_COUNT_HEADER = 'X-MBX-ORDER-COUNT'
+HEADER_INTERVAL_UNITS = {'S': 1, 'M': 60, 'H': 3600, 'D': 86400}
+
+
+def default_rate_limits():
+    return [RateLimit('weight', 1200, 60),
+            RateLimit('orders', 10, 1),
+            RateLimit('orders', 100000, 86400)]
+
 
 class BinanceService(BaseService):
-    def __init__(self, key=None, debug=False, mode='json', recv_window=None, name=None, default_timestamp=None):
+    def __init__(self, key=None, debug=False, mode='json', recv_window=None, name=None, default_timestamp=None,
+                 pool_size=10, number_type=float, exchange_info_ttl=3600):
         super(BinanceService, self).__init__('binance' if name is None else name,
                                              "https://api.binance.com/api",
                                              debug=debug,
                                              default_timestamp=default_timestamp,
-                                             key=key)
+                                             key=key,
+                                             rate_limits=default_rate_limits(),
+                                             pool_size=pool_size)
         self.mode = mode
         self.timestamp_unit = 'ms'
         self.default_api_version = 'v1'
         self.recv_window = 5000 if recv_window is None else recv_window
+        self.number_type = number_type
+        self.converters = {endpoint: schemas.compile_schema(schema, number=number_type)
+                           for endpoint, schema in schemas.ENDPOINT_SCHEMAS.items()}
+        self.exchange_info = ExchangeInfo(ttl=exchange_info_ttl)
 
     # region Helper methods
     @property
     def key(self):
-        env_var_name = 'CrizzleKey_{}'.format(self.name)
-        if env_var_name in os.environ:
-            return json.loads(os.environ[env_var_name])
-        else:
-            return {'key': None, 'secret': None}
+        return self.credentials.as_dict()
 
     @property
     def api_key(self):
-        return self.key['key']
+        return self.credentials.key
 
     @property
     def secret_key(self):
-        return self.key['secret']
+        return self.credentials.secret
 
     @property
     def key_loaded(self):
-        return self.api_key and self.secret_key
+        return self.credentials.loaded
 
     @property
     def timestamp(self) -> int:
@@ -55,6 +89,58 @@ class BinanceService(BaseService):
         assert 'sign' in kwargs
         return {'timestamp': self.timestamp, 'recvWindow': self.recv_window} if kwargs['sign'] else {}
 
+    def request_cost(self, request_type: str, endpoint: str, params: dict) -> dict:
+        """
+        Request weight (and order count, for new orders) of a request.
+
+        Args:
+            request_type (str): get | post | put | delete
+            endpoint (str): API endpoint the request is sent to
+            params (dict): Request parameters
+
+        Returns:
+            dict: Cost per rate limit name
+        """
+        params = {} if params is None else params
+        if endpoint == 'depth':
+            weight = DEPTH_WEIGHTS.get(int(params.get('limit', 100)), 50)
+        elif endpoint in ALL_SYMBOLS_WEIGHTS and 'symbol' not in params:
+            weight = ALL_SYMBOLS_WEIGHTS[endpoint]
+        else:
+            weight = ENDPOINT_WEIGHTS.get(endpoint, 1)
+        cost = {'weight': weight}
+        if request_type == 'post' and endpoint == 'order':
+            cost['orders'] = 1
+        return cost
+
+    def update_rate_limits(self, response) -> None:
+        """
+        Synchronise the rate limiter with the X-MBX-USED-WEIGHT and X-MBX-ORDER-COUNT response headers.
+
+        Args:
+            response (requests.Response): Response to a request sent by this service
+
+        Returns:
+            None
+        """
+        super(BinanceService, self).update_rate_limits(response)
+        for header, value in response.headers.items():
+            header = header.upper()
+            if header.startswith(USED_WEIGHT_HEADER):
+                name, suffix = 'weight', header[len(USED_WEIGHT_HEADER):]
+            elif header.startswith(ORDER_COUNT_HEADER):
+                name, suffix = 'orders', header[len(ORDER_COUNT_HEADER):]
+            else:
+                continue
+            suffix = suffix.lstrip('-')
+            if suffix:
+                if not suffix[:-1].isdigit() or suffix[-1] not in HEADER_INTERVAL_UNITS:
+                    continue
+                interval = int(suffix[:-1]) * HEADER_INTERVAL_UNITS[suffix[-1]]
+            else:
+                interval = 60  # the unsuffixed weight header counts the current minute
+            self.rate_limiter.observe(name, float(value), interval=interval)
+
     def add_api_key(self, params=None, data=None, headers=None):
         """
         Adds API key to the request params/data/headers.
@@ -87,8 +173,57 @@ class BinanceService(BaseService):
         if not self.key_loaded:
             raise RuntimeError("API key has not been loaded. Unable to sign request.")
         encoded = bytes(urllib.parse.urlencode(params) + urllib.parse.urlencode(data), 'utf-8')
-        signature = hmac.new(bytes(self.secret_key, 'utf-8'), encoded, digestmod=hashlib.sha256)
-        params['signature'] = signature.hexdigest()
+        params['signature'] = self.credentials.signer.sign(encoded)
+
+    def endpoint_of(self, url: str) -> str:
+        """
+        Name of the endpoint a request URL points to, for example 'ticker/price'.
+        """
+        path = urllib.parse.urlsplit(url).path[len(urllib.parse.urlsplit(self.root).path):]
+        return path.strip('/').split('/', 1)[-1]
+
+    def decode(self, response, lazy=False):
+        """
+        Parse a response, converting the prices and quantities listed in its endpoint's schema
+        to `number_type`. Responses of endpoints without a schema are decoded with `json_number_hook`.
+
+        Args:
+            response: Response returned by `request`
+            lazy (bool): Return a LazyPayload that parses only the parts of the body that are accessed
+
+        Returns:
+            The decoded response body, or a LazyPayload
+        """
+        converter = self.converters.get(self.endpoint_of(response.url))
+        if lazy:
+            return schemas.LazyPayload(response.content, converter)
+        if converter is None:
+            return super(BinanceService, self).decode(response)
+        return converter(response.json())
+
+    def decode_candlesticks(self, response):
+        """
+        Decode a response from the klines endpoint into a NumPy structured array.
+
+        Args:
+            response: Response returned by `candlesticks`
+
+        Returns:
+            np.ndarray: Array of `decoding.CANDLESTICK_DTYPE` records
+        """
+        return decoding.decode_candlesticks(response.content)
+
+    def decode_aggregated_trades(self, response):
+        """
+        Decode a response from the aggTrades endpoint into a NumPy structured array.
+
+        Args:
+            response: Response returned by `aggregated_trades`
+
+        Returns:
+            np.ndarray: Array of `decoding.AGGREGATED_TRADE_DTYPE` records
+        """
+        return decoding.decode_aggregated_trades(response.content)
 
     # endregion
 
@@ -99,9 +234,42 @@ class BinanceService(BaseService):
     def server_time(self):
         return self.get("time")
 
+    def cache_exchange_info(self, response) -> None:
+        """
+        Update the exchange info cache from a response to the exchangeInfo endpoint.
+
+        Args:
+            response: Response to a (possibly conditional) exchangeInfo request
+
+        Returns:
+            None
+        """
+        if response.status_code == 304:
+            self.exchange_info.not_modified()
+        elif response.ok:
+            self.exchange_info.update(self.decode(response), response.headers)
+        elif self.exchange_info.loaded:
+            logger.warning("Could not refresh exchange info, keeping the cached copy: {}".format(response.text))
+        else:
+            response.raise_for_status()
+
+    def refresh_exchange_info(self, force=False) -> ExchangeInfo:
+        """
+        Download the exchange info again if the cached copy is stale.
+
+        Args:
+            force (bool): Refresh even if the cached copy has not expired yet
+
+        Returns:
+            ExchangeInfo: The exchange info cache
+        """
+        if force or self.exchange_info.expired:
+            self.cache_exchange_info(self.get("exchangeInfo", headers=self.exchange_info.request_headers()))
+        return self.exchange_info
+
     def info(self, symbol=None, key=None):
         """
-        Get information about a symbol or the exchange.
+        Get information about a symbol or the exchange, from the exchange info cache.
         if key is specified:
             if symbol is specified, returns specified property of that symbol.
             else, returns specified property of the exchange.
@@ -111,22 +279,16 @@ class BinanceService(BaseService):
             key: property of trading pair or exchange
 
         Returns:
-
+            The requested property, or the whole dictionary describing the symbol or exchange
         """
-        return self.get("exchangeInfo")
+        if self.debug:
+            return self.get("exchangeInfo")
+        return self.refresh_exchange_info().get(symbol, key)
 
     def trading_assets(self):
-        symbols = self.info(key='symbols')
         if self.debug:
-            return symbols
-        else:
-            assets = set()
-            for symbol in symbols:
-                base = symbol['baseAsset']
-                quote = symbol['quoteAsset']
-                assets.add(base)
-                assets.add(quote)
-            return assets
+            return self.info(key='symbols')
+        return self.refresh_exchange_info().assets()
 
     def trading_symbols(self):
         """
@@ -135,14 +297,9 @@ class BinanceService(BaseService):
         Returns:
             Symbols trading on the exchange.
         """
-        symbols = []
-        symbol_info = self.info(key='symbols')
         if self.debug:
-            return symbol_info
-        else:
-            for symbol in symbol_info:
-                symbols.append(symbol['symbol'])
-            return symbols
+            return self.info(key='symbols')
+        return self.refresh_exchange_info().symbols()
 
     # endregion
 
@@ -224,48 +381,33 @@ class BinanceService(BaseService):
         response = self.get("ticker/bookTicker", params=params, api_version='v3')
         return response
 
+    def book_tickers(self) -> list:
+        """
+        Best bid and ask of every trading pair.
+
+        Returns:
+            list: (symbol, base asset, quote asset, bid, ask) of each pair currently trading
+        """
+        return self._book_tickers(self.decode(self.ticker_book()), self.trading_symbols())
+
+    def _book_tickers(self, books: list, symbols: list) -> list:
+        books = {book['symbol']: book for book in books}
+        tickers = []
+        for symbol in symbols:
+            info = self.exchange_info.get(symbol)
+            if symbol in books and info.get('status', 'TRADING') == 'TRADING':
+                tickers.append((symbol, info['baseAsset'], info['quoteAsset'],
+                                books[symbol]['bidPrice'], books[symbol]['askPrice']))
+        return tickers
+
     # endregion
 
     # region Account Endpoints
     def order(self, symbol, side, order_type, quantity, price: float = None, stop_price=None, time_in_force: str = None,
               iceberg_qty: float = None, new_client_order_id: int = None, test=False):
-        params = {}
-        side = side.upper()
-        order_type = order_type.upper()
-        if time_in_force is not None:
-            time_in_force = time_in_force.upper()
-        if price is not None:
-            price = patterns.conversion.float_to_str(price)
-
-        if order_type == 'LIMIT':
-            patterns.assert_none(stop_price, 'stop_price')
-            patterns.assert_not_none(time_in_force, 'time_in_force')
-            patterns.assert_not_none(price, 'price')
-            params.update({'timeInForce': time_in_force, 'price': price})
-        elif order_type == 'MARKET':
-            patterns.assert_none(price, 'price')
-            patterns.assert_not_none(quantity, 'quantity')
-        elif order_type in ('STOP_LOSS', 'TAKE_PROFIT'):
-            patterns.assert_not_none(stop_price, 'stop_price')
-            params.update({'stopPrice': stop_price})
-        elif order_type in ('STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'):
-            patterns.assert_not_none(time_in_force, 'time_in_force')
-            patterns.assert_not_none(stop_price, 'stop_price')
-            patterns.assert_not_none(price, 'price')
-            params.update({'stopPrice': stop_price, 'price': price, 'timeInForce': time_in_force})
-        elif order_type == 'LIMIT_MAKER':
-            patterns.assert_not_none(price, 'price')
-            params.update({'price': price})
-        else:
-            raise ValueError('Invalid order type')
-        if iceberg_qty is not None:
-            patterns.assert_equal(time_in_force, 'time_in_force', 'GTC')
-            params['icebergQty'] = iceberg_qty
-        if new_client_order_id is not None:
-            params['newClientOrderId'] = new_client_order_id
-        patterns.assert_in(side, 'side', ('BUY', 'SELL'))
-        patterns.assert_in(time_in_force, 'time_in_force', (None, 'GTC', 'IOC', 'FOK'))
-        params.update({'symbol': symbol, 'type': order_type, 'quantity': quantity, 'side': side})
+        params = orders.order_params(symbol, side, order_type, quantity, price=price, stop_price=stop_price,
+                                     time_in_force=time_in_force, iceberg_qty=iceberg_qty,
+                                     new_client_order_id=new_client_order_id)
         response = self.post('order{}'.format('/test' if test else ''), api_version='v3', params=params, sign=True)
         return response
 
@@ -277,18 +419,108 @@ class BinanceService(BaseService):
         return response
 
     def cancel_order(self, symbol: str, order_id=None, original_client_order_id=None, new_client_order_id=None):
-        params = {'symbol': symbol}
-        if order_id is None and original_client_order_id is None:
-            raise ValueError('Either orderId or origClientOrderId must be provided for cancellation.')
-        elif order_id is not None:
-            params['orderId'] = order_id
-        elif original_client_order_id is not None:
-            params['origClientOrderId'] = original_client_order_id
-        if new_client_order_id is not None:
-            params['newClientOrderId'] = new_client_order_id
+        params = orders.cancel_params(symbol, order_id=order_id, original_client_order_id=original_client_order_id,
+                                      new_client_order_id=new_client_order_id)
         response = self.delete('order', api_version='v3', params=params)
         return response
 
+    def validate_orders(self, order_list: list, check_filters: bool = True) -> list:
+        """
+        Validate many orders up front, against the cached symbol filters unless told otherwise.
+
+        Args:
+            order_list (list): Keyword arguments of `order` for each order
+            check_filters (bool): Whether to check the orders against the exchange's trading rules
+
+        Returns:
+            list: (params, error) of each order, where params is None if the order is invalid
+        """
+        exchange_info = None
+        if check_filters and (self.exchange_info.loaded or not self.debug):
+            exchange_info = self.refresh_exchange_info()
+        return self._validate(order_list, exchange_info)
+
+    @staticmethod
+    def _validate(order_list: list, exchange_info=None) -> list:
+        validated = []
+        for kwargs in order_list:
+            try:
+                params = orders.order_params(**kwargs)
+                if exchange_info is not None:
+                    orders.check_filters(params, exchange_info)
+                validated.append((params, None))
+            except (ValueError, TypeError) as error:
+                validated.append((None, str(error)))
+        return validated
+
+    def _timed_request(self, index: int, request_type: str, endpoint: str, params: dict) -> orders.OrderResult:
+        start = time.perf_counter()
+        try:
+            response = self.request(request_type, endpoint, params=params, api_version='v3', sign=True)
+        except Exception as error:
+            return orders.OrderResult(index, params, None, str(error), time.perf_counter() - start)
+        error = None if getattr(response, 'ok', True) else '{} {}'.format(response.status_code, response.text)
+        return orders.OrderResult(index, params, response, error, time.perf_counter() - start)
+
+    def batch_orders(self, order_list: list, test=False, workers: int = 10, check_filters: bool = True) -> list:
+        """
+        Validate a batch of orders, then send the valid ones concurrently. Binance spot has no batch order
+        endpoint, so each order is still its own signed request charged to the order rate limits. Those limits,
+        not the number of workers, bound the batch's latency: at 10 orders per second, 50 orders take about
+        5 seconds however many are in flight.
+
+        Args:
+            order_list (list): Keyword arguments of `order` for each order, for example
+                ``{'symbol': 'ETHBTC', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 1, 'price': 0.07,
+                'time_in_force': 'GTC'}``
+            test (bool): Send the orders to the test endpoint
+            workers (int): Maximum number of requests in flight; more than `pool_size` open extra connections
+            check_filters (bool): Whether to check the orders against the exchange's trading rules first
+
+        Returns:
+            list: OrderResult of each order, in the order given
+        """
+        endpoint = 'order{}'.format('/test' if test else '')
+        results = [None] * len(order_list)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = []
+            for index, (params, error) in enumerate(self.validate_orders(order_list, check_filters)):
+                if params is None:
+                    results[index] = orders.OrderResult(index, None, None, error, 0.0)
+                else:
+                    futures.append(pool.submit(self._timed_request, index, 'post', endpoint, params))
+            for future in futures:
+                result = future.result()
+                results[result.index] = result
+        logger.debug("Sent {} of {} orders".format(len(futures), len(order_list)))
+        return results
+
+    def cancel_orders(self, cancel_list: list, workers: int = 10) -> list:
+        """
+        Cancel many orders concurrently.
+
+        Args:
+            cancel_list (list): Keyword arguments of `cancel_order` for each cancellation
+            workers (int): Maximum number of requests in flight
+
+        Returns:
+            list: OrderResult of each cancellation, in the order given
+        """
+        results = [None] * len(cancel_list)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = []
+            for index, kwargs in enumerate(cancel_list):
+                try:
+                    params = orders.cancel_params(**kwargs)
+                except (ValueError, TypeError) as error:
+                    results[index] = orders.OrderResult(index, None, None, str(error), 0.0)
+                    continue
+                futures.append(pool.submit(self._timed_request, index, 'delete', 'order', params))
+            for future in futures:
+                result = future.result()
+                results[result.index] = result
+        return results
+
     def query_order(self, symbol: str, order_id=None, original_client_order_id=None):
         params = {'symbol': symbol}
         if order_id is None and original_client_order_id is None:
@@ -329,4 +561,19 @@ class BinanceService(BaseService):
         response = self.get('myTrades', api_version='v3', params=params, sign=True)
         return response
 
+    def start_user_data_stream(self):
+        """
+        Open a listen key for the account's user data stream, or return the current one while it is valid.
+        """
+        response = self.post('userDataStream', api_version='v3', sign=False)
+        return response
+
+    def keepalive_user_data_stream(self, listen_key: str):
+        response = self.put('userDataStream', api_version='v3', params={'listenKey': listen_key}, sign=False)
+        return response
+
+    def close_user_data_stream(self, listen_key: str):
+        response = self.delete('userDataStream', api_version='v3', params={'listenKey': listen_key}, sign=False)
+        return response
+
     # endregion
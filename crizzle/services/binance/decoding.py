@@ -0,0 +1,97 @@
+"""
+Decoding of Binance market data into NumPy structured arrays.
+
+Use ``pandas.DataFrame(records)`` to turn any of the returned arrays into a DataFrame.
+"""
+import json
+import numpy as np
+
+# Names of the fields of each row returned by the klines endpoint (the trailing 'ignore' field is dropped).
+CANDLESTICK_FIELDS = ('openTimestamp', 'open', 'high', 'low', 'close', 'volume', 'closeTimestamp',
+                      'quoteAssetVolume', 'numberOfTrades', 'takerBuyBaseAssetVolume', 'takerBuyQuoteAssetVolume')
+
+CANDLESTICK_DTYPE = np.dtype([(field, np.int64 if field.endswith('Timestamp') or field == 'numberOfTrades'
+                               else np.float64) for field in CANDLESTICK_FIELDS])
+
+# Number of values in each row of a klines response, including the 'ignore' field.
+CANDLESTICK_ROW_LENGTH = 12
+
+# Keys of each object returned by the aggTrades endpoint, and the names of the fields they are decoded into.
+AGGREGATED_TRADE_KEYS = (('a', 'aggregateTradeId', np.int64), ('p', 'price', np.float64),
+                         ('q', 'quantity', np.float64), ('f', 'firstTradeId', np.int64),
+                         ('l', 'lastTradeId', np.int64), ('T', 'timestamp', np.int64),
+                         ('m', 'isBuyerMaker', np.bool_), ('M', 'isBestMatch', np.bool_))
+
+AGGREGATED_TRADE_DTYPE = np.dtype([(name, dtype) for key, name, dtype in AGGREGATED_TRADE_KEYS])
+
+_STRIP = b'[]" \n\r\t'
+
+
+def _parse_numbers(stripped: bytes) -> np.ndarray:
+    """
+    Parse a comma-separated sequence of numbers, or return None if any of them is malformed.
+    """
+    try:
+        return np.array(stripped.split(b','), dtype=np.float64)
+    except ValueError:
+        return None
+
+
+def decode_candlesticks(payload) -> np.ndarray:
+    """
+    Decode a klines response into an array of `CANDLESTICK_DTYPE` records.
+
+    Every value in a klines response is a number, either bare or quoted, so the raw body is read as one flat
+    sequence of numbers instead of nested lists. Splitting it still builds a bytes object per cell, but no lists
+    per row and no conversion of each value in Python.
+
+    Args:
+        payload: Raw response body (bytes or str), or rows already parsed from JSON
+
+    Returns:
+        np.ndarray: Structured array with one record per candlestick
+    """
+    if isinstance(payload, (bytes, str)):
+        text = payload.encode('utf-8') if isinstance(payload, str) else payload
+        stripped = text.translate(None, _STRIP)
+        if not text.lstrip().startswith(b'['):
+            raise ValueError("Not a klines response: {}".format(text[:200]))
+        if not stripped:
+            return np.empty(0, dtype=CANDLESTICK_DTYPE)
+        values = _parse_numbers(stripped)
+        if values is None or values.size % CANDLESTICK_ROW_LENGTH:
+            return decode_candlesticks(json.loads(text))
+        values = values.reshape(-1, CANDLESTICK_ROW_LENGTH)
+        records = np.empty(len(values), dtype=CANDLESTICK_DTYPE)
+        for i, field in enumerate(CANDLESTICK_FIELDS):
+            records[field] = values[:, i]
+        return records
+    records = np.empty(len(payload), dtype=CANDLESTICK_DTYPE)
+    if len(payload) == 0:
+        return records
+    for field, column in zip(CANDLESTICK_FIELDS, zip(*payload)):
+        records[field] = np.array(column, dtype=CANDLESTICK_DTYPE[field])
+    return records
+
+
+def decode_aggregated_trades(payload) -> np.ndarray:
+    """
+    Decode an aggTrades response into an array of `AGGREGATED_TRADE_DTYPE` records.
+
+    Unlike klines, the body is parsed as JSON and each field converted from a list: stripping the keys and
+    booleans to read it as a flat sequence of numbers measured no faster, since parsing the numbers dominates
+    either way.
+
+    Args:
+        payload: Raw response body (bytes or str), or trades already parsed from JSON
+
+    Returns:
+        np.ndarray: Structured array with one record per aggregated trade
+    """
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    records = np.empty(len(payload), dtype=AGGREGATED_TRADE_DTYPE)
+    for key, name, dtype in AGGREGATED_TRADE_KEYS:
+        records[name] = np.array([trade[key] for trade in payload], dtype=dtype)
+    return records
+
@@ -0,0 +1,140 @@
+"""
+In-memory cache of the exchangeInfo payload.
+
+The payload describes every symbol traded on the exchange and is several hundred kilobytes large, but changes
+rarely. It is downloaded once, indexed by symbol, base asset and quote asset, and only downloaded again once it
+is older than the cache's time-to-live. A refresh is conditional: if the previous response carried an ETag or
+Last-Modified header, they are sent back and a 304 (Not Modified) response simply renews the cached copy.
+"""
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeInfo:
+    def __init__(self, ttl: float = 3600, clock=time.monotonic):
+        """
+        Args:
+            ttl: Number of seconds after which the cached payload is considered stale
+            clock: Function returning the current time in seconds
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.payload = None
+        self.updated = None
+        self.validators = {}
+        self._symbols = {}
+        self._filters = {}
+        self._by_base = {}
+        self._by_quote = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self.payload is not None
+
+    @property
+    def expired(self) -> bool:
+        return self.payload is None or self.clock() - self.updated >= self.ttl
+
+    def invalidate(self) -> None:
+        """
+        Mark the cached payload as stale, so that the next lookup downloads it again.
+        """
+        self.updated = None if self.payload is None else self.clock() - self.ttl
+
+    # region Refresh
+    def request_headers(self) -> dict:
+        """
+        Headers making a refresh conditional on the payload having changed since it was cached.
+        """
+        headers = {}
+        if 'ETag' in self.validators:
+            headers['If-None-Match'] = self.validators['ETag']
+        if 'Last-Modified' in self.validators:
+            headers['If-Modified-Since'] = self.validators['Last-Modified']
+        return headers
+
+    def not_modified(self) -> None:
+        """
+        Renew the cached payload after the server confirmed that it has not changed.
+        """
+        self.updated = self.clock()
+
+    def update(self, payload: dict, headers=None) -> None:
+        """
+        Replace the cached payload and rebuild its indices.
+
+        Args:
+            payload: Decoded exchangeInfo payload
+            headers: Response headers, from which the ETag and Last-Modified validators are kept
+        """
+        symbols, filters, by_base, by_quote = {}, {}, {}, {}
+        for info in payload.get('symbols', []):
+            symbol = info['symbol']
+            symbols[symbol] = info
+            filters[symbol] = {item['filterType']: item for item in info.get('filters', [])}
+            by_base.setdefault(info['baseAsset'], []).append(symbol)
+            by_quote.setdefault(info['quoteAsset'], []).append(symbol)
+        self.payload = payload
+        self._symbols, self._filters, self._by_base, self._by_quote = symbols, filters, by_base, by_quote
+        self.validators = {name: headers[name] for name in ('ETag', 'Last-Modified')
+                           if headers is not None and name in headers}
+        self.updated = self.clock()
+        logger.debug("Cached exchange info for {} symbols".format(len(symbols)))
+
+    # endregion
+
+    # region Lookups
+    def get(self, symbol: str = None, key: str = None):
+        """
+        Look up information about a symbol or the exchange.
+
+        Args:
+            symbol: Trading symbol, or None for the exchange
+            key: Property of the symbol or exchange, or None for all of them
+
+        Returns:
+            The requested property, or the whole dictionary describing the symbol or exchange
+        """
+        if symbol is None:
+            info = self.payload
+        else:
+            try:
+                info = self._symbols[symbol]
+            except KeyError:
+                raise KeyError("Unknown symbol '{}'".format(symbol))
+        return info if key is None else info[key]
+
+    def symbols(self) -> list:
+        return list(self._symbols)
+
+    def assets(self) -> set:
+        return set(self._by_base) | set(self._by_quote)
+
+    def symbols_with_base(self, asset: str) -> list:
+        return list(self._by_base.get(asset, []))
+
+    def symbols_with_quote(self, asset: str) -> list:
+        return list(self._by_quote.get(asset, []))
+
+    def filters(self, symbol: str) -> dict:
+        """
+        Filters of a symbol, keyed by filter type (for example 'PRICE_FILTER' or 'LOT_SIZE').
+        """
+        return self._filters[symbol]
+
+    def filter(self, symbol: str, filter_type: str, key: str, default=None):
+        entry = self._filters[symbol].get(filter_type)
+        return default if entry is None else entry.get(key, default)
+
+    def tick_size(self, symbol: str):
+        return self.filter(symbol, 'PRICE_FILTER', 'tickSize')
+
+    def step_size(self, symbol: str):
+        return self.filter(symbol, 'LOT_SIZE', 'stepSize')
+
+    def min_notional(self, symbol: str):
+        return self.filter(symbol, 'MIN_NOTIONAL', 'minNotional')
+
+    # endregion
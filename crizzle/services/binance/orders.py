@@ -0,0 +1,153 @@
+"""
+Validation of order parameters, shared by single and batch order submission.
+
+`order_params` checks that an order's fields fit its type and builds the request parameters. `check_filters`
+additionally checks them against a symbol's trading rules from the cached exchange info (price and quantity
+bounds and increments, minimum notional value, iceberg parts), so orders the exchange would reject are caught
+before spending any request weight or order count on them.
+"""
+import math
+from decimal import Decimal
+from collections import namedtuple
+
+from crizzle import patterns
+
+SIDES = ('BUY', 'SELL')
+TIMES_IN_FORCE = (None, 'GTC', 'IOC', 'FOK')
+ORDER_TYPES = ('LIMIT', 'MARKET', 'STOP_LOSS', 'STOP_LOSS_LIMIT', 'TAKE_PROFIT', 'TAKE_PROFIT_LIMIT', 'LIMIT_MAKER')
+
+# Outcome of one order of a batch: its position in the batch, the parameters sent (None if it failed validation),
+# the response (None if it was not sent), an error message or None, and the seconds the request took.
+OrderResult = namedtuple('OrderResult', ['index', 'params', 'response', 'error', 'latency'])
+
+
+def order_params(symbol, side, order_type, quantity, price: float = None, stop_price=None, time_in_force: str = None,
+                 iceberg_qty: float = None, new_client_order_id=None) -> dict:
+    """
+    Validate an order and build its request parameters.
+
+    Args:
+        symbol: Trading symbol
+        side: 'BUY' or 'SELL'
+        order_type: One of ORDER_TYPES
+        quantity: Quantity of the base asset
+        price: Limit price, for the order types that have one
+        stop_price: Trigger price of stop loss and take profit orders
+        time_in_force: 'GTC', 'IOC' or 'FOK', for the order types that need one
+        iceberg_qty: Visible quantity of an iceberg order
+        new_client_order_id: Client order id to give the order
+
+    Returns:
+        dict: Parameters of the order endpoint
+
+    Raises:
+        ValueError: If the fields do not fit the order type
+    """
+    params = {}
+    side = side.upper()
+    order_type = order_type.upper()
+    if time_in_force is not None:
+        time_in_force = time_in_force.upper()
+    if price is not None:
+        price = patterns.conversion.float_to_str(price)
+
+    if order_type == 'LIMIT':
+        patterns.assert_none(stop_price, 'stop_price')
+        patterns.assert_not_none(time_in_force, 'time_in_force')
+        patterns.assert_not_none(price, 'price')
+        params.update({'timeInForce': time_in_force, 'price': price})
+    elif order_type == 'MARKET':
+        patterns.assert_none(price, 'price')
+        patterns.assert_not_none(quantity, 'quantity')
+    elif order_type in ('STOP_LOSS', 'TAKE_PROFIT'):
+        patterns.assert_not_none(stop_price, 'stop_price')
+        params.update({'stopPrice': stop_price})
+    elif order_type in ('STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'):
+        patterns.assert_not_none(time_in_force, 'time_in_force')
+        patterns.assert_not_none(stop_price, 'stop_price')
+        patterns.assert_not_none(price, 'price')
+        params.update({'stopPrice': stop_price, 'price': price, 'timeInForce': time_in_force})
+    elif order_type == 'LIMIT_MAKER':
+        patterns.assert_not_none(price, 'price')
+        params.update({'price': price})
+    else:
+        raise ValueError('Invalid order type')
+    if iceberg_qty is not None:
+        patterns.assert_equal(time_in_force, 'time_in_force', 'GTC')
+        params['icebergQty'] = iceberg_qty
+    if new_client_order_id is not None:
+        params['newClientOrderId'] = new_client_order_id
+    patterns.assert_in(side, 'side', SIDES)
+    patterns.assert_in(time_in_force, 'time_in_force', TIMES_IN_FORCE)
+    params.update({'symbol': symbol, 'type': order_type, 'quantity': quantity, 'side': side})
+    return params
+
+
+def cancel_params(symbol: str, order_id=None, original_client_order_id=None, new_client_order_id=None) -> dict:
+    """
+    Build the request parameters of a cancellation.
+
+    Raises:
+        ValueError: If neither the order id nor the original client order id is given
+    """
+    params = {'symbol': symbol}
+    if order_id is None and original_client_order_id is None:
+        raise ValueError('Either orderId or origClientOrderId must be provided for cancellation.')
+    elif order_id is not None:
+        params['orderId'] = order_id
+    elif original_client_order_id is not None:
+        params['origClientOrderId'] = original_client_order_id
+    if new_client_order_id is not None:
+        params['newClientOrderId'] = new_client_order_id
+    return params
+
+
+def _decimal(value) -> Decimal:
+    return Decimal(value) if isinstance(value, str) else Decimal(repr(value))
+
+
+def _check_range(value: Decimal, name: str, entry: dict, minimum: str, maximum: str, step: str) -> None:
+    low, high, increment = (_decimal(entry.get(key, '0')) for key in (minimum, maximum, step))
+    if low > 0 and value < low:
+        raise ValueError("'{}' {} is below the minimum of {}.".format(name, value, low))
+    if high > 0 and value > high:
+        raise ValueError("'{}' {} is above the maximum of {}.".format(name, value, high))
+    if increment > 0 and (value - low) % increment != 0:
+        raise ValueError("'{}' {} is not a multiple of {}.".format(name, value, increment))
+
+
+def check_filters(params: dict, exchange_info) -> None:
+    """
+    Check order parameters against the trading rules of their symbol.
+
+    Args:
+        params: Parameters built by `order_params`
+        exchange_info: ExchangeInfo cache holding the symbol's filters
+
+    Raises:
+        ValueError: If the order breaks one of the rules, or the symbol is unknown
+    """
+    try:
+        filters = exchange_info.filters(params['symbol'])
+    except KeyError:
+        raise ValueError("Unknown symbol '{}'.".format(params['symbol']))
+    quantity = _decimal(params['quantity'])
+    price = params.get('price')
+    if price is not None and 'PRICE_FILTER' in filters:
+        _check_range(_decimal(price), 'price', filters['PRICE_FILTER'], 'minPrice', 'maxPrice', 'tickSize')
+    lot_size = filters.get('MARKET_LOT_SIZE') if params['type'] == 'MARKET' else None
+    lot_size = filters.get('LOT_SIZE') if lot_size is None else lot_size
+    if lot_size is not None:
+        _check_range(quantity, 'quantity', lot_size, 'minQty', 'maxQty', 'stepSize')
+    notional = filters.get('MIN_NOTIONAL', filters.get('NOTIONAL'))
+    if price is not None and notional is not None:
+        minimum = _decimal(notional.get('minNotional', '0'))
+        if quantity * _decimal(price) < minimum:
+            raise ValueError("Order value {} is below the minimum notional of {}.".format(
+                quantity * _decimal(price), minimum))
+    iceberg = params.get('icebergQty')
+    if iceberg is not None and 'ICEBERG_PARTS' in filters:
+        parts = math.ceil(quantity / _decimal(iceberg))
+        if parts > int(filters['ICEBERG_PARTS']['limit']):
+            raise ValueError("Iceberg order of {} parts exceeds the limit of {}.".format(
+                parts, filters['ICEBERG_PARTS']['limit']))
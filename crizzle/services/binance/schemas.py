@@ -0,0 +1,176 @@
+"""
+Typed decoding of Binance responses.
+
+Binance quotes prices and quantities as strings to avoid losing precision. Each endpoint's schema lists exactly
+those fields, so a response is converted in a single pass: every listed field is converted once to the right
+type, and everything else is left as JSON parsed it.
+
+Schemas are written with plain Python values:
+    dict    an object; each listed key is converted with its schema. Also applied to every item of a list,
+            since several endpoints return one object or a list of them depending on their parameters
+    list    a list whose single element is the schema of every item
+    tuple   a row of values converted positionally; trailing values without a schema are kept as they are
+    NUMBER  a price or quantity, converted to the number type the service is configured with
+    type    any other callable, such as int or str
+"""
+import re
+import json
+
+NUMBER = 'number'
+
+FILTER = {'minPrice': NUMBER, 'maxPrice': NUMBER, 'tickSize': NUMBER, 'minQty': NUMBER, 'maxQty': NUMBER,
+          'stepSize': NUMBER, 'minNotional': NUMBER, 'multiplierUp': NUMBER, 'multiplierDown': NUMBER}
+
+ORDER = {'price': NUMBER, 'origQty': NUMBER, 'executedQty': NUMBER, 'cummulativeQuoteQty': NUMBER,
+         'stopPrice': NUMBER, 'icebergQty': NUMBER,
+         'fills': [{'price': NUMBER, 'qty': NUMBER, 'commission': NUMBER}]}
+
+TRADE = {'price': NUMBER, 'qty': NUMBER, 'quoteQty': NUMBER, 'commission': NUMBER}
+
+ENDPOINT_SCHEMAS = {
+    'exchangeInfo': {'symbols': [{'filters': [FILTER]}]},
+    'depth': {'bids': [(NUMBER, NUMBER)], 'asks': [(NUMBER, NUMBER)]},
+    'trades': [TRADE],
+    'historicalTrades': [TRADE],
+    'aggTrades': [{'p': NUMBER, 'q': NUMBER}],
+    'klines': [(int, NUMBER, NUMBER, NUMBER, NUMBER, NUMBER, int, NUMBER, int, NUMBER, NUMBER)],
+    'ticker/24hr': {'priceChange': NUMBER, 'priceChangePercent': NUMBER, 'weightedAvgPrice': NUMBER,
+                    'prevClosePrice': NUMBER, 'lastPrice': NUMBER, 'lastQty': NUMBER, 'bidPrice': NUMBER,
+                    'bidQty': NUMBER, 'askPrice': NUMBER, 'askQty': NUMBER, 'openPrice': NUMBER,
+                    'highPrice': NUMBER, 'lowPrice': NUMBER, 'volume': NUMBER, 'quoteVolume': NUMBER},
+    'ticker/price': {'price': NUMBER},
+    'ticker/bookTicker': {'bidPrice': NUMBER, 'bidQty': NUMBER, 'askPrice': NUMBER, 'askQty': NUMBER},
+    'order': ORDER,
+    'order/test': {},
+    'openOrders': [ORDER],
+    'allOrders': [ORDER],
+    'account': {'balances': [{'free': NUMBER, 'locked': NUMBER}]},
+    'myTrades': [TRADE],
+}
+
+
+class ObjectConverter:
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def __call__(self, obj):
+        if isinstance(obj, list):
+            return [self(item) for item in obj]
+        for key, convert in self.fields.items():
+            if key in obj:
+                obj[key] = convert(obj[key])
+        return obj
+
+
+class ListConverter:
+    def __init__(self, item):
+        self.item = item
+
+    def __call__(self, items):
+        if isinstance(items, dict):
+            return items  # Error responses of list endpoints are objects, for example {'code': ..., 'msg': ...}
+        item = self.item
+        return [item(value) for value in items]
+
+
+class RowConverter:
+    def __init__(self, columns: list):
+        self.columns = columns
+
+    def __call__(self, row):
+        converted = [convert(value) for convert, value in zip(self.columns, row)]
+        converted.extend(row[len(self.columns):])
+        return converted
+
+
+def compile_schema(schema, number=float):
+    """
+    Build a converter for a schema.
+
+    Args:
+        schema: Schema written as described in the module docstring
+        number: Type that NUMBER fields are converted to, for example float or decimal.Decimal
+
+    Returns:
+        callable: Function converting a parsed JSON payload in place where possible, returning the result
+    """
+    if isinstance(schema, str):
+        if schema != NUMBER:
+            raise ValueError("Unknown schema type '{}'.".format(schema))
+        return number
+    if isinstance(schema, dict):
+        return ObjectConverter({key: compile_schema(value, number) for key, value in schema.items()})
+    if isinstance(schema, list):
+        return ListConverter(compile_schema(schema[0], number))
+    if isinstance(schema, tuple):
+        return RowConverter([compile_schema(value, number) for value in schema])
+    return schema
+
+
+class LazyPayload:
+    """
+    Raw response body that is only parsed as far as needed.
+
+    Useful when a caller needs a few values out of a large payload,
+    for example the price of one symbol out of the whole-market ticker.
+    """
+
+    def __init__(self, content: bytes, converter=None):
+        """
+        Args:
+            content: Raw response body
+            converter: Converter compiled from the endpoint's schema, or None to leave values as parsed
+        """
+        self.raw = content
+        self.converter = converter
+        self._parsed = None
+
+    def parse(self):
+        """
+        Parse and convert the whole payload. The result is cached.
+        """
+        if self._parsed is None:
+            parsed = json.loads(self.raw)
+            self._parsed = parsed if self.converter is None else self.converter(parsed)
+        return self._parsed
+
+    def _field_converter(self, key):
+        fields = getattr(self.converter, 'fields', {})
+        return fields.get(key)
+
+    def get(self, key: str, default=None):
+        """
+        Value of the first occurrence of `key`, found without parsing the rest of the payload.
+        Only meaningful for flat objects, where the first occurrence is the top-level one.
+        """
+        match = re.search(b'"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*("(?:[^"\\]|\\.)*"|[^,}\]\s]+)',
+                          self.raw)
+        if match is None:
+            return default
+        value = json.loads(match.group(1))
+        convert = self._field_converter(key)
+        return value if convert is None else convert(value)
+
+    def find(self, key: str, value: str):
+        """
+        First object of a list of flat objects whose `key` equals `value`, parsing only that object.
+
+        Args:
+            key: Key to match, for example 'symbol'
+            value: String value to match, for example 'ETHBTC'
+
+        Returns:
+            dict: The converted object, or None if there is none
+        """
+        needle = re.compile(b'"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*"'
+                            + re.escape(value.encode('utf-8')) + b'"')
+        match = needle.search(self.raw)
+        if match is None:
+            return None
+        start = self.raw.rfind(b'{', 0, match.start())
+        end = self.raw.find(b'}', match.end())
+        obj = json.loads(self.raw[start:end + 1])
+        return obj if self.converter is None else self.converter(obj)
+
+    def __repr__(self):
+        return '<LazyPayload [{} bytes]>'.format(len(self.raw))
@@ -0,0 +1,111 @@
+import json
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from nose.tools import assert_raises
+
+from crizzle.services.binance import AsyncBinanceService
+
+default_timestamp = 1499827319559
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith('/exchangeInfo'):
+            body = {'symbols': [{'symbol': 'ETHBTC', 'baseAsset': 'ETH', 'quoteAsset': 'BTC'},
+                                {'symbol': 'LTCBTC', 'baseAsset': 'LTC', 'quoteAsset': 'BTC'}]}
+        elif url.path.endswith('/ticker/price'):
+            body = {'symbol': query['symbol'][0], 'price': '0.07'}
+        elif url.path.endswith('/ticker/bookTicker'):
+            body = [{'symbol': 'ETHBTC', 'bidPrice': '0.069', 'bidQty': '1.0', 'askPrice': '0.071', 'askQty': '2.0'},
+                    {'symbol': 'BNBBTC', 'bidPrice': '0.001', 'bidQty': '1.0', 'askPrice': '0.002', 'askQty': '2.0'}]
+        elif url.path.endswith('/account'):
+            body = {'apiKey': self.headers['X-MBX-APIKEY'], 'signed': 'signature' in query}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('X-MBX-USED-WEIGHT-1M', '600')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(coroutine_function):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    svc = AsyncBinanceService(name='binanceasynctest', concurrency=4)
+    svc.load_key({'key': 'api-key', 'secret': 'secret-key'})
+    svc.root = 'http://127.0.0.1:{}/api'.format(server.server_address[1])
+
+    async def wrapper():
+        async with svc:
+            return await coroutine_function(svc)
+    try:
+        return asyncio.run(wrapper()), svc
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_debug_request():
+    svc = AsyncBinanceService(debug=True, name='binanceasynctest', default_timestamp=default_timestamp)
+    svc.load_key({'key': 'api-key', 'secret': 'secret-key'})
+    response = asyncio.run(svc.candlesticks('ETHBTC', '1h', limit=100))
+    assert response.method == 'GET'
+    assert response.url == '{}/v1/klines?symbol=ETHBTC&interval=1h&limit=100'.format(svc.root)
+
+
+def test_map_symbols():
+    async def query(svc):
+        return await svc.map_symbols('ticker_price', ['ETHBTC', 'LTCBTC', 'BNBBTC'])
+    responses, svc = run(query)
+    assert sorted(responses) == ['BNBBTC', 'ETHBTC', 'LTCBTC']
+    for symbol, response in responses.items():
+        assert response.status_code == 200
+        assert svc.decode(response) == {'symbol': symbol, 'price': 0.07}
+    assert svc.rate_limiter.available('weight') < 700
+
+
+def test_trading_symbols():
+    async def query(svc):
+        return await svc.trading_symbols(), await svc.trading_assets()
+    (symbols, assets), svc = run(query)
+    assert symbols == ['ETHBTC', 'LTCBTC']
+    assert assets == {'ETH', 'LTC', 'BTC'}
+
+
+def test_book_tickers():
+    async def query(svc):
+        return await svc.book_tickers()
+    tickers, svc = run(query)
+    # LTCBTC has no book and BNBBTC is not trading
+    assert tickers == [('ETHBTC', 'ETH', 'BTC', 0.069, 0.071)]
+
+
+def test_signed_request():
+    async def query(svc):
+        return svc.decode(await svc.account_info())
+    account, svc = run(query)
+    assert account == {'apiKey': 'api-key', 'signed': True}
+
+
+def test_synchronous_context_manager():
+    svc = AsyncBinanceService(name='binanceasynctest')
+
+    def use():
+        with svc:
+            pass
+
+    assert_raises(TypeError, use)
+    assert_raises(TypeError, svc.__exit__, None, None, None)
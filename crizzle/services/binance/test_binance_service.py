@@ -343,3 +343,36 @@ def test_trading_assets():
     response = svc.trading_assets()
     assert response.method == 'GET'
     assert response.url == '{}/v1/exchangeInfo'.format(svc.root)
+
+
+def test_request_cost():
+    assert svc.request_cost('get', 'klines', {'symbol': 'ETHBTC'}) == {'weight': 1}
+    assert svc.request_cost('get', 'depth', {'symbol': 'ETHBTC'}) == {'weight': 1}
+    assert svc.request_cost('get', 'depth', {'symbol': 'ETHBTC', 'limit': 1000}) == {'weight': 10}
+    assert svc.request_cost('get', 'ticker/24hr', {'symbol': 'ETHBTC'}) == {'weight': 1}
+    assert svc.request_cost('get', 'ticker/24hr', {}) == {'weight': 40}
+    assert svc.request_cost('get', 'allOrders', {'symbol': 'ETHBTC'}) == {'weight': 5}
+    assert svc.request_cost('post', 'order', {'symbol': 'ETHBTC'}) == {'weight': 1, 'orders': 1}
+    assert svc.request_cost('post', 'order/test', {'symbol': 'ETHBTC'}) == {'weight': 1}
+
+
+def test_update_rate_limits():
+    response = requests.Response()
+    response.status_code = 200
+    response.headers.update({'X-MBX-USED-WEIGHT-1M': '1000', 'X-MBX-ORDER-COUNT-1D': '99990'})
+    service = BinanceService(debug=True, name='binanceratelimit')
+    service.update_rate_limits(response)
+    assert 200 <= service.rate_limiter.available('weight') < 201
+    assert 10 <= service.rate_limiter.available('orders') < 11
+
+
+def test_user_data_stream():
+    response = svc.start_user_data_stream()
+    assert response.method == 'POST'
+    assert response.url == '{}/v3/userDataStream'.format(svc.root)
+    assert 'signature' not in response.url
+    response = svc.keepalive_user_data_stream('key')
+    assert response.method == 'PUT'
+    assert response.url == '{}/v3/userDataStream?listenKey=key'.format(svc.root)
+    response = svc.close_user_data_stream('key')
+    assert response.method == 'DELETE'
@@ -0,0 +1,58 @@
+import json
+import warnings
+import numpy as np
+from nose.tools import assert_raises
+
+from crizzle.services.binance.decoding import decode_candlesticks, decode_aggregated_trades, CANDLESTICK_FIELDS
+
+klines = [[1499040000000, "0.01634790", "0.80000000", "0.01575800", "0.01577100", "148976.11427815",
+           1499644799999, "2434.19055334", 308, "1756.87402397", "28.46694368", "17928899.62484339"],
+          [1499644800000, "0.01577100", "0.01600000", "0.01500000", "0.01590000", "1000.00000000",
+           1500249599999, "15.80000000", 12, "500.00000000", "7.90000000", "0"]]
+
+agg_trades = [{"a": 26129, "p": "0.01633102", "q": "4.70443515", "f": 27781, "l": 27781, "T": 1498793709153,
+               "m": True, "M": True},
+              {"a": 26130, "p": "0.01633200", "q": "0.50000000", "f": 27782, "l": 27784, "T": 1498793709160,
+               "m": False, "M": True}]
+
+
+def test_candlesticks_from_bytes():
+    records = decode_candlesticks(json.dumps(klines).encode('utf-8'))
+    assert len(records) == 2
+    assert records['openTimestamp'].dtype == np.int64
+    assert records['openTimestamp'][1] == 1499644800000
+    assert records['closeTimestamp'][0] == 1499644799999
+    assert records['numberOfTrades'][0] == 308
+    for row, record in zip(klines, records):
+        for field, value in zip(CANDLESTICK_FIELDS, row):
+            assert record[field] == float(value)
+
+
+def test_candlesticks_from_rows():
+    assert (decode_candlesticks(klines) == decode_candlesticks(json.dumps(klines))).all()
+
+
+def test_candlesticks_empty():
+    assert len(decode_candlesticks(b'[]')) == 0
+    assert len(decode_candlesticks([])) == 0
+
+
+def test_candlesticks_error_payload():
+    assert_raises(ValueError, decode_candlesticks, b'{"code": -1121, "msg": "Invalid symbol."}')
+
+
+def test_aggregated_trades():
+    records = decode_aggregated_trades(json.dumps(agg_trades))
+    assert records['aggregateTradeId'][0] == 26129
+    assert records['price'][0] == 0.01633102
+    assert records['timestamp'][0] == 1498793709153
+    assert records['isBuyerMaker'].tolist() == [True, False]
+    assert (records == decode_aggregated_trades(agg_trades)).all()
+
+
+def test_candlesticks_malformed_value():
+    malformed = json.dumps(klines).replace('"0.01634790"', '"abc"')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert_raises(ValueError, decode_candlesticks, malformed)
+        assert len(decode_candlesticks(json.dumps(klines))) == 2
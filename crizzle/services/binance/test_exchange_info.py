@@ -0,0 +1,90 @@
+import json
+from nose.tools import assert_raises
+
+from crizzle.services.binance import BinanceService
+from crizzle.services.binance.exchange_info import ExchangeInfo
+
+payload = {
+    'timezone': 'UTC',
+    'symbols': [
+        {'symbol': 'ETHBTC', 'baseAsset': 'ETH', 'quoteAsset': 'BTC',
+         'filters': [{'filterType': 'PRICE_FILTER', 'minPrice': 0.000001, 'maxPrice': 100000.0, 'tickSize': 0.000001},
+                     {'filterType': 'LOT_SIZE', 'minQty': 0.001, 'maxQty': 100000.0, 'stepSize': 0.001}]},
+        {'symbol': 'LTCBTC', 'baseAsset': 'LTC', 'quoteAsset': 'BTC', 'filters': []},
+        {'symbol': 'LTCETH', 'baseAsset': 'LTC', 'quoteAsset': 'ETH', 'filters': []},
+    ]
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.content = json.dumps(body).encode('utf-8')
+        self.url = 'https://api.binance.com/api/v1/exchangeInfo'
+        self.headers = {} if headers is None else headers
+        self.text = self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_lookups():
+    info = ExchangeInfo()
+    info.update(payload)
+    assert info.get(key='timezone') == 'UTC'
+    assert info.get('ETHBTC', 'baseAsset') == 'ETH'
+    assert info.symbols() == ['ETHBTC', 'LTCBTC', 'LTCETH']
+    assert info.assets() == {'ETH', 'LTC', 'BTC'}
+    assert info.symbols_with_base('LTC') == ['LTCBTC', 'LTCETH']
+    assert info.symbols_with_quote('BTC') == ['ETHBTC', 'LTCBTC']
+    assert info.tick_size('ETHBTC') == 0.000001
+    assert info.step_size('ETHBTC') == 0.001
+    assert info.step_size('LTCBTC') is None
+    with assert_raises(KeyError):
+        info.get('XRPBTC')
+
+
+def test_expiry():
+    clock = Clock()
+    info = ExchangeInfo(ttl=60, clock=clock)
+    assert info.expired
+    info.update(payload, {'ETag': '"abc"', 'Date': 'ignored'})
+    assert not info.expired
+    assert info.request_headers() == {'If-None-Match': '"abc"'}
+    clock.now = 60
+    assert info.expired
+    info.not_modified()
+    assert not info.expired
+    info.invalidate()
+    assert info.expired
+
+
+def test_service_cache():
+    svc = BinanceService(name='binanceexchangeinfotest')
+    clock = Clock()
+    svc.exchange_info.clock = clock
+    requests = []
+
+    def get(endpoint, headers=None):
+        requests.append(headers)
+        if headers:
+            return FakeResponse(304)
+        return FakeResponse(200, payload, {'ETag': '"abc"'})
+    svc.get = get
+    assert svc.trading_symbols() == ['ETHBTC', 'LTCBTC', 'LTCETH']
+    assert svc.trading_assets() == {'ETH', 'LTC', 'BTC'}
+    assert svc.info('LTCETH', 'quoteAsset') == 'ETH'
+    assert requests == [{}]
+    clock.now = svc.exchange_info.ttl
+    assert svc.info('ETHBTC')['symbol'] == 'ETHBTC'
+    assert requests == [{}, {'If-None-Match': '"abc"'}]
+    assert not svc.exchange_info.expired
@@ -0,0 +1,59 @@
+from nose.tools import assert_raises
+
+from crizzle.services.binance import BinanceService
+from crizzle.services.binance import orders
+from crizzle.services.binance.exchange_info import ExchangeInfo
+
+FILTERS = [{'filterType': 'PRICE_FILTER', 'minPrice': '0.00000100', 'maxPrice': '100000.00000000',
+            'tickSize': '0.00000100'},
+           {'filterType': 'LOT_SIZE', 'minQty': '0.00100000', 'maxQty': '100000.00000000', 'stepSize': '0.00100000'},
+           {'filterType': 'MIN_NOTIONAL', 'minNotional': '0.00100000'},
+           {'filterType': 'ICEBERG_PARTS', 'limit': 10}]
+PAYLOAD = {'symbols': [{'symbol': 'ETHBTC', 'baseAsset': 'ETH', 'quoteAsset': 'BTC', 'filters': FILTERS}]}
+
+
+def limit(quantity=1.0, price=0.07, **kwargs):
+    return dict({'symbol': 'ETHBTC', 'side': 'buy', 'order_type': 'limit', 'quantity': quantity, 'price': price,
+                 'time_in_force': 'gtc'}, **kwargs)
+
+
+def make_service():
+    svc = BinanceService(debug=True, name='binancebatchtest', default_timestamp=1499827319559)
+    svc.load_key({'key': 'api-key', 'secret': 'secret-key'})
+    return svc
+
+
+def test_order_params():
+    params = orders.order_params(**limit())
+    assert params == {'symbol': 'ETHBTC', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 1.0, 'price': '0.07',
+                      'timeInForce': 'GTC'}
+    with assert_raises(ValueError):
+        orders.order_params('ETHBTC', 'BUY', 'MARKET', 1.0, price=0.07)
+    with assert_raises(ValueError):
+        orders.cancel_params('ETHBTC')
+
+
+def test_check_filters():
+    info = ExchangeInfo()
+    info.update(PAYLOAD)
+    orders.check_filters(orders.order_params(**limit()), info)
+    invalid = [limit(price=0.0700005), limit(quantity=0.0005), limit(quantity=1.0005),
+               limit(quantity=0.01, price=0.00001), limit(iceberg_qty=0.05), limit(symbol='LTCBTC')]
+    for order in invalid:
+        with assert_raises(ValueError):
+            orders.check_filters(orders.order_params(**order), info)
+
+
+def test_batch_orders():
+    svc = make_service()
+    svc.exchange_info.update(PAYLOAD)
+    results = svc.batch_orders([limit(), limit(quantity=0.0005), limit(side='hold'), limit(price=0.071)], test=True)
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert [result.error is None for result in results] == [True, False, False, True]
+    assert 'minimum' in results[1].error and results[2].response is None
+    assert results[0].response.url.startswith('https://api.binance.com/api/v3/order/test?')
+    assert 'signature=' in results[3].response.url and 'price=0.071' in results[3].response.url
+    assert all(result.latency >= 0 for result in results)
+    cancels = svc.cancel_orders([{'symbol': 'ETHBTC', 'order_id': 5}, {'symbol': 'ETHBTC'}])
+    assert cancels[0].response.method == 'DELETE' and 'orderId=5' in cancels[0].response.url
+    assert cancels[1].error is not None
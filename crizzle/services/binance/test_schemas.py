@@ -0,0 +1,81 @@
+import json
+from decimal import Decimal
+
+from crizzle.services.binance import BinanceService
+from crizzle.services.binance.schemas import compile_schema, ENDPOINT_SCHEMAS, NUMBER, LazyPayload
+
+svc = BinanceService(debug=True, name='binanceschemas')
+decimal_svc = BinanceService(debug=True, name='binanceschemas', number_type=Decimal)
+svc.load_key({'key': 'key', 'secret': 'secret'})
+
+tickers = [{'symbol': 'ETHBTC', 'price': '0.07946600'}, {'symbol': 'LTCBTC', 'price': '0.01642900'}]
+
+
+class FakeResponse:
+    def __init__(self, url, body):
+        self.url = url
+        self.content = json.dumps(body).encode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_endpoint_of():
+    assert svc.endpoint_of(svc.ticker_price('ETHBTC').url) == 'ticker/price'
+    assert svc.endpoint_of(svc.depth('ETHBTC').url) == 'depth'
+    assert svc.endpoint_of(svc.test_order('ETHBTC', 'BUY', 'MARKET', 1).url) == 'order/test'
+
+
+def test_decode_list_of_objects():
+    response = FakeResponse(svc.ticker_price().url, tickers)
+    assert svc.decode(response) == [{'symbol': 'ETHBTC', 'price': 0.079466}, {'symbol': 'LTCBTC', 'price': 0.016429}]
+    assert decimal_svc.decode(response)[0]['price'] == Decimal('0.07946600')
+
+
+def test_decode_nested():
+    depth = {'lastUpdateId': 1027024, 'bids': [['4.00000000', '431.00000000', []]], 'asks': []}
+    response = FakeResponse(svc.depth('ETHBTC').url, depth)
+    assert svc.decode(response) == {'lastUpdateId': 1027024, 'bids': [[4.0, 431.0, []]], 'asks': []}
+
+
+def test_decode_leaves_unlisted_fields():
+    convert = compile_schema({'price': NUMBER, 'fills': [{'qty': NUMBER}]})
+    order = convert({'symbol': '1INCHBTC', 'orderId': 5, 'price': '1.5', 'fills': [{'qty': '2', 'tradeId': 1}]})
+    assert order == {'symbol': '1INCHBTC', 'orderId': 5, 'price': 1.5, 'fills': [{'qty': 2.0, 'tradeId': 1}]}
+
+
+def test_decode_klines():
+    convert = compile_schema(ENDPOINT_SCHEMAS['klines'])
+    row = [1499040000000, "0.01634790", "0.80000000", "0.01575800", "0.01577100", "148976.11427815",
+           1499644799999, "2434.19055334", 308, "1756.87402397", "28.46694368", "17928899.62484339"]
+    assert convert([row])[0][:3] == [1499040000000, 0.0163479, 0.8]
+
+
+def test_lazy_find():
+    response = FakeResponse(svc.ticker_price().url, tickers)
+    payload = svc.decode(response, lazy=True)
+    assert isinstance(payload, LazyPayload)
+    assert payload.find('symbol', 'LTCBTC') == {'symbol': 'LTCBTC', 'price': 0.016429}
+    assert payload.find('symbol', 'BNBBTC') is None
+    assert payload.parse()[0]['price'] == 0.079466
+
+
+def test_lazy_get():
+    response = FakeResponse(svc.ticker_book('ETHBTC').url, {'symbol': 'ETHBTC', 'bidPrice': '0.07946700',
+                                                            'bidQty': '9.00000000', 'askPrice': '0.07946800'})
+    payload = decimal_svc.decode(response, lazy=True)
+    assert payload.get('bidPrice') == Decimal('0.07946700')
+    assert payload.get('symbol') == 'ETHBTC'
+    assert payload.get('askQty', 0) == 0
+
+
+def test_decode_list_endpoints():
+    orders = [{'symbol': 'ETHBTC', 'price': '0.1', 'origQty': '1.0', 'fills': []}]
+    response = FakeResponse(svc.open_orders('ETHBTC').url, orders)
+    assert svc.decode(response)[0]['price'] == 0.1
+    response = FakeResponse(svc.trade_list('ETHBTC').url, [{'id': 1, 'price': '0.2', 'qty': '3'}])
+    assert svc.decode(response) == [{'id': 1, 'price': 0.2, 'qty': 3.0}]
+    error = {'code': -1121, 'msg': 'Invalid symbol.'}
+    assert svc.decode(FakeResponse(svc.all_orders('ETHBTC').url, error)) == error
+    for endpoint in ('trades', 'historicalTrades', 'aggTrades', 'klines', 'openOrders', 'allOrders', 'myTrades'):
+        assert isinstance(ENDPOINT_SCHEMAS[endpoint], list)
@@ -1,9 +1,15 @@
-import time
+import hashlib
 import logging
-import requests
+import urllib
 from crizzle.services.base import Service as BaseService
+from crizzle.services.base import RateLimit
+from crizzle.services.base.credentials import Credentials
 
-logger = logging.Logger(__name__)
+logger = logging.getLogger(__name__)
+
+
+def default_rate_limits():
+    return [RateLimit('requests', 6, 1)]
 
 
 class Service(BaseService):
@@ -11,33 +17,71 @@ class Service(BaseService):
     Environment for the Poloniex exchange
     """
 
-    def sign_request_data(self, params=None, data=None, headers=None):
-        pass
+    def __init__(self, key=None, debug=False, name=None, default_timestamp=None, pool_size=10):
+        name = 'Poloniex' if name is None else name
+        super(Service, self).__init__(name, 'https://poloniex.com', key=key, debug=debug,
+                                      default_timestamp=default_timestamp, rate_limits=default_rate_limits(),
+                                      pool_size=pool_size)
+        # Poloniex signs requests with HMAC-SHA512
+        self.credentials = Credentials('CrizzleKey_{}'.format(name), digestmod=hashlib.sha512)
+
+    # region Helper methods
+    @property
+    def key(self):
+        return self.credentials.as_dict()
+
+    @property
+    def key_loaded(self):
+        return self.credentials.loaded
+
+    @property
+    def nonce(self):
+        if self.debug and self.default_timestamp is not None:
+            return self.default_timestamp
+        return super(Service, self).nonce
+
+    def get_default_params(self, **kwargs):
+        assert 'sign' in kwargs
+        return {'nonce': self.nonce} if kwargs['sign'] else {}
+
+    def request_cost(self, request_type: str, endpoint: str, params: dict) -> dict:
+        return {'requests': 1}
 
     def add_api_key(self, params=None, data=None, headers=None):
-        pass
-
-    def __init__(self, key_file=None):
-        super(Service, self).__init__('Poloniex', 'https://poloniex.com/', key=key_file)
-
-    # region Request methods
-    def request(self, request_type: str, endpoint: str, params=None,
-                api_version=None, data=None, headers=None, sign=False):
-        final_params = self.get_params()
-        if params is not None:
-            final_params.update(params)
-        logger.debug('Querying {}'.format(self.name))
-        request = requests.Request(None, self.root + "/{}/".format(api_version) + endpoint,
-                                   params=final_params, data=data, headers=headers)
-        self.add_api_key(request)
-        with requests.Session() as session:
-            if request_type in ('get', 'post', 'put', 'delete'):
-                request.method = request_type.upper()
-            else:
-                logger.critical('invalid request type {}'.format(request_type))
-
-            if sign:
-                self.sign_request_data(request, None, None)
-            prepped = request.prepare()
-            response = session.send(prepped)
-        return response
+        """
+        Adds the API key to the request headers, if one is loaded. Public endpoints do not need it.
+        """
+        if self.key_loaded:
+            headers['Key'] = self.credentials.key
+
+    def sign_request_data(self, params=None, data=None, headers=None):
+        """
+        Move the parameters into the request body, which trading API requests are sent and signed in.
+        """
+        if not self.key_loaded:
+            raise RuntimeError("API key has not been loaded. Unable to sign request.")
+        data.update(params)
+        params.clear()
+        headers['Sign'] = self.credentials.signer.sign(bytes(urllib.parse.urlencode(data), 'utf-8'))
+
+    # endregion
+
+    # region Public Endpoints
+    def ticker(self):
+        return self.get('public', params={'command': 'returnTicker'})
+
+    def book_tickers(self) -> list:
+        """
+        Best bid and ask of every trading pair.
+
+        Returns:
+            list: (symbol, base asset, quote asset, bid, ask) of each pair currently trading
+        """
+        tickers = []
+        for symbol, ticker in self.decode(self.ticker()).items():
+            quote, base = symbol.split('_')  # Poloniex names pairs QUOTE_BASE, for example BTC_ETH
+            if not int(ticker.get('isFrozen', 0)):
+                tickers.append((symbol, base, quote, float(ticker['highestBid']), float(ticker['lowestAsk'])))
+        return tickers
+
+    # endregion
@@ -1,5 +1,32 @@
-from unittest import TestCase
+import hmac
+import hashlib
+from nose.tools import assert_raises
+from crizzle import services
 
+default_timestamp = 1499827319559
+svc = services.make('poloniex', debug=True, name='poloniextest', default_timestamp=default_timestamp)
 
-class TestService(TestCase):
-    pass
+
+def test_make():
+    service = services.make('poloniex')
+    assert service.name == 'Poloniex'
+    assert service.rate_limiter.limits
+
+
+def test_ticker():
+    response = svc.ticker()
+    assert response.method == 'GET'
+    assert response.url == '{}/public?command=returnTicker'.format(svc.root)
+    assert 'Sign' not in response.headers
+
+
+def test_signed_request():
+    unsigned = services.make('poloniex', debug=True, name='poloniexunsigned')
+    assert_raises(RuntimeError, unsigned.post, 'tradingApi', params={'command': 'returnBalances'})
+    svc.load_key({'key': 'api-key', 'secret': 'secret-key'})
+    response = svc.post('tradingApi', params={'command': 'returnBalances'})
+    assert response.url == '{}/tradingApi'.format(svc.root)
+    assert response.body == 'nonce={}&command=returnBalances'.format(default_timestamp)
+    assert response.headers['Key'] == 'api-key'
+    assert response.headers['Sign'] == hmac.new(b'secret-key', response.body.encode('utf-8'),
+                                                hashlib.sha512).hexdigest()